@@ -1,230 +1,318 @@
 import os
 import json
 import uuid
-import time
 import re
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify
+import time
+import threading
+import base64
+import hmac
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, request, jsonify, Response
 from werkzeug.utils import secure_filename
-import requests
 from pymongo import MongoClient
-from bson import json_util
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APIStatusError
+from cache import ExtractionCache, AnalysisCache, JobCatalog, analysis_cache_key, sha256_file
+from rescore import rescore_job, RETRYABLE_RECOMMENDATIONS
+from prefilter import prefilter_resume, prefilter_analysis
+from matching import MatchingEngine
+from job_import import import_jobs
+from json_provider import MongoJSONProvider
+from indexes import ensure_indexes, explain_queries
+from stats import record_transition, get_summary, get_job_stats, rebuild_job_stats
+from llmwhisperer import extract_text_from_resume, complete_whisper, LLMWHISPERER_WEBHOOK_TOKEN
+from local_extract import LocalExtractor
+from ratelimit import TokenBucket, MongoTokenBucket, CircuitBreaker, LLMGuard, LLMUnavailable
+from batching import AnalysisBatcher
+from bulk_upload import ingest_resumes, batch_progress
+from storage import ResumeStore, FileTooLarge, gc_loop
+from candidate_store import write_candidate, attach_details, iter_with_details, load_resume_text, text_fields, TEXT_VIEW
+from text_codec import TextCodec
+from sections import trim_resume
+from search import search_fields, skill_vocabulary, search_candidates, SEARCH_LIMIT, SEARCH_MAX_LIMIT
 
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = MongoJSONProvider(app)  # Encodes ObjectId/datetime directly, no json_util round trip
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_RESUME_EXTENSIONS = {'pdf', 'docx', 'png', 'jpg', 'jpeg'}
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Background workers for resume extraction + analysis
+RESUME_WORKERS = int(os.getenv('RESUME_WORKERS', 4))
+resume_executor = ThreadPoolExecutor(max_workers=RESUME_WORKERS, thread_name_prefix='resume-worker')
+
+# Queued resumes only live in the process that queued them. While it holds them
+# it keeps renewing their lease_until; candidates still queued/processing after
+# their lease ran out (the process stopped or crashed) are requeued by the
+# resume lease sweep
+RESUME_LEASE_SECONDS = int(os.getenv('RESUME_LEASE_SECONDS', 300))  # 0 disables the sweep
+in_flight_resumes = set()
+in_flight_lock = threading.Lock()
+
+# Upload size limits: per resume, and per bulk request (multi-file forms / ZIP archives).
+# Requests announcing a larger body are refused before it is read; MAX_CONTENT_LENGTH makes
+# Werkzeug stop reading (413) bodies without a Content-Length (chunked) past the bulk limit
+MAX_RESUME_MB = int(os.getenv('MAX_RESUME_MB', 20))
+MAX_BULK_UPLOAD_MB = int(os.getenv('MAX_BULK_UPLOAD_MB', 500))
+MAX_RESUME_BYTES = MAX_RESUME_MB * 1024 * 1024
+MULTIPART_OVERHEAD = 64 * 1024  # Form fields and part headers around the file
+app.config['MAX_CONTENT_LENGTH'] = MAX_BULK_UPLOAD_MB * 1024 * 1024 + MULTIPART_OVERHEAD
+
+# Job feed imports are upserted in unordered batches of this size
+JOB_IMPORT_BATCH_SIZE = int(os.getenv('JOB_IMPORT_BATCH_SIZE', 500))
+
+# Bulk re-scoring runs one job at a time, each with its own bounded LLM concurrency
+RESCORE_CONCURRENCY = int(os.getenv('RESCORE_CONCURRENCY', 4))
+rescore_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rescore-runner')
+
 # DB Setup
 client = MongoClient(os.getenv('MONGODB_URI'))
 db = client[os.getenv('DATABASE_NAME', 'recruitment_db')]
 jobs_collection = db['jobs']
 candidates_collection = db['candidates']
+candidate_details_collection = db['candidate_details']  # Resume text and analysis write-ups (candidate_store.py)
+
+# Full extracted resume text is stored compressed: zlib with a built-in resume dictionary, or zstd
+# with a dictionary trained on stored resumes once one exists ('python text_codec.py train', needs zstandard)
+text_codec = TextCodec(db['text_dictionaries'], level=int(os.getenv('RESUME_TEXT_COMPRESSION_LEVEL', 6)))
+rescore_runs_collection = db['rescore_runs']
+job_stats_collection = db['job_stats']  # Materialized per-job candidate stats
+upload_batches_collection = db['upload_batches']
+
+# Content-addressed resume files (uploads/objects/ab/cd/<sha256>.<ext>), one copy per distinct file.
+# Files untouched for UPLOAD_RETENTION_DAYS are gzipped to the archive tier (deleted when
+# UPLOAD_ARCHIVE=0), archives are kept UPLOAD_ARCHIVE_RETENTION_DAYS more (0 = forever).
+resume_store = ResumeStore(
+    db['stored_files'],
+    root=UPLOAD_FOLDER,
+    archive_root=os.getenv('UPLOAD_ARCHIVE_DIR') or None,
+    retention_days=int(os.getenv('UPLOAD_RETENTION_DAYS', 90)),
+    archive=os.getenv('UPLOAD_ARCHIVE', '1') == '1',
+    archive_retention_days=int(os.getenv('UPLOAD_ARCHIVE_RETENTION_DAYS', 365))
+)
+UPLOAD_GC_INTERVAL_HOURS = float(os.getenv('UPLOAD_GC_INTERVAL_HOURS', 6))  # 0 disables the collector
+
+if UPLOAD_GC_INTERVAL_HOURS > 0 and __name__ != '__mp_main__':
+    threading.Thread(target=gc_loop, args=(resume_store, UPLOAD_GC_INTERVAL_HOURS * 3600),
+                     daemon=True, name='upload-gc').start()
+
+def bootstrap_database():
+    """Startup maintenance: indexes, plus a first stats build for existing data."""
+    ensure_indexes(db)
+    extraction_cache.ensure_indexes()
+    try:
+        if job_stats_collection.estimated_document_count() == 0 and candidates_collection.estimated_document_count() > 0:
+            rebuild_job_stats(job_stats_collection, candidates_collection)
+    except Exception as e:
+        print(f"Job stats bootstrap failed: {e}")
+
+# Extracted text cache keyed by file SHA-256 (skips LLMWhisperer on repeat uploads)
+extraction_cache = ExtractionCache(
+    db['extraction_cache'],
+    max_entries=int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', 5000)),
+    max_age_days=int(os.getenv('EXTRACTION_CACHE_MAX_AGE_DAYS', 30))
+)
+
+# Run in the background so a slow or unreachable database doesn't block startup
+# (not in local extraction worker processes, which re-import this module as __mp_main__)
+if os.getenv('AUTO_CREATE_INDEXES', '1') == '1' and __name__ != '__mp_main__':
+    threading.Thread(target=bootstrap_database, daemon=True, name='db-bootstrap').start()
+
+# In-memory copy of the jobs collection for /api/jobs and job lookups, invalidated on
+# imports and (when the deployment supports change streams) on writes from other nodes
+job_catalog = JobCatalog(
+    jobs_collection,
+    encode=lambda data: app.json.dumps(data),
+    ttl_seconds=int(os.getenv('JOB_CATALOG_TTL_SECONDS', 300))
+)
+if os.getenv('JOB_CATALOG_WATCH', '1') == '1' and __name__ != '__mp_main__':
+    threading.Thread(target=job_catalog.watch, daemon=True, name='job-catalog-watch').start()
+
+# In-process PDF text layer / DOCX extraction, LLMWhisperer OCR only for scans and images
+local_extractor = LocalExtractor(
+    max_workers=int(os.getenv('LOCAL_EXTRACTION_WORKERS', 2)),
+    min_chars_per_page=int(os.getenv('LOCAL_EXTRACTION_MIN_CHARS_PER_PAGE', 200)),
+    max_garbage_ratio=float(os.getenv('LOCAL_EXTRACTION_MAX_GARBAGE_RATIO', 0.05))
+)
+
+# Cross-job candidate/job similarity matrix, built on first use then updated incrementally
+matching_engine = MatchingEngine()
+matching_build_lock = threading.Lock()
 
 # Open Router Configuration
+# SDK retries are off: throttled calls are deferred and picked up by the retry sweep instead
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
 llm_client = OpenAI(
     base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY")
+    api_key=os.getenv("OPENROUTER_API_KEY"),
+    timeout=LLM_TIMEOUT,
+    max_retries=0
+)
+LLM_MODEL = os.getenv('OPENROUTER_MODEL', "mistralai/devstral-2512:free")
+PROMPT_VERSION = "v2"  # Bump whenever the analysis prompt changes
+
+# Resume text sent per analysis, in tokens; longer resumes are cut down to their most relevant sections
+RESUME_PROMPT_TOKENS = int(os.getenv('RESUME_PROMPT_TOKENS', 750))
+
+# OpenRouter rate limit (shared by all app processes through Mongo), concurrency cap and circuit breaker
+LLM_RATE_PER_MINUTE = float(os.getenv('LLM_RATE_PER_MINUTE', 20))
+LLM_BURST = int(os.getenv('LLM_BURST', 5))
+if os.getenv('LLM_RATE_LIMIT_BACKEND', 'mongo') == 'mongo':
+    llm_bucket = MongoTokenBucket(db['rate_limits'], "openrouter", LLM_RATE_PER_MINUTE / 60, LLM_BURST)
+else:
+    llm_bucket = TokenBucket(LLM_RATE_PER_MINUTE / 60, LLM_BURST)
+llm_guard = LLMGuard(
+    llm_bucket,
+    CircuitBreaker(
+        failure_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', 5)),
+        cooldown=float(os.getenv('LLM_BREAKER_COOLDOWN', 60))
+    ),
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 4)),
+    acquire_timeout=float(os.getenv('LLM_ACQUIRE_TIMEOUT', 30))
 )
 
+# Deferred analyses are retried with exponential backoff, LLM_RETRY_MAX_ATTEMPTS times at most
+LLM_RETRY_SWEEP_SECONDS = int(os.getenv('LLM_RETRY_SWEEP_SECONDS', 60))  # 0 disables the sweep
+LLM_RETRY_DELAY = int(os.getenv('LLM_RETRY_DELAY', 60))
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv('LLM_RETRY_MAX_ATTEMPTS', 5))
+
+# Resumes scoring below this locally skip the LLM call (0 disables the pre-filter)
+PREFILTER_THRESHOLD = float(os.getenv('PREFILTER_THRESHOLD', 25))
+
+# Memoized AI analysis results (invalidated per job on re-upload)
+analysis_cache = AnalysisCache(
+    max_entries=int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 1000)),
+    ttl_seconds=int(os.getenv('ANALYSIS_CACHE_TTL_SECONDS', 86400))
+)
+
+# Bulk-uploaded resumes for the same job are analyzed LLM_BATCH_SIZE per prompt (1 disables
+# batching); single uploads are analyzed on their own, without waiting for a batch
+LLM_BATCH_SIZE = int(os.getenv('LLM_BATCH_SIZE', 5))
+analysis_batcher = AnalysisBatcher(
+    lambda job, texts: analyze_resumes_batch(job, texts),
+    lambda text, job: analyze_resume_with_ai(text, job),
+    max_batch=LLM_BATCH_SIZE,
+    max_wait=float(os.getenv('LLM_BATCH_WAIT', 2)),
+    workers=int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+) if LLM_BATCH_SIZE > 1 else None
+
 #Helper function
 
-def mongo_to_json(data):
-    """Converts MongoDB BSON (ObjectIds, Dates) to standard JSON."""
-    return json.loads(json_util.dumps(data))
+# Candidate list projections: the summary view leaves out the long text fields (the full view
+# adds them from candidate_details, one query per page)
+CANDIDATE_SUMMARY_FIELDS = {
+    "_id": 0, "candidate_id": 1, "id": 1, "job_id": 1, "job_title": 1, "filename": 1,
+    "match_score": 1, "prefilter_score": 1, "recommendation": 1, "status": 1,
+    "uploaded_at": 1, "skills_found": 1, "missing_skills": 1, "key_strengths": 1,
+    "estimated_experience_years": 1
+}
+CANDIDATE_FULL_FIELDS = {"_id": 0, "resume_text": 0}
+CANDIDATE_PAGE_SIZE = 50
+CANDIDATE_MAX_PAGE_SIZE = 500
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_RESUME_EXTENSIONS
+def encode_page_cursor(candidate):
+    """Encodes the (match_score, candidate_id) keyset position of the last row on a page."""
+    key = json.dumps([candidate.get('match_score', 0), candidate['candidate_id']])
+    return base64.urlsafe_b64encode(key.encode()).decode()
 
-#Text extraction
-def extract_text_from_resume(file_path):
-    """
-    Extract text from resume using LLMWhisperer API v2.
-    Uses binary upload as per official documentation.
-    """
-    api_key = os.getenv('LLMWHISPERER_API_KEY')
-    base_url = "https://llmwhisperer-api.us-central.unstract.com/api/v2"
+def decode_page_cursor(cursor):
+    """Turns a page cursor back into a query for the rows that sort after it."""
+    score, candidate_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return {"$or": [
+        {"match_score": {"$lt": score}},
+        {"match_score": score, "candidate_id": {"$lt": candidate_id}}
+    ]}
+
+def candidate_filters(args):
+    """Builds the candidates query from job, status, recommendation, score and date filters."""
+    query = {}
+    if args.get('job_id'):
+        query['job_id'] = args['job_id']
+    if args.get('status'):
+        query['status'] = {"$in": args['status'].split(',')}
+    if args.get('recommendation'):
+        query['recommendation'] = {"$in": args['recommendation'].split(',')}
     
-    if not api_key:
-        return None, "LLMWHISPERER_API_KEY is missing in .env"
-    headers = {'unstract-key': api_key}
+    score = {}
+    if args.get('min_score'):
+        score['$gte'] = float(args['min_score'])
+    if args.get('max_score'):
+        score['$lte'] = float(args['max_score'])
+    if score:
+        query['match_score'] = score
     
-    try:
-        # Step 1: Upload process
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-        
-        filename = os.path.basename(file_path)
-        
-        # Parameters - use v2 according to documentations
-        #REFER https://docs.unstract.com/llmwhisperer/llm_whisperer/apis/llm_whisperer_text_extraction_api/
-        params = {
-            'mode': 'high_quality',  # Best for resumes with OCR support
-            'output_mode': 'layout_preserving',  # Optimized for LLM consumption
-            'page_seperator': '<<<'  # Page separator
-        }
-        
-        print(f"Uploading {filename} to LLMWhisperer...")
-        print(f"   File size: {len(file_data)} bytes")
-        
-        # Send as binary data
-        response = requests.post(
-            f"{base_url}/whisper",
-            headers=headers,
-            params=params,
-            data=file_data,  # Binary content,  not multipart (PDF)
-            timeout=30
-        )
-        
-        print(f"Response Status: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        
-        # Check for HTML error responses
-        content_type = response.headers.get('Content-Type', '')
-        if 'text/html' in content_type:
-            return None, f"API returned HTML error. Status: {response.status_code}. Check your API key."
-        
-        # Error code handling
-        if response.status_code == 401:
-            return None, "Authentication failed. Check your LLMWHISPERER_API_KEY in .env file."
-        elif response.status_code == 402:
-            return None, "Payment required. Your LLMWhisperer quota may be exhausted."
-        elif response.status_code == 415:
-            return None, f"Unsupported media type. The API doesn't accept this file format."
-        elif response.status_code not in [200, 202]: #Documentations says 202 
-            try:
-                error_data = response.json()
-                error_msg = error_data.get('message', response.text[:200])
-            except:
-                error_msg = response.text[:200]
-            return None, f"Upload failed ({response.status_code}): {error_msg}"
-
-        # Parse JSON response
-        try:
-            res_data = response.json()
-        except json.JSONDecodeError as e:
-            return None, f"Failed to parse API response as JSON: {str(e)}"
-        
-        whisper_hash = res_data.get("whisper_hash")
-        
-        if not whisper_hash:
-            return None, f"No whisper_hash in response. Got: {res_data}"
+    # uploaded_at is an ISO string, so ISO dates compare correctly as strings
+    uploaded = {}
+    if args.get('from'):
+        uploaded['$gte'] = args['from']
+    if args.get('to'):
+        uploaded['$lte'] = args['to']
+    if uploaded:
+        query['uploaded_at'] = uploaded
+    return query
 
-        print(f"Got whisper_hash: {whisper_hash}")
-        
-        # Step 2: Processing
-        #REFER https://docs.unstract.com/llmwhisperer/llm_whisperer/apis/llm_whisperer_text_extraction_status_api/
-        print("⏳ Waiting for processing...")
-        time.sleep(3)  
-        
-        max_attempts = 40  # 40 attempts x 3 seconds = 2 minutes max
-        for attempt in range(max_attempts):
-            try:
-                status_resp = requests.get(
-                    f"{base_url}/whisper-status",
-                    headers=headers,
-                    params={'whisper_hash': whisper_hash},
-                    timeout=10
-                )
-                
-                if status_resp.status_code != 200:
-                    print(f"Status check returned {status_resp.status_code}")
-                    time.sleep(3)
-                    continue
-                
-                # Verify JSON response
-                if "application/json" not in status_resp.headers.get("Content-Type", ""):
-                    return None, "Status API returned non-JSON response."
-
-                status_data = status_resp.json()
-                status = status_data.get("status")
-                
-                print(f" Attempt {attempt + 1}/{max_attempts} - Status: {status}")
-                
-                if status == "processed":
-                    print("Document processed successfully!")
-                    
-                    # Step 3: RETRIEVAL (REFER ) 
-                    # -https://docs.unstract.com/llmwhisperer/llm_whisperer/apis/llm_whisperer_text_extraction_retrieve_api/
-                    retr_resp = requests.get(
-                        f"{base_url}/whisper-retrieve",
-                        headers=headers,
-                        params={'whisper_hash': whisper_hash},
-                        timeout=30
-                    )
-                    
-                    if retr_resp.status_code != 200:
-                        try:
-                            error_data = retr_resp.json()
-                            error_msg = error_data.get('message', retr_resp.text[:200])
-                        except:
-                            error_msg = retr_resp.text[:200]
-                        return None, f"Retrieve failed ({retr_resp.status_code}): {error_msg}"
-                    
-                    try:
-                        retrieve_data = retr_resp.json()
-                        # Extract text from the result_text field
-                        extracted_text = retrieve_data.get("result_text", "").strip()
-                        
-                        if not extracted_text:
-                            # Fallback: sometimes it's in extraction dict
-                            extraction = retrieve_data.get("extraction", {})
-                            extracted_text = extraction.get("result_text", "").strip()
-                        
-                    except json.JSONDecodeError:
-                        # Fallback: sometimes returns plain text
-                        extracted_text = retr_resp.text.strip()
-                    
-                    if not extracted_text:
-                        return None, "Extraction returned empty text."
-                    
-                    print(f"Extracted {len(extracted_text)} characters")
-                    return extracted_text, None
-                
-                elif status == "failed" or status == "error":
-                    error_msg = status_data.get('message', 'Unknown error')
-                    return None, f"Processing failed: {error_msg}"
-                
-                elif status in ["processing", "accepted", "uploaded"]:
-                    # Still processing
-                    time.sleep(3)
-                    continue
-                else:
-                    # Unknown status
-                    print(f"⚠️ Unknown status: {status}")
-                    time.sleep(3)
-                    continue
-                    
-            except requests.exceptions.Timeout:
-                print(f"Status check timeout (attempt {attempt + 1})")
-                time.sleep(3)
-                continue
-            except Exception as e:
-                print(f"Status check error: {str(e)}")
-                time.sleep(3)
-                continue
-        
-        return None, f"Timeout: Processing exceeded {max_attempts * 3} seconds."
+# Skills detected in resume text for search: every job's required skills plus known aliases,
+# rebuilt when the job catalog changes
+_search_vocabulary = {"etag": None, "skills": frozenset()}
 
-    except requests.exceptions.Timeout:
-        return None, "Network timeout. Please try again."
-    except requests.exceptions.RequestException as e:
-        return None, f"Network error: {str(e)}"
-    except Exception as e:
-        return None, f"Unexpected error: {str(e)}"
+def candidate_search_fields(analysis, text):
+    """skill_keys / experience_years for the search endpoint."""
+    snapshot = job_catalog.snapshot()
+    if _search_vocabulary['etag'] != snapshot['etag']:
+        _search_vocabulary.update(etag=snapshot['etag'], skills=skill_vocabulary(snapshot['jobs']))
+    return search_fields(analysis, text, _search_vocabulary['skills'])
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_RESUME_EXTENSIONS
+
+def get_matching_engine():
+    """Returns the matching engine, building it from the database on first use."""
+    if not matching_engine.built:
+        with matching_build_lock:
+            if not matching_engine.built:
+                jobs = jobs_collection.find({}, {"job_id": 1, "title": 1, "description": 1, "required_skills": 1})
+                candidates = iter_with_details(
+                    candidate_details_collection,
+                    candidates_collection.find(
+                        {"status": "success"},
+                        {"candidate_id": 1, "resume_text": 1, "skills_found": 1}
+                    ).batch_size(2000),
+                    projection=TEXT_VIEW,
+                    batch_size=2000,
+                    codec=text_codec
+                )
+                matching_engine.build(jobs, candidates)
+    return matching_engine
 
 # MISTRAL (OPEN ROUTER ANALYSIS)
 
+def resume_excerpt(resume_text, job_data):
+    """The part of a resume that goes into the prompt (and the analysis cache key)."""
+    return trim_resume(resume_text, job_data, RESUME_PROMPT_TOKENS)
+
 def analyze_resume_with_ai(resume_text, job_data):
+    """Analyzes resume text against job requirements, reusing cached results."""
+    cache_key = analysis_cache_key(resume_excerpt(resume_text, job_data), job_data, LLM_MODEL, PROMPT_VERSION)
+    cached = analysis_cache.get(cache_key)
+    if cached:
+        print(f"AI Analysis cache hit: Match Score = {cached.get('match_score', 0)}")
+        return cached
+    
+    result = _run_ai_analysis(resume_text, job_data)
+    if result.get('recommendation') not in RETRYABLE_RECOMMENDATIONS:
+        analysis_cache.put(cache_key, result, job_id=job_data.get('job_id'))
+    return result
+
+def build_analysis_prompt(resume_text, job_data):
     #PROMPT
-    """Analyzes resume text against job requirements using AI."""
-    prompt = f"""
+    """Builds the resume vs. job analysis prompt."""
+    return f"""
     Analyze this RESUME against the JOB DETAILS. Return ONLY valid JSON.
     Do not include markdown blocks, code fences, or conversational text.
 
@@ -233,7 +321,7 @@ def analyze_resume_with_ai(resume_text, job_data):
     EXPERIENCE REQUIRED: {job_data.get('experience_years', 'Not specified')} years
 
     RESUME TEXT:
-    {resume_text[:3000]}
+    {resume_excerpt(resume_text, job_data)}
 
     Return JSON with this exact schema:
     {{
@@ -248,43 +336,557 @@ def analyze_resume_with_ai(resume_text, job_data):
       "reasoning": "explanation of the match score"
     }}
     """
+
+def parse_analysis_response(raw_content):
+    """Parses the model's reply into the analysis dict."""
+    raw_content = raw_content.strip()
+    
+    # Remove markdown code blocks (checked output after POSTMAN API)
+    raw_content = re.sub(r'```json\s*|\s*```', '', raw_content)
+    
+    # Extract JSON object
+    json_match = re.search(r'(\{.*\})', raw_content, re.DOTALL)
+    
+    if json_match:
+        clean_json = json_match.group(1)
+        result = json.loads(clean_json)
+        print(f"AI Analysis: Match Score = {result.get('match_score', 0)}")
+        return result
+    
+    # Fallback parsing
+    return json.loads(raw_content)
+
+def failed_analysis(error):
+    """Analysis stored when the AI call or its parsing fails."""
+    print(f"AI Analysis Error: {error}")
+    return {
+        "match_score": 0,
+        "recommendation": "Analysis Failed",
+        "reasoning": f"AI failed to analyze: {str(error)}",
+        "key_strengths": [],
+        "missing_skills": [],
+        "skills_found": [],
+        "experience_summary": "Analysis error",
+        "education": "Unknown",
+        "estimated_experience_years": 0
+    }
+
+def deferred_analysis(error):
+    """Analysis stored when the provider is throttled or down; the retry sweep picks it up later."""
+    print(f"AI Analysis deferred: {error}")
+    return {
+        "match_score": 0,
+        "recommendation": "Analysis Deferred",
+        "reasoning": f"AI analysis deferred, will retry: {str(error)}",
+        "key_strengths": [],
+        "missing_skills": [],
+        "skills_found": [],
+        "experience_summary": "Analysis pending",
+        "education": "Unknown",
+        "estimated_experience_years": 0
+    }
+
+def is_transient_error(error):
+    """
+    True for provider errors that waiting can fix: the call wasn't sent
+    (LLMUnavailable), timed out or lost its connection, was rate limited or
+    hit a server error. A bad key, an unknown model or a prompt that is too
+    long fail the same way on every retry.
+    """
+    if isinstance(error, (LLMUnavailable, APIConnectionError)):  # APITimeoutError is an APIConnectionError
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code in (408, 409, 429) or error.status_code >= 500)
+
+def provider_error_analysis(error):
+    """Analysis stored when the provider call raised: deferred if the error is transient, failed otherwise."""
+    return deferred_analysis(error) if is_transient_error(error) else failed_analysis(error)
+
+def _run_ai_analysis(resume_text, job_data):
+    """Analyzes resume text against job requirements using AI."""
+    prompt = build_analysis_prompt(resume_text, job_data)
+    try:
+        completion = llm_guard.call(lambda: llm_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1
+        ))
+    except Exception as e:
+        # Deferred analyses don't use up a retry, so only errors that waiting can fix are deferred
+        return provider_error_analysis(e)
+    
+    raw_content = completion.choices[0].message.content
+    try:
+        result = parse_analysis_response(raw_content)
+    except Exception as e:
+        result = failed_analysis(e)
+    result['raw_response'] = raw_content
+    return result
+
+def prefilter_screen(resume_text, job_data):
+    """
+    Local pre-filter stage.
+
+    Returns:
+        tuple: (prefilter score, final analysis for resumes below PREFILTER_THRESHOLD,
+               or None when the resume goes on to the LLM)
+    """
+    prefilter = prefilter_resume(resume_text, job_data)
+    if prefilter['score'] >= PREFILTER_THRESHOLD:
+        return prefilter['score'], None
+    
+    print(f"Pre-filter score {prefilter['score']} < {PREFILTER_THRESHOLD}, skipping AI analysis")
+    analysis = prefilter_analysis(prefilter, PREFILTER_THRESHOLD)
+    analysis['analysis_stage'] = "prefilter"
+    analysis['prefilter_score'] = prefilter['score']
+    return prefilter['score'], analysis
+
+def llm_stage(analysis, prefilter_score):
+    analysis['analysis_stage'] = "llm"
+    analysis['prefilter_score'] = prefilter_score
+    return analysis
+
+ANALYSIS_RECOMMENDATIONS = {"Strong Match", "Good Match", "Moderate Match", "Weak Match"}
+
+def validate_analysis(result):
+    """Checks one analysis dict against the prompt's JSON schema."""
+    if not isinstance(result, dict):
+        return False
+    score = result.get('match_score')
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 100:
+        return False
+    if result.get('recommendation') not in ANALYSIS_RECOMMENDATIONS:
+        return False
+    for field in ('key_strengths', 'missing_skills', 'skills_found'):
+        if not isinstance(result.get(field, []), list):
+            return False
+    years = result.get('estimated_experience_years', 0)
+    return isinstance(years, (int, float)) and not isinstance(years, bool)
+
+def build_batch_analysis_prompt(resume_texts, job_data):
+    #PROMPT (batch): job context once, resumes numbered from 1
+    """Builds one prompt analyzing several resumes against the same job."""
+    resumes = "\n\n".join(
+        f"=== RESUME {i} ===\n{resume_excerpt(text, job_data)}" for i, text in enumerate(resume_texts, 1)
+    )
+    return f"""
+    Analyze each of the {len(resume_texts)} RESUMES below against the JOB DETAILS, independently.
+    Return ONLY a valid JSON array with one object per resume, in order.
+    Do not include markdown blocks, code fences, or conversational text.
+
+    JOB TITLE: {job_data.get('title', 'Not specified')}
+    REQUIRED SKILLS: {job_data.get('required_skills', 'Not specified')}
+    EXPERIENCE REQUIRED: {job_data.get('experience_years', 'Not specified')} years
+
+    {resumes}
+
+    Each array element must use this exact schema:
+    {{
+      "resume": <resume number>,
+      "match_score": <number 0-100>,
+      "recommendation": "<Strong Match|Good Match|Moderate Match|Weak Match>",
+      "key_strengths": ["strength1", "strength2"],
+      "missing_skills": ["skill1", "skill2"],
+      "skills_found": ["skill1", "skill2"],
+      "experience_summary": "brief summary",
+      "education": "education details",
+      "estimated_experience_years": <number>,
+      "reasoning": "explanation of the match score"
+    }}
+    """
+
+def parse_batch_analysis_response(raw_content, count):
+    """
+    Parses a batch reply into `count` analyses, in resume order. Entries that
+    are missing or fail validate_analysis() come back as None.
+    """
+    raw_content = re.sub(r'```json\s*|\s*```', '', raw_content.strip())
+    array_match = re.search(r'(\[.*\])', raw_content, re.DOTALL)
+    entries = json.loads(array_match.group(1) if array_match else raw_content)
+    if not isinstance(entries, list):
+        raise ValueError("Batch analysis reply is not a JSON array")
+    
+    results = [None] * count
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        number = entry.pop('resume', position + 1)
+        index = number - 1 if isinstance(number, int) else position
+        if 0 <= index < count and results[index] is None and validate_analysis(entry):
+            results[index] = entry
+    return results
+
+def analyze_resumes_batch(job_data, resume_texts):
+    """
+    Analyzes several resumes for one job in a single LLM call, reusing cached
+    results. Entries the batch couldn't produce are returned as None (the
+    batcher analyzes those one by one); if the provider call fails with a
+    transient error, every entry is deferred.
+    """
+    keys = [analysis_cache_key(resume_excerpt(text, job_data), job_data, LLM_MODEL, PROMPT_VERSION) for text in resume_texts]
+    results = [analysis_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if not result]
+    if not missing:
+        return results
+    
+    prompt = build_batch_analysis_prompt([resume_texts[i] for i in missing], job_data)
     try:
-        completion = llm_client.chat.completions.create(
-            model="mistralai/devstral-2512:free",
+        completion = llm_guard.call(lambda: llm_client.chat.completions.create(
+            model=LLM_MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.1
+        ))
+    except Exception as e:
+        if not is_transient_error(e):
+            # e.g. the batch prompt is too long: the batcher falls back to single calls
+            print(f"Batch analysis call failed, falling back to single calls: {e}")
+            return results
+        deferred = deferred_analysis(e)
+        for i in missing:
+            results[i] = dict(deferred)
+        return results
+    
+    try:
+        batch = parse_batch_analysis_response(completion.choices[0].message.content, len(missing))
+    except Exception as e:
+        print(f"Batch analysis reply unusable, falling back to single calls: {e}")
+        return results
+    
+    for i, analysis in zip(missing, batch):
+        if analysis is not None:
+            analysis_cache.put(keys[i], analysis, job_id=job_data.get('job_id'))
+            results[i] = analysis
+    print(f"Batch AI analysis: {sum(1 for a in batch if a)}/{len(missing)} resumes in one call")
+    return results
+
+def screen_resume(resume_text, job_data):
+    """
+    Runs the local pre-filter and only calls the LLM when the resume scores
+    at or above PREFILTER_THRESHOLD.
+    """
+    prefilter_score, analysis = prefilter_screen(resume_text, job_data)
+    if analysis is None:
+        analysis = llm_stage(analyze_resume_with_ai(resume_text, job_data), prefilter_score)
+    return analysis
+
+# BACKGROUND RESUME PROCESSING
+
+def format_analysis_text(analysis):
+    """Formats an AI analysis dict for display on the manager page."""
+    return f"""Match Score: {analysis.get('match_score', 0)}/100
+Recommendation: {analysis.get('recommendation', 'Unknown')}
+
+Key Strengths:
+{chr(10).join('• ' + s for s in analysis.get('key_strengths', []))}
+
+Missing Skills:
+{chr(10).join('• ' + s for s in analysis.get('missing_skills', []))}
+
+Skills Found: {', '.join(analysis.get('skills_found', []))}
+
+Experience: {analysis.get('experience_summary', 'N/A')}
+Education: {analysis.get('education', 'N/A')}
+Years of Experience: {analysis.get('estimated_experience_years', 0)}
+
+Reasoning: {analysis.get('reasoning', 'N/A')}"""
+
+def analysis_fields(analysis, retry_count=0):
+    """
+    Candidate fields for an analysis. One that produced no score is stored as
+    "deferred" with a backed-off next_retry_at for the retry sweep, or as
+    "error" once LLM_RETRY_MAX_ATTEMPTS retries are used up.
+    """
+    fields = {"status": "success", "analysis": format_analysis_text(analysis), **analysis}
+    if analysis.get('recommendation') in RETRYABLE_RECOMMENDATIONS:
+        fields['retry_count'] = retry_count
+        if retry_count >= LLM_RETRY_MAX_ATTEMPTS:
+            fields['status'] = "error"
+        else:
+            delay = min(LLM_RETRY_DELAY * 2 ** retry_count, 3600)
+            fields['status'] = "deferred"
+            fields['next_retry_at'] = (datetime.now() + timedelta(seconds=delay)).isoformat()
+    return fields
+
+def extract_text(file_path):
+    """
+    Tiered extraction: local text layer first (milliseconds), remote
+    LLMWhisperer OCR only when the file is an image or looks scanned.
+    """
+    text, reason = local_extractor.extract(file_path)
+    if text:
+        print(f"Extracted locally: {os.path.basename(file_path)}")
+        return text, None
+    print(f"Using LLMWhisperer OCR for {os.path.basename(file_path)}: {reason}")
+    return extract_text_from_resume(file_path)
+
+def processing_failed(candidate_id, error):
+    print(f"Resume processing error ({candidate_id}): {error}")
+    return {
+        "match_score": 0,
+        "recommendation": "Processing Failed",
+        "reasoning": str(error),
+        "status": "error",
+        "analysis": f"Processing failed: {error}"
+    }
+
+def analyzed_update(candidate_id, text, analysis):
+    """Candidate update for a finished analysis (adds scored candidates to the matching engine)."""
+    update = {**text_fields(text, text_codec), **analysis_fields(analysis), **candidate_search_fields(analysis, text)}
+    if update['status'] == "success":
+        matching_engine.add_candidate({
+            "candidate_id": candidate_id,
+            "resume_text": text,
+            "skills_found": analysis.get('skills_found', [])
+        })
+    return update
+
+def track_resume(candidate_id):
+    """Counts a candidate as held by this process, so the lease sweep keeps renewing its lease."""
+    with in_flight_lock:
+        in_flight_resumes.add(candidate_id)
+
+def release_resume(candidate_id):
+    with in_flight_lock:
+        in_flight_resumes.discard(candidate_id)
+
+def queue_resume(candidate_id, file_path, job, file_hash=None, batched=False):
+    """Hands a queued candidate to the resume workers (batched: bulk upload, see process_resume)."""
+    track_resume(candidate_id)
+    resume_executor.submit(process_resume, candidate_id, file_path, job, file_hash, batched)
+
+def finish_resume(candidate_id, job, update):
+    """Writes the final candidate update and moves the job stats out of "processing"."""
+    update['processed_at'] = datetime.now().isoformat()
+    try:
+        write_candidate(candidates_collection, candidate_details_collection, candidate_id, update,
+                        unset={"lease_until": ""})
+    finally:
+        release_resume(candidate_id)
+    record_transition(job_stats_collection, job['job_id'], {"status": "processing"}, update)
+    print(f"Processed candidate: {candidate_id} ({update['status']})")
+
+def process_resume(candidate_id, file_path, job, file_hash=None, batched=False):
+    """
+    Runs text extraction + AI analysis for a queued candidate on a worker
+    thread and writes the result back to the candidate document. Uploads pass
+    the file_hash they computed (and stored) while saving the file.
+    
+    With batching on, bulk-uploaded (batched) resumes that pass the
+    pre-filter are handed to the analysis batcher and the worker moves on;
+    the candidate is finished when its batch comes back.
+    """
+    try:
+        candidates_collection.update_one(
+            {"candidate_id": candidate_id},
+            {"$set": {"status": "processing"}}
         )
+        record_transition(job_stats_collection, job['job_id'], {"status": "queued"}, {"status": "processing"})
         
-        raw_content = completion.choices[0].message.content.strip()
+        if file_hash is None:
+            file_hash = sha256_file(file_path)
+            candidates_collection.update_one(
+                {"candidate_id": candidate_id},
+                {"$set": {"file_hash": file_hash}}
+            )
         
-        # Remove markdown code blocks (checked output after POSTMAN API)
-        raw_content = re.sub(r'```json\s*|\s*```', '', raw_content)
+        text = extraction_cache.get(file_hash)
+        error = None
+        if text:
+            print(f"Extraction cache hit: {file_hash[:12]}")
+        else:
+            text, error = extract_text(file_path)
+            if not error:
+                extraction_cache.put(file_hash, text)
         
-        # Extract JSON object
-        json_match = re.search(r'(\{.*\})', raw_content, re.DOTALL)
+        if error:
+            print(f"Extraction failed: {error}")
+            update = {
+                "match_score": 0,
+                "recommendation": "Parsing Failed",
+                "reasoning": error,
+                "status": "error",
+                "analysis": f"Failed to extract text: {error}"
+            }
+        else:
+            print(f"Extracted {len(text)} chars. Running AI analysis...")
+            prefilter_score, analysis = prefilter_screen(text, job)
+            if analysis is None and batched and analysis_batcher is not None:
+                def done(future):
+                    try:
+                        update = analyzed_update(candidate_id, text, llm_stage(future.result(), prefilter_score))
+                    except Exception as e:
+                        update = processing_failed(candidate_id, e)
+                    finish_resume(candidate_id, job, update)
+                analysis_batcher.submit(job, text).add_done_callback(done)
+                return
+            if analysis is None:
+                analysis = llm_stage(analyze_resume_with_ai(text, job), prefilter_score)
+            update = analyzed_update(candidate_id, text, analysis)
+    except Exception as e:
+        update = processing_failed(candidate_id, e)
+    
+    finish_resume(candidate_id, job, update)
+
+def retry_deferred_candidates(limit=50):
+    """
+    Re-runs AI analysis for deferred candidates whose next_retry_at has passed,
+    plus older candidates stored as "Analysis Failed". Each candidate is
+    claimed atomically (its next_retry_at is pushed forward), so several app
+    processes can sweep at the same time. Stops early while the circuit is open.
+
+    Returns:
+        int: Number of candidates retried
+    """
+    retried = 0
+    jobs = {}
+    while retried < limit and not llm_guard.breaker.is_open():
+        now = datetime.now()
+        candidate = candidates_collection.find_one_and_update(
+            {"$or": [
+                {"status": "deferred", "next_retry_at": {"$lte": now.isoformat()}},
+                {"status": "success", "recommendation": "Analysis Failed",
+                 "next_retry_at": {"$not": {"$gt": now.isoformat()}}}
+            ]},
+            {"$set": {"next_retry_at": (now + timedelta(minutes=10)).isoformat()}},
+            projection={"analysis": 0},
+            sort=[("next_retry_at", 1)]
+        )
+        if not candidate:
+            break
+        retried += 1
         
-        if json_match:
-            clean_json = json_match.group(1)
-            result = json.loads(clean_json)
-            print(f"AI Analysis: Match Score = {result.get('match_score', 0)}")
-            return result
+        job_id = candidate.get('job_id')
+        if job_id not in jobs:
+            jobs[job_id] = job_catalog.get(job_id)
+        job = jobs[job_id]
         
-        # Fallback parsing
-        return json.loads(raw_content)
+        # Candidates stored before full-text storage kept 1000 characters; the
+        # extraction cache may still have the rest
+        text = load_resume_text(candidate_details_collection, candidate, text_codec)
+        restored = None
+        if len(text) <= 1000 and candidate.get('file_hash'):
+            restored = extraction_cache.get(candidate['file_hash'])
+            if restored and len(restored) > len(text):
+                text = restored
         
+        if not job or not text:
+            update = {"status": "error", "reasoning": "Retry impossible: job or resume text no longer available"}
+        else:
+            analysis = screen_resume(text, job)
+            # Throttling isn't the candidate's fault, only real failures use up a retry
+            retry_count = candidate.get('retry_count', 0)
+            if analysis.get('recommendation') != "Analysis Deferred":
+                retry_count += 1
+            update = {**analysis_fields(analysis, retry_count), **candidate_search_fields(analysis, text)}
+            if text is restored:
+                update.update(text_fields(text, text_codec))
+            if update['status'] == "success":
+                matching_engine.add_candidate({
+                    "candidate_id": candidate['candidate_id'],
+                    "resume_text": text,
+                    "skills_found": analysis.get('skills_found', [])
+                })
+        
+        update['processed_at'] = datetime.now().isoformat()
+        write_candidate(
+            candidates_collection, candidate_details_collection, candidate['candidate_id'], update,
+            unset={"next_retry_at": ""} if update['status'] != "deferred" else None
+        )
+        record_transition(job_stats_collection, job_id, candidate, update)
+        print(f"Retried candidate: {candidate['candidate_id']} ({update['status']})")
+    
+    return retried
+
+def retry_sweep_loop():
+    while True:
+        time.sleep(LLM_RETRY_SWEEP_SECONDS)
+        try:
+            retry_deferred_candidates()
+        except Exception as e:
+            print(f"Retry sweep failed: {e}")
+
+if LLM_RETRY_SWEEP_SECONDS > 0 and __name__ != '__mp_main__':
+    threading.Thread(target=retry_sweep_loop, daemon=True, name='llm-retry-sweep').start()
+
+def requeue_stale_resumes(limit=100):
+    """
+    Renews the lease of the candidates this process holds, then requeues
+    candidates left "queued" or "processing" by a process that stopped: their
+    lease ran out (or, stored before leases, they were uploaded more than a
+    lease ago). Each one is claimed atomically with a fresh lease, so several
+    app processes can sweep at the same time.
+
+    Returns:
+        int: Number of candidates requeued
+    """
+    with in_flight_lock:
+        held = list(in_flight_resumes)
+    now = datetime.now()
+    lease = (now + timedelta(seconds=RESUME_LEASE_SECONDS)).isoformat()
+    if held:
+        candidates_collection.update_many({"candidate_id": {"$in": held}}, {"$set": {"lease_until": lease}})
+
+    requeued = 0
+    while requeued < limit:
+        candidate = candidates_collection.find_one_and_update(
+            {"status": {"$in": ["queued", "processing"]}, "$or": [
+                {"lease_until": {"$lte": now.isoformat()}},
+                {"lease_until": {"$exists": False},
+                 "uploaded_at": {"$lte": (now - timedelta(seconds=RESUME_LEASE_SECONDS)).isoformat()}}
+            ]},
+            {"$set": {"status": "queued", "lease_until": lease}},
+            projection={"candidate_id": 1, "job_id": 1, "file_hash": 1, "status": 1, "batch_id": 1}
+        )
+        if not candidate:
+            break
+        requeued += 1
+        candidate_id, job_id = candidate['candidate_id'], candidate.get('job_id')
+        if candidate['status'] == "processing":
+            record_transition(job_stats_collection, job_id, {"status": "processing"}, {"status": "queued"})
+
+        job = job_catalog.get(job_id)
+        file_path = resume_store.locate(candidate['file_hash']) if candidate.get('file_hash') else None
+        if not job or not file_path:
+            update = processing_failed(candidate_id, "Requeue impossible: job or resume file no longer available")
+            update['processed_at'] = datetime.now().isoformat()
+            write_candidate(candidates_collection, candidate_details_collection, candidate_id, update,
+                            unset={"lease_until": ""})
+            record_transition(job_stats_collection, job_id, {"status": "queued"}, update)
+            continue
+        print(f"Requeued stale candidate: {candidate_id}")
+        queue_resume(candidate_id, file_path, job, candidate['file_hash'], batched="batch_id" in candidate)
+
+    return requeued
+
+def resume_lease_loop():
+    while True:
+        time.sleep(max(1, RESUME_LEASE_SECONDS // 3))
+        try:
+            requeue_stale_resumes()
+        except Exception as e:
+            print(f"Resume lease sweep failed: {e}")
+
+if RESUME_LEASE_SECONDS > 0 and __name__ != '__mp_main__':
+    threading.Thread(target=resume_lease_loop, daemon=True, name='resume-lease-sweep').start()
+
+def run_rescore(run_id, job):
+    """Re-scores a job's candidates in the background, recording progress on the run document."""
+    def record(progress):
+        rescore_runs_collection.update_one({"run_id": run_id}, {"$set": progress})
+
+    try:
+        rescore_runs_collection.update_one({"run_id": run_id}, {"$set": {"status": "running"}})
+        progress = rescore_job(
+            candidates_collection, candidate_details_collection, text_codec, job, screen_resume, format_analysis_text,
+            concurrency=RESCORE_CONCURRENCY,
+            on_progress=record,
+            extra_fields=lambda doc, analysis: candidate_search_fields(analysis, doc['resume_text'])
+        )
+        # Scores moved in both directions, so recompute this job's stats exactly
+        rebuild_job_stats(job_stats_collection, candidates_collection, job['job_id'])
+        record({**progress, "status": "completed", "finished_at": datetime.now().isoformat()})
     except Exception as e:
-        print(f"AI Analysis Error: {e}")
-        return {
-            "match_score": 0,
-            "recommendation": "Analysis Failed",
-            "reasoning": f"AI failed to analyze: {str(e)}",
-            "key_strengths": [],
-            "missing_skills": [],
-            "skills_found": [],
-            "experience_summary": "Analysis error",
-            "education": "Unknown",
-            "estimated_experience_years": 0
-        }
+        print(f"Rescore run failed ({run_id}): {e}")
+        record({"status": "error", "error": str(e), "finished_at": datetime.now().isoformat()})
 
 # FLASK Routing for 3 web pages
 
@@ -305,45 +907,47 @@ def admin():
 @app.route('/api/jobs', methods=['GET', 'POST'])
 def handle_jobs():
     if request.method == 'POST':
+        # Multipart upload from the admin page, or a raw JSON / NDJSON body from an ATS feed
         file = request.files.get('file')
-        if not file:
+        if file:
+            stream = file.stream
+        elif request.mimetype in ['application/json', 'application/x-ndjson']:
+            stream = request.stream
+        else:
             return jsonify({"error": "No file provided"}), 400
         
-        try:
-            jobs = json.loads(file.read())
-            if not isinstance(jobs, list):
-                jobs = [jobs]
-            
-            inserted_count = 0
+        def on_batch(jobs):
+            job_catalog.invalidate()
             for j in jobs:
-                # Ensure both id and job_id fields exist
-                if 'job_id' not in j and 'id' in j:
-                    j['job_id'] = j['id']
-                elif 'job_id' not in j:
-                    j['job_id'] = str(uuid.uuid4())
-                
-                j['id'] = j['job_id']  # Mirror for consistency
-                j['uploaded_at'] = datetime.now().isoformat()
-                
-                jobs_collection.update_one(
-                    {"job_id": j['job_id']},
-                    {"$set": j},
-                    upsert=True
-                )
-                inserted_count += 1
-            
-            return jsonify({
-                "success": True,
-                "message": f"Successfully uploaded {inserted_count} job(s)"
-            })
-        except json.JSONDecodeError:
-            return jsonify({"error": "Invalid JSON file"}), 400
+                analysis_cache.invalidate_job(j['job_id'])
+                matching_engine.add_job(j)
+        
+        try:
+            summary = import_jobs(stream, jobs_collection, batch_size=JOB_IMPORT_BATCH_SIZE, on_batch=on_batch)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
+        
+        written = summary['inserted'] + summary['updated']
+        if written == 0 and summary['error_count']:
+            return jsonify({"error": "Invalid JSON file", **summary}), 400
+        
+        return jsonify({
+            "success": True,
+            "message": f"Successfully uploaded {written} job(s)"
+                       + (f", {summary['error_count']} record(s) failed" if summary['error_count'] else ""),
+            **summary
+        })
     
-    # GET request
-    jobs = list(jobs_collection.find())
-    return jsonify({"jobs": mongo_to_json(jobs)})
+    # GET request: served from the job catalog, 304 when the client's copy is current
+    catalog = job_catalog.snapshot()
+    response = app.response_class(catalog['body'], mimetype='application/json')
+    response.set_etag(catalog['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({"error": f"Upload too large (max {MAX_BULK_UPLOAD_MB} MB per request)"}), 413
 
 # End point for admin page
 @app.route('/api/upload-jobs', methods=['POST'])
@@ -352,6 +956,9 @@ def upload_jobs():
 
 @app.route('/api/upload-resume', methods=['POST'])
 def upload_resume():
+    if (request.content_length or 0) > MAX_RESUME_BYTES + MULTIPART_OVERHEAD:
+        return jsonify({"error": f"File too large (max {MAX_RESUME_MB} MB)"}), 413
+    
     file = request.files.get('file')
     job_id = request.form.get('job_id')
     
@@ -361,108 +968,274 @@ def upload_resume():
         return jsonify({"error": "Missing file or job_id"}), 400
 
     # Find job
-    job = jobs_collection.find_one({"job_id": job_id})
+    job = job_catalog.get(job_id)
     if not job:
         print(f"Job not found: {job_id}")
         return jsonify({"error": f"Job not found: {job_id}"}), 404
 
-    # Save file
+    # Save file in chunks, hashing it on the way (stored once per distinct content)
     filename = secure_filename(file.filename)
-    unique_name = f"{uuid.uuid4()}_{filename}"
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-    file.save(file_path)
-    print(f"Saved: {file_path}")
+    try:
+        file_hash, file_path, file_size = resume_store.put(file.stream, filename, max_bytes=MAX_RESUME_BYTES)
+    except FileTooLarge as e:
+        return jsonify({"error": f"File is {e}"}), 413
+    print(f"Saved: {file_path} ({file_size} bytes)")
 
-    # Extract text
-    text, error = extract_text_from_resume(file_path)
-    
+    # Queue extraction + analysis, respond right away
     candidate_id = str(uuid.uuid4())
+    candidate_data = {
+        "candidate_id": candidate_id,
+        "id": candidate_id,
+        "job_id": job_id,
+        "job_title": job.get('title', 'Unknown'),
+        "filename": filename,
+        "file_hash": file_hash,
+        "match_score": 0,
+        "recommendation": "Pending",
+        "status": "queued",
+        "uploaded_at": datetime.now().isoformat()
+    }
+    candidates_collection.insert_one(candidate_data)
+    resume_store.add_refs([file_hash])
+    record_transition(job_stats_collection, job_id, None, {"status": "queued"})
+    queue_resume(candidate_id, file_path, job, file_hash)
+    print(f"Queued candidate: {candidate_id}")
     
-    if error:
-        print(f"Extraction failed: {error}")
-        candidate_data = {
-            "candidate_id": candidate_id,
-            "id": candidate_id,
-            "job_id": job_id,
-            "job_title": job.get('title', 'Unknown'),
-            "filename": filename,
-            "match_score": 0,
-            "recommendation": "Parsing Failed",
-            "reasoning": error,
-            "status": "error",
-            "uploaded_at": datetime.now().isoformat(),
-            "analysis": f"Failed to extract text: {error}"
-        }
-    else:
-        print(f"Extracted {len(text)} chars. Running AI analysis...")
-        analysis = analyze_resume_with_ai(text, job)
-        
-        # Format for display
-        analysis_text = f"""Match Score: {analysis.get('match_score', 0)}/100
-Recommendation: {analysis.get('recommendation', 'Unknown')}
+    return jsonify({
+        "success": True,
+        "message": "Resume received and queued for analysis!",
+        "candidate_id": candidate_id,
+        "status": "queued",
+        "candidate": candidate_data
+    }), 202
 
-Key Strengths:
-{chr(10).join('• ' + s for s in analysis.get('key_strengths', []))}
+@app.route('/api/upload-resumes', methods=['POST'])
+def upload_resumes():
+    """Bulk upload: any number of resumes and/or ZIP archives for one job."""
+    if (request.content_length or 0) > MAX_BULK_UPLOAD_MB * 1024 * 1024:
+        return jsonify({"error": f"Upload too large (max {MAX_BULK_UPLOAD_MB} MB per request)"}), 413
+    
+    files = request.files.getlist('files') + request.files.getlist('file')
+    job_id = request.form.get('job_id')
+    if not files or not job_id:
+        return jsonify({"error": "Missing files or job_id"}), 400
+    
+    job = job_catalog.get(job_id)
+    if not job:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    
+    batch_id = str(uuid.uuid4())
+    upload_batches_collection.insert_one({
+        "batch_id": batch_id,
+        "job_id": job_id,
+        "status": "receiving",
+        "created_at": datetime.now().isoformat()
+    })
+    
+    def on_batch(saved):
+        record_transition(job_stats_collection, job_id, None, {"status": "queued"}, count=len(saved))
+        for candidate, file_path in saved:
+            queue_resume(candidate['candidate_id'], file_path, job, candidate['file_hash'], batched=True)
+    
+    try:
+        summary = ingest_resumes(
+            files, job, candidates_collection, resume_store, ALLOWED_RESUME_EXTENSIONS,
+            batch_id, on_batch=on_batch, max_file_bytes=MAX_RESUME_BYTES
+        )
+    except Exception as e:
+        print(f"Bulk upload failed ({batch_id}): {e}")
+        upload_batches_collection.update_one({"batch_id": batch_id}, {"$set": {"status": "error", "error": str(e)}})
+        return jsonify({"error": str(e), "batch_id": batch_id}), 500
+    
+    upload_batches_collection.update_one({"batch_id": batch_id}, {"$set": {**summary, "status": "received"}})
+    print(f"Bulk upload {batch_id}: {summary['queued']} queued, {summary['duplicates']} duplicate(s), "
+          f"{summary['error_count']} rejected")
+    
+    if summary['queued'] == 0 and summary['duplicates'] == 0:
+        return jsonify({"error": "No valid resumes in the upload", "batch_id": batch_id, **summary}), 400
+    
+    return jsonify({
+        "success": True,
+        "message": f"{summary['queued']} resume(s) queued for analysis"
+                   + (f", {summary['duplicates']} duplicate(s) skipped" if summary['duplicates'] else "")
+                   + (f", {summary['error_count']} file(s) rejected" if summary['error_count'] else ""),
+        "batch_id": batch_id,
+        **summary
+    }), 202
 
-Missing Skills:
-{chr(10).join('• ' + s for s in analysis.get('missing_skills', []))}
+@app.route('/api/upload-batches/<batch_id>', methods=['GET'])
+def get_upload_batch(batch_id):
+    batch = upload_batches_collection.find_one({"batch_id": batch_id}, {"_id": 0})
+    if not batch:
+        return jsonify({"error": f"Upload batch not found: {batch_id}"}), 404
+    return jsonify({**batch, **batch_progress(candidates_collection, batch_id)})
 
-Skills Found: {', '.join(analysis.get('skills_found', []))}
+@app.route('/api/candidates/<candidate_id>/status', methods=['GET'])
+def get_candidate_status(candidate_id):
+    candidate = candidates_collection.find_one(
+        {"candidate_id": candidate_id},
+        {"resume_text": 0}
+    )
+    if not candidate:
+        return jsonify({"error": f"Candidate not found: {candidate_id}"}), 404
+    
+    # Deferred candidates are stored and will be analyzed by the retry sweep
+    done = candidate.get('status') in ['success', 'error', 'deferred']
+    if done:
+        candidate = attach_details(candidate_details_collection, [candidate])[0]
+    return jsonify({
+        "candidate_id": candidate_id,
+        "status": candidate.get('status'),
+        "done": done,
+        "candidate": candidate if done else None
+    })
 
-Experience: {analysis.get('experience_summary', 'N/A')}
-Education: {analysis.get('education', 'N/A')}
-Years of Experience: {analysis.get('estimated_experience_years', 0)}
+@app.route('/api/jobs/<job_id>/rescore', methods=['POST'])
+def rescore_candidates(job_id):
+    job = job_catalog.get(job_id)
+    if not job:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    
+    run_id = str(uuid.uuid4())
+    rescore_runs_collection.insert_one({
+        "run_id": run_id,
+        "job_id": job_id,
+        "status": "queued",
+        "started_at": datetime.now().isoformat()
+    })
+    rescore_executor.submit(run_rescore, run_id, job)
+    
+    return jsonify({"success": True, "run_id": run_id, "status": "queued"}), 202
 
-Reasoning: {analysis.get('reasoning', 'N/A')}"""
-        
-        candidate_data = {
-            "candidate_id": candidate_id,
-            "id": candidate_id,
-            "job_id": job_id,
-            "job_title": job.get('title'),
-            "filename": filename,
-            "resume_text": text[:1000],
-            "status": "success",
-            "uploaded_at": datetime.now().isoformat(),
-            "analysis": analysis_text,
-            **analysis
+@app.route('/api/rescore/<run_id>', methods=['GET'])
+def get_rescore_progress(run_id):
+    run = rescore_runs_collection.find_one({"run_id": run_id}, {"_id": 0})
+    if not run:
+        return jsonify({"error": f"Rescore run not found: {run_id}"}), 404
+    return jsonify(run)
+
+@app.route('/api/candidates', methods=['GET'])
+def get_candidates():
+    try:
+        query = candidate_filters(request.args)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid filter value"}), 400
+    summary = request.args.get('view') == 'summary'
+    projection = CANDIDATE_SUMMARY_FIELDS if summary else CANDIDATE_FULL_FIELDS
+    sort = [("match_score", -1), ("candidate_id", -1)]
+    
+    # NDJSON export streams every matching candidate straight from the cursor
+    if request.args.get('format') == 'ndjson':
+        cursor = candidates_collection.find(query, projection).sort(sort).batch_size(500)
+        if not summary:
+            cursor = iter_with_details(candidate_details_collection, cursor)
+        def generate():
+            for candidate in cursor:
+                yield app.json.dumps(candidate) + "\n"
+        return Response(generate(), mimetype='application/x-ndjson', headers={
+            "Content-Disposition": "attachment; filename=candidates.ndjson"
+        })
+    
+    limit = max(1, min(request.args.get('limit', CANDIDATE_PAGE_SIZE, type=int), CANDIDATE_MAX_PAGE_SIZE))
+    if request.args.get('cursor'):
+        try:
+            query = {"$and": [query, decode_page_cursor(request.args['cursor'])]}
+        except Exception:
+            return jsonify({"error": "Invalid cursor"}), 400
+    
+    # Fetch one extra row to know whether another page exists
+    results = list(candidates_collection.find(query, projection).sort(sort).limit(limit + 1))
+    next_cursor = encode_page_cursor(results[limit - 1]) if len(results) > limit else None
+    results = results[:limit]
+    if not summary:
+        results = attach_details(candidate_details_collection, results)
+    
+    return jsonify({
+        "candidates": results,
+        "count": len(results),
+        "next_cursor": next_cursor
+    })
+
+@app.route('/api/candidates/search', methods=['GET'])
+def search_candidates_route():
+    """
+    Candidate search: skills (all of), any_skills, exclude_skills, min_years,
+    max_years and q (full text), combined with the /api/candidates filters.
+    """
+    try:
+        query = candidate_filters(request.args)
+        limit = max(1, min(request.args.get('limit', SEARCH_LIMIT, type=int), SEARCH_MAX_LIMIT))
+        projection = CANDIDATE_FULL_FIELDS if request.args.get('view') == 'full' else {
+            **CANDIDATE_SUMMARY_FIELDS, "skill_keys": 1, "experience_years": 1
         }
+        results = search_candidates(
+            candidates_collection, candidate_details_collection, request.args, query, projection, limit
+        )
+        if request.args.get('view') == 'full':
+            results = attach_details(candidate_details_collection, results)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid filter value"}), 400
+    except OperationFailure as e:
+        # $text without the candidate_search_terms index, or a malformed text query
+        return jsonify({"error": f"Search failed: {e}"}), 400
+    
+    return jsonify({"candidates": results, "count": len(results)})
 
-    candidates_collection.insert_one(candidate_data)
-    print(f"Saved candidate: {candidate_id}")
+@app.route('/api/candidates/<candidate_id>', methods=['GET'])
+def get_candidate(candidate_id):
+    candidate = candidates_collection.find_one({"candidate_id": candidate_id}, CANDIDATE_FULL_FIELDS)
+    if not candidate:
+        return jsonify({"error": f"Candidate not found: {candidate_id}"}), 404
+    return jsonify({"candidate": attach_details(candidate_details_collection, [candidate])[0]})
+
+@app.route('/api/match/candidates/<candidate_id>/jobs', methods=['GET'])
+def match_jobs_for_candidate(candidate_id):
+    limit = max(1, request.args.get('limit', 5, type=int))
+    matches = get_matching_engine().top_jobs_for_candidate(candidate_id, limit)
+    if matches is None:
+        return jsonify({"error": f"Candidate not found or not analyzed: {candidate_id}"}), 404
     
+    jobs = job_catalog.snapshot()['by_id']
+    titles = {job_id: jobs[job_id].get('title') for job_id, _ in matches if job_id in jobs}
     return jsonify({
-        "success": True,
-        "message": "Resume processed successfully!",
-        "candidate": mongo_to_json(candidate_data)
+        "candidate_id": candidate_id,
+        "jobs": [
+            {"job_id": job_id, "title": titles.get(job_id, 'Unknown'), "similarity": similarity}
+            for job_id, similarity in matches
+        ]
     })
 
-@app.route('/api/candidates', methods=['GET'])
-def get_candidates():
-    job_id = request.args.get('job_id')
-    query = {"job_id": job_id} if job_id else {}
-    results = list(candidates_collection.find(query).sort("match_score", -1))
-    return jsonify({"candidates": mongo_to_json(results)})
+@app.route('/api/match/jobs/<job_id>/candidates', methods=['GET'])
+def match_candidates_for_job(job_id):
+    limit = max(1, request.args.get('limit', 10, type=int))
+    matches = get_matching_engine().top_candidates_for_job(job_id, limit)
+    if matches is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    
+    candidates = {
+        c['candidate_id']: c
+        for c in candidates_collection.find(
+            {"candidate_id": {"$in": [m[0] for m in matches]}},
+            {"_id": 0, "candidate_id": 1, "job_id": 1, "job_title": 1, "filename": 1, "match_score": 1}
+        )
+    }
+    return jsonify({
+        "job_id": job_id,
+        "candidates": [
+            {**candidates.get(candidate_id, {"candidate_id": candidate_id}), "similarity": similarity}
+            for candidate_id, similarity in matches
+        ]
+    })
+
+@app.route('/api/match/rebuild', methods=['POST'])
+def rebuild_matching():
+    matching_engine.built = False
+    return jsonify(get_matching_engine().stats())
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     try:
-        total_jobs = jobs_collection.count_documents({})
-        total_candidates = candidates_collection.count_documents({})
-        
-        # Jobs with at least one candidate
-        pipeline = [
-            {"$group": {"_id": "$job_id"}},
-            {"$count": "count"}
-        ]
-        result = list(candidates_collection.aggregate(pipeline))
-        jobs_with_candidates = result[0]['count'] if result else 0
-        
-        return jsonify({
-            "total_jobs": total_jobs,
-            "total_candidates": total_candidates,
-            "jobs_with_candidates": jobs_with_candidates
-        })
+        return jsonify(get_summary(job_stats_collection, jobs_collection))
     except Exception as e:
         return jsonify({
             "total_jobs": 0,
@@ -470,6 +1243,69 @@ def get_stats():
             "jobs_with_candidates": 0
         }), 500
 
+@app.route('/api/stats/jobs', methods=['GET'])
+def get_stats_per_job():
+    return jsonify({"jobs": get_job_stats(job_stats_collection)})
+
+@app.route('/api/stats/rebuild', methods=['POST'])
+def rebuild_stats():
+    job_id = request.args.get('job_id')
+    rebuilt = rebuild_job_stats(job_stats_collection, candidates_collection, job_id=job_id)
+    return jsonify({"success": True, "jobs_rebuilt": rebuilt})
+
+@app.route('/api/diagnostics/queries', methods=['GET'])
+def query_diagnostics():
+    try:
+        report = explain_queries(db)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify({
+        "queries": report,
+        "collection_scans": [q['query'] for q in report if q.get('collection_scan')],
+        "in_memory_sorts": [q['query'] for q in report if q.get('in_memory_sort')]
+    })
+
+@app.route('/api/webhooks/llmwhisperer', methods=['POST'])
+def llmwhisperer_webhook():
+    # LLMWhisperer sends the auth token registered with the webhook as a Bearer token. Without a
+    # configured token nothing is accepted: anyone could otherwise complete whispers or inject text
+    if not LLMWHISPERER_WEBHOOK_TOKEN:
+        return jsonify({"error": "Webhook disabled: LLMWHISPERER_WEBHOOK_TOKEN is not set"}), 403
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {LLMWHISPERER_WEBHOOK_TOKEN}"):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    payload = request.get_json(silent=True) or {}
+    whisper_hash = payload.get('whisper_hash')
+    if not whisper_hash:
+        return jsonify({"error": "Missing whisper_hash"}), 400
+    
+    text = payload.get('result_text') or (payload.get('extraction') or {}).get('result_text')
+    delivered = complete_whisper(whisper_hash, text.strip() if text else None)
+    print(f"LLMWhisperer webhook: {whisper_hash} ({'delivered' if delivered else 'no waiter'})")
+    return jsonify({"success": True, "delivered": delivered})
+
+@app.route('/api/llm/status', methods=['GET'])
+def llm_status():
+    return jsonify({
+        **llm_guard.stats(),
+        "deferred_candidates": candidates_collection.count_documents({"status": "deferred"}),
+        "batching": analysis_batcher.stats() if analysis_batcher else None
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        "extraction": extraction_cache.stats(),
+        "analysis": analysis_cache.stats(),
+        "local_extraction": local_extractor.stats(),
+        "job_catalog": job_catalog.stats()
+    })
+
+@app.route('/api/storage/stats', methods=['GET'])
+def storage_stats():
+    return jsonify({**resume_store.stats(), "resume_text": text_codec.stats()})
+
 @app.route('/api/health')
 def health():
     try:
@@ -488,6 +1324,7 @@ def health():
 if __name__ == '__main__':
     print("AI Recruitment System Starting...")
     print(f"Upload folder: {UPLOAD_FOLDER}")
+    print(f"Resume workers: {RESUME_WORKERS}")
     print(f"LLMWhisperer: {'Configured' if os.getenv('LLMWHISPERER_API_KEY') else 'Missing'}")
     print(f"OpenRouter: {'Configured' if os.getenv('OPENROUTER_API_KEY') else 'Missing'}")
     print(f"MongoDB: {'Configured' if os.getenv('MONGODB_URI') else 'Missing'}")
@@ -0,0 +1,408 @@
+"""
+Async (ASGI) serving mode.
+
+The upload + analysis pipeline and the hot read endpoints run on asyncio:
+Motor for MongoDB, httpx for LLMWhisperer and AsyncOpenAI for OpenRouter, so
+a worker waiting on a provider keeps serving other requests. Every other
+route (pages, job import, rescore, matching, diagnostics, webhook) is the
+unchanged Flask app mounted underneath, so JSON contracts are identical.
+
+    uvicorn asgi:app --workers 2
+"""
+import os
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from openai import AsyncOpenAI
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.datastructures import FormData
+from starlette.formparsers import FormParser, MultiPartParser
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route, Mount
+from werkzeug.utils import secure_filename
+
+from app import (
+    app as flask_app, LLM_MODEL, PROMPT_VERSION,
+    CANDIDATE_SUMMARY_FIELDS, CANDIDATE_FULL_FIELDS, CANDIDATE_PAGE_SIZE, CANDIDATE_MAX_PAGE_SIZE,
+    LLM_TIMEOUT, RETRYABLE_RECOMMENDATIONS, MAX_RESUME_MB, MAX_RESUME_BYTES, MULTIPART_OVERHEAD,
+    prefilter_screen, llm_stage,
+    analysis_cache, extraction_cache, local_extractor, matching_engine, llm_guard, resume_store, job_catalog,
+    candidate_filters, encode_page_cursor, decode_page_cursor,
+    build_analysis_prompt, parse_analysis_response, failed_analysis, provider_error_analysis, analysis_fields,
+    candidate_search_fields, resume_excerpt, text_codec, track_resume, release_resume
+)
+from cache import analysis_cache_key, sha256_file
+from candidate_store import DETAIL_VIEW, update_operations, merge_details, text_fields
+from storage import FileTooLarge
+from stats import transition_update
+from llmwhisperer import extract_text_from_resume_async, get_async_client
+
+# Resumes processed at once per worker; they mostly wait on I/O, so this can be far above RESUME_WORKERS
+ASYNC_RESUME_CONCURRENCY = int(os.getenv('ASYNC_RESUME_CONCURRENCY', 32))
+resume_slots = asyncio.Semaphore(ASYNC_RESUME_CONCURRENCY)
+background_tasks = set()  # Keeps queued process_resume tasks referenced until they finish
+
+# Async DB Setup (same database as app.py)
+mongo = AsyncIOMotorClient(os.getenv('MONGODB_URI'))
+db = mongo[os.getenv('DATABASE_NAME', 'recruitment_db')]
+jobs_collection = db['jobs']
+candidates_collection = db['candidates']
+candidate_details_collection = db['candidate_details']
+job_stats_collection = db['job_stats']
+
+async_llm_client = AsyncOpenAI(
+    base_url="https://openrouter.ai/api/v1",
+    api_key=os.getenv("OPENROUTER_API_KEY"),
+    timeout=LLM_TIMEOUT,
+    max_retries=0
+)
+
+def json_response(data, status_code=200):
+    """JSON response encoded by the Flask app's BSON-aware provider."""
+    return Response(flask_app.json.dumps(data), status_code=status_code, media_type='application/json')
+
+async def record_transition(job_id, old=None, new=None):
+    update = transition_update(old, new)
+    if update is None:
+        return
+    try:
+        await job_stats_collection.update_one({"job_id": job_id}, update, upsert=True)
+    except Exception as e:
+        print(f"Error updating job stats for {job_id}: {e}")
+
+# ANALYSIS
+
+async def analyze_resume_with_ai(resume_text, job_data):
+    """Async analyze_resume_with_ai(), sharing the prompt and the analysis cache with app.py."""
+    # Trimming the resume to the prompt budget (sections.py) is CPU work, kept off the event loop
+    excerpt = await asyncio.to_thread(resume_excerpt, resume_text, job_data)
+    cache_key = analysis_cache_key(excerpt, job_data, LLM_MODEL, PROMPT_VERSION)
+    cached = analysis_cache.get(cache_key)
+    if cached:
+        print(f"AI Analysis cache hit: Match Score = {cached.get('match_score', 0)}")
+        return cached
+
+    prompt = await asyncio.to_thread(build_analysis_prompt, resume_text, job_data)
+    try:
+        completion = await llm_guard.call_async(lambda: async_llm_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1
+        ))
+    except Exception as e:
+        return provider_error_analysis(e)
+
+    raw_content = completion.choices[0].message.content
+    try:
+        result = parse_analysis_response(raw_content)
+    except Exception as e:
+        result = failed_analysis(e)
+    result['raw_response'] = raw_content
+
+    if result.get('recommendation') not in RETRYABLE_RECOMMENDATIONS:
+        analysis_cache.put(cache_key, result, job_id=job_data.get('job_id'))
+    return result
+
+async def screen_resume(resume_text, job_data):
+    prefilter_score, analysis = await asyncio.to_thread(prefilter_screen, resume_text, job_data)
+    if analysis is None:
+        analysis = llm_stage(await analyze_resume_with_ai(resume_text, job_data), prefilter_score)
+    return analysis
+
+# BACKGROUND RESUME PROCESSING
+
+async def extract_text(file_path):
+    text, reason = await local_extractor.extract_async(file_path)
+    if text:
+        print(f"Extracted locally: {os.path.basename(file_path)}")
+        return text, None
+    print(f"Using LLMWhisperer OCR for {os.path.basename(file_path)}: {reason}")
+    return await extract_text_from_resume_async(file_path)
+
+async def process_resume(candidate_id, file_path, job, file_hash=None):
+    """asyncio version of app.process_resume(), writing the same candidate fields."""
+    async with resume_slots:
+        try:
+            await candidates_collection.update_one(
+                {"candidate_id": candidate_id},
+                {"$set": {"status": "processing"}}
+            )
+            await record_transition(job['job_id'], {"status": "queued"}, {"status": "processing"})
+
+            if file_hash is None:
+                file_hash = await asyncio.to_thread(sha256_file, file_path)
+                await candidates_collection.update_one(
+                    {"candidate_id": candidate_id},
+                    {"$set": {"file_hash": file_hash}}
+                )
+
+            # The extraction cache is shared with the Flask side, its pymongo calls go to a thread
+            text = await asyncio.to_thread(extraction_cache.get, file_hash)
+            error = None
+            if text:
+                print(f"Extraction cache hit: {file_hash[:12]}")
+            else:
+                text, error = await extract_text(file_path)
+                if not error:
+                    await asyncio.to_thread(extraction_cache.put, file_hash, text)
+
+            if error:
+                print(f"Extraction failed: {error}")
+                update = {
+                    "match_score": 0,
+                    "recommendation": "Parsing Failed",
+                    "reasoning": error,
+                    "status": "error",
+                    "analysis": f"Failed to extract text: {error}"
+                }
+            else:
+                analysis = await screen_resume(text, job)
+                update = {
+                    **await asyncio.to_thread(text_fields, text, text_codec), **analysis_fields(analysis),
+                    **await asyncio.to_thread(candidate_search_fields, analysis, text)
+                }
+                if update['status'] == "success":
+                    # Takes the engine's lock, which a rebuild can hold for seconds
+                    await asyncio.to_thread(matching_engine.add_candidate, {
+                        "candidate_id": candidate_id,
+                        "resume_text": text,
+                        "skills_found": analysis.get('skills_found', [])
+                    })
+        except Exception as e:
+            print(f"Resume processing error ({candidate_id}): {e}")
+            update = {
+                "match_score": 0,
+                "recommendation": "Processing Failed",
+                "reasoning": str(e),
+                "status": "error",
+                "analysis": f"Processing failed: {e}"
+            }
+
+        update['processed_at'] = datetime.now().isoformat()
+        summary_update, details_update = update_operations(update, {"lease_until": ""})
+        try:
+            if details_update:
+                await candidate_details_collection.update_one({"_id": candidate_id}, details_update, upsert=True)
+            await candidates_collection.update_one({"candidate_id": candidate_id}, summary_update)
+        finally:
+            release_resume(candidate_id)
+        await record_transition(job['job_id'], {"status": "processing"}, update)
+        print(f"Processed candidate: {candidate_id} ({update['status']})")
+
+# API routes
+
+async def attach_details(candidates):
+    """candidate_store.attach_details() with Motor: one details query for a page of candidates."""
+    if not candidates:
+        return candidates
+    docs = await candidate_details_collection.find(
+        {"_id": {"$in": [candidate['candidate_id'] for candidate in candidates]}}, DETAIL_VIEW
+    ).to_list(None)
+    return merge_details(candidates, docs)
+
+async def catalog_snapshot():
+    # Fresh snapshots come straight from memory, a reload's pymongo query runs off the loop
+    return job_catalog.cached() or await asyncio.to_thread(job_catalog.snapshot)
+
+async def get_jobs(request):
+    catalog = await catalog_snapshot()
+    etag = f'"{catalog["etag"]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+    return Response(catalog['body'], media_type='application/json', headers=headers)
+
+async def read_form(request, max_bytes):
+    """
+    request.form() that stops reading the body after max_bytes, so a request
+    without a Content-Length (chunked) can't spool an unbounded upload to disk.
+
+    Raises:
+        FileTooLarge: the body is larger than max_bytes
+    """
+    async def limited_stream():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise FileTooLarge(f"larger than {max_bytes // (1024 * 1024)} MB")
+            yield chunk
+
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('multipart/form-data'):
+        return await MultiPartParser(request.headers, limited_stream()).parse()
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        return await FormParser(request.headers, limited_stream()).parse()
+    return FormData()
+
+async def upload_resume(request):
+    if int(request.headers.get('content-length') or 0) > MAX_RESUME_BYTES + MULTIPART_OVERHEAD:
+        return json_response({"error": f"File too large (max {MAX_RESUME_MB} MB)"}, 413)
+
+    try:
+        form = await read_form(request, MAX_RESUME_BYTES + MULTIPART_OVERHEAD)
+    except FileTooLarge:
+        return json_response({"error": f"File too large (max {MAX_RESUME_MB} MB)"}, 413)
+    file = form.get('file')
+    job_id = form.get('job_id')
+
+    if not file or not getattr(file, 'filename', None) or not job_id:
+        return json_response({"error": "Missing file or job_id"}, 400)
+
+    job = (await catalog_snapshot())['by_id'].get(job_id) or await asyncio.to_thread(job_catalog.get, job_id)
+    if not job:
+        return json_response({"error": f"Job not found: {job_id}"}, 404)
+
+    filename = secure_filename(file.filename)
+    try:
+        file_hash, file_path, _ = await asyncio.to_thread(resume_store.put, file.file, filename, MAX_RESUME_BYTES)
+    except FileTooLarge as e:
+        return json_response({"error": f"File is {e}"}, 413)
+
+    candidate_id = str(uuid.uuid4())
+    candidate_data = {
+        "candidate_id": candidate_id,
+        "id": candidate_id,
+        "job_id": job_id,
+        "job_title": job.get('title', 'Unknown'),
+        "filename": filename,
+        "file_hash": file_hash,
+        "match_score": 0,
+        "recommendation": "Pending",
+        "status": "queued",
+        "uploaded_at": datetime.now().isoformat()
+    }
+    await candidates_collection.insert_one(candidate_data)
+    await asyncio.to_thread(resume_store.add_refs, [file_hash])
+    await record_transition(job_id, None, {"status": "queued"})
+
+    # The app's resume lease sweep renews the lease while the task holds the candidate
+    track_resume(candidate_id)
+    task = asyncio.create_task(process_resume(candidate_id, file_path, job, file_hash))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    return json_response({
+        "success": True,
+        "message": "Resume received and queued for analysis!",
+        "candidate_id": candidate_id,
+        "status": "queued",
+        "candidate": candidate_data
+    }, 202)
+
+async def get_candidate_status(request):
+    candidate_id = request.path_params['candidate_id']
+    candidate = await candidates_collection.find_one(
+        {"candidate_id": candidate_id},
+        {"resume_text": 0}
+    )
+    if not candidate:
+        return json_response({"error": f"Candidate not found: {candidate_id}"}, 404)
+
+    done = candidate.get('status') in ['success', 'error', 'deferred']
+    if done:
+        candidate = (await attach_details([candidate]))[0]
+    return json_response({
+        "candidate_id": candidate_id,
+        "status": candidate.get('status'),
+        "done": done,
+        "candidate": candidate if done else None
+    })
+
+async def get_candidates(request):
+    args = request.query_params
+    try:
+        query = candidate_filters(args)
+    except (TypeError, ValueError):
+        return json_response({"error": "Invalid filter value"}, 400)
+    summary = args.get('view') == 'summary'
+    projection = CANDIDATE_SUMMARY_FIELDS if summary else CANDIDATE_FULL_FIELDS
+    sort = [("match_score", -1), ("candidate_id", -1)]
+
+    if args.get('format') == 'ndjson':
+        cursor = candidates_collection.find(query, projection).sort(sort).batch_size(500)
+        async def generate():
+            batch = []
+            async for candidate in cursor:
+                batch.append(candidate)
+                if len(batch) >= 500:
+                    for row in (batch if summary else await attach_details(batch)):
+                        yield flask_app.json.dumps(row) + "\n"
+                    batch = []
+            for row in (batch if summary else await attach_details(batch)):
+                yield flask_app.json.dumps(row) + "\n"
+        return StreamingResponse(generate(), media_type='application/x-ndjson', headers={
+            "Content-Disposition": "attachment; filename=candidates.ndjson"
+        })
+
+    try:
+        limit = int(args.get('limit', CANDIDATE_PAGE_SIZE))
+    except ValueError:
+        limit = CANDIDATE_PAGE_SIZE
+    limit = max(1, min(limit, CANDIDATE_MAX_PAGE_SIZE))
+    if args.get('cursor'):
+        try:
+            query = {"$and": [query, decode_page_cursor(args['cursor'])]}
+        except Exception:
+            return json_response({"error": "Invalid cursor"}, 400)
+
+    results = await candidates_collection.find(query, projection).sort(sort).limit(limit + 1).to_list(None)
+    next_cursor = encode_page_cursor(results[limit - 1]) if len(results) > limit else None
+    results = results[:limit]
+    if not summary:
+        results = await attach_details(results)
+
+    return json_response({
+        "candidates": results,
+        "count": len(results),
+        "next_cursor": next_cursor
+    })
+
+async def get_stats(request):
+    try:
+        total_candidates, jobs_with_candidates = 0, 0
+        async for s in job_stats_collection.find({}, {"candidate_count": 1}):
+            count = s.get('candidate_count', 0)
+            total_candidates += count
+            if count > 0:
+                jobs_with_candidates += 1
+        return json_response({
+            "total_jobs": await jobs_collection.estimated_document_count(),
+            "total_candidates": total_candidates,
+            "jobs_with_candidates": jobs_with_candidates
+        })
+    except Exception:
+        return json_response({
+            "total_jobs": 0,
+            "total_candidates": 0,
+            "jobs_with_candidates": 0
+        }, 500)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if background_tasks:
+        print(f"Waiting for {len(background_tasks)} resume(s) in progress...")
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+    client = get_async_client()
+    if client is not None:
+        await client.aclose()
+    local_extractor.shutdown()
+    mongo.close()
+
+app = Starlette(
+    routes=[
+        Route('/api/jobs', get_jobs, methods=['GET']),
+        Route('/api/upload-resume', upload_resume, methods=['POST']),
+        Route('/api/candidates', get_candidates, methods=['GET']),
+        Route('/api/candidates/{candidate_id}/status', get_candidate_status, methods=['GET']),
+        Route('/api/stats', get_stats, methods=['GET']),
+        # Everything else (and other methods on the paths above) is served by the Flask app
+        Mount('/', WSGIMiddleware(flask_app))
+    ],
+    lifespan=lifespan
+)
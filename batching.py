@@ -0,0 +1,116 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class AnalysisBatcher:
+    """
+    Groups resumes waiting for AI analysis by job and analyzes them
+    `max_batch` at a time in a single prompt.
+
+    submit() returns a Future right away, so resume workers go back to
+    extracting while analyses accumulate. A job's batch is sent once it is
+    full or its oldest resume has waited `max_wait` seconds. Entries the
+    batch call couldn't produce (unparseable reply, missing or invalid
+    entry) are analyzed one by one with `analyze_one`.
+    """
+
+    def __init__(self, analyze_batch, analyze_one, max_batch=5, max_wait=2.0, workers=4):
+        """
+        Args:
+            analyze_batch (callable): analyze_batch(job, texts) -> list with an analysis dict
+                                      or None per text (raises when the provider call fails)
+            analyze_one (callable): analyze_one(text, job) -> analysis dict
+            max_batch (int): Resumes per prompt
+            max_wait (float): Seconds a resume waits for its batch to fill
+            workers (int): Batches analyzed at once
+        """
+        self.analyze_batch = analyze_batch
+        self.analyze_one = analyze_one
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.counters = {"batches": 0, "batched_resumes": 0, "single_fallbacks": 0}
+        self._pending = {}  # job_id -> {"job", "items": [(text, future)], "deadline"}
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis-batch')
+        self._flusher = None
+
+    def submit(self, job, resume_text):
+        """Queues one resume for analysis against `job`. Returns a Future of the analysis dict."""
+        future = Future()
+        with self._cond:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name='analysis-batcher')
+                self._flusher.start()
+            batch = self._pending.setdefault(job['job_id'], {
+                "job": job, "items": [], "deadline": time.monotonic() + self.max_wait
+            })
+            batch['items'].append((resume_text, future))
+            self._cond.notify()
+        return future
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [job_id for job_id, batch in self._pending.items()
+                       if len(batch['items']) >= self.max_batch or batch['deadline'] <= now]
+                if not due:
+                    deadlines = [batch['deadline'] for batch in self._pending.values()]
+                    self._cond.wait(timeout=min(deadlines) - now if deadlines else None)
+                    continue
+
+                ready = []
+                for job_id in due:
+                    batch = self._pending.pop(job_id)
+                    items = batch['items']
+                    # Full batches go now; a remainder keeps the batch's deadline, so no resume
+                    # waits longer than max_wait
+                    while len(items) >= self.max_batch:
+                        ready.append((batch['job'], items[:self.max_batch]))
+                        items = items[self.max_batch:]
+                    if items and batch['deadline'] <= now:
+                        ready.append((batch['job'], items))
+                    elif items:
+                        self._pending[job_id] = {**batch, "items": items}
+
+            for job, items in ready:
+                self._executor.submit(self._run, job, items)
+
+    def _count(self, name, amount=1):
+        with self._cond:
+            self.counters[name] += amount
+
+    def _run(self, job, items):
+        texts = [text for text, _ in items]
+        try:
+            if len(items) == 1:
+                results = [None]
+            else:
+                results = self.analyze_batch(job, texts)
+                self._count("batches")
+                self._count("batched_resumes", sum(1 for r in results if r is not None))
+        except Exception as e:
+            # The provider call itself failed: don't multiply it by N single calls
+            for _, future in items:
+                future.set_exception(e)
+            return
+
+        for (text, future), result in zip(items, results):
+            try:
+                if result is None:
+                    if len(items) > 1:
+                        self._count("single_fallbacks")
+                    result = self.analyze_one(text, job)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self.counters,
+                "waiting": sum(len(batch['items']) for batch in self._pending.values()),
+                "max_batch": self.max_batch,
+                "max_wait": self.max_wait
+            }
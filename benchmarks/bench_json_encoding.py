@@ -0,0 +1,89 @@
+"""
+Micro-benchmark: old mongo_to_json + jsonify vs. MongoJSONProvider.
+
+Builds 10k candidate documents shaped like the ones upload_resume stores
+(ObjectId _id, datetimes, skill arrays, formatted analysis text) and times
+both ways of turning them into a /api/candidates response body.
+
+    python benchmarks/bench_json_encoding.py [--count 10000] [--repeat 5]
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+from datetime import datetime, timedelta
+
+from bson import ObjectId, json_util
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from json_provider import MongoJSONProvider, orjson  # noqa: E402
+
+
+def make_candidates(count):
+    now = datetime.now()
+    return [
+        {
+            "_id": ObjectId(),
+            "candidate_id": f"cand-{i:06d}",
+            "id": f"cand-{i:06d}",
+            "job_id": str(100 + i % 25),
+            "job_title": "Senior Software Engineer",
+            "filename": f"resume_{i}.pdf",
+            "match_score": i % 101,
+            "recommendation": "Good Match",
+            "status": "success",
+            "uploaded_at": (now - timedelta(minutes=i)).isoformat(),
+            "processed_at": now - timedelta(minutes=i),
+            "skills_found": ["Python", "React", "AWS", "Docker"],
+            "missing_skills": ["Kubernetes"],
+            "key_strengths": ["Backend APIs", "Cloud deployments"],
+            "estimated_experience_years": i % 12,
+            "analysis": "Match Score: 72/100\nRecommendation: Good Match\n" + "Reasoning text. " * 40,
+        }
+        for i in range(count)
+    ]
+
+
+def old_helper(data):
+    """The helper app.py used before the JSON provider."""
+    return json.loads(json_util.dumps(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    candidates = make_candidates(args.count)
+
+    old_app = Flask("old")
+    old_app.json = DefaultJSONProvider(old_app)
+    new_app = Flask("new")
+    new_app.json = MongoJSONProvider(new_app)
+
+    def run_old():
+        with old_app.app_context():
+            return old_app.json.response({"candidates": old_helper(candidates)}).get_data()
+
+    def run_new():
+        with new_app.app_context():
+            return new_app.json.response({"candidates": candidates}).get_data()
+
+    # Same payload either way
+    assert json.loads(run_old()) == json.loads(run_new())
+
+    old_time = min(timeit.repeat(run_old, number=1, repeat=args.repeat))
+    new_time = min(timeit.repeat(run_new, number=1, repeat=args.repeat))
+
+    print(f"{args.count} candidates, best of {args.repeat} (orjson: {'yes' if orjson else 'no'})")
+    print(f"  mongo_to_json + jsonify : {old_time * 1000:8.1f} ms")
+    print(f"  MongoJSONProvider       : {new_time * 1000:8.1f} ms")
+    print(f"  speedup                 : {old_time / new_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
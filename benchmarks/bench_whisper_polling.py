@@ -0,0 +1,139 @@
+"""
+Latency benchmark: fixed 3-second whisper-status polling vs. adaptive backoff.
+
+Starts a local stub of the LLMWhisperer v2 API (whisper, whisper-status,
+whisper-retrieve) where each document takes a simulated processing time
+that depends on its page count, then runs extract_text_from_resume against
+it with the old fixed schedule and the adaptive one (optionally with the
+stub "calling the webhook" on completion).
+
+    python benchmarks/bench_whisper_polling.py [--docs 12] [--webhook]
+"""
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import itertools
+import threading
+import contextlib
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LLMWHISPERER_API_KEY', 'stub')
+
+import llmwhisperer  # noqa: E402
+
+JOBS = {}  # whisper_hash -> ready_at (monotonic)
+WEBHOOK = False
+
+
+class StubWhisperer(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        pages = max(1, body.count(b'/Type /Page'))
+        # ~0.4s fixed overhead + ~0.35s per page, +/-30%
+        processing = (0.4 + 0.35 * pages) * random.uniform(0.7, 1.3)
+        whisper_hash = uuid.uuid4().hex
+        JOBS[whisper_hash] = time.monotonic() + processing
+        if WEBHOOK:
+            threading.Timer(processing, llmwhisperer.complete_whisper, args=(whisper_hash, f"text of {whisper_hash}")).start()
+        self._json(202, {"whisper_hash": whisper_hash, "status": "processing"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        whisper_hash = parse_qs(url.query).get('whisper_hash', [''])[0]
+        ready = time.monotonic() >= JOBS.get(whisper_hash, float('inf'))
+        if url.path.endswith('/whisper-status'):
+            self._json(200, {"status": "processed" if ready else "processing"})
+        elif url.path.endswith('/whisper-retrieve'):
+            self._json(200, {"result_text": f"text of {whisper_hash}"})
+        else:
+            self._json(404, {"message": "not found"})
+
+
+def fixed_delays(file_size, page_count):
+    """The original schedule: sleep 3s, then up to 40 checks 3s apart."""
+    return itertools.repeat(3, 41)
+
+
+def make_documents(count, directory):
+    paths = []
+    for i in range(count):
+        pages = random.choice([1, 1, 2, 2, 3, 4, 6])
+        path = os.path.join(directory, f"resume_{i}.pdf")
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4\n' + b'/Type /Page\n' * pages + os.urandom(20_000 * pages))
+        paths.append(path)
+    return paths
+
+
+def run(paths, poll_delays):
+    def one(path):
+        started = time.monotonic()
+        text, error = llmwhisperer.extract_text_from_resume(path, poll_delays=poll_delays)
+        assert not error, error
+        return time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        return list(pool.map(one, paths))
+
+
+def summarize(name, latencies):
+    p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"  {name:22} mean {statistics.mean(latencies):5.2f}s  "
+          f"p50 {statistics.median(latencies):5.2f}s  p95 {p95:5.2f}s")
+
+
+def main():
+    global WEBHOOK
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=12)
+    parser.add_argument('--webhook', action='store_true', help="Stub completes jobs through the webhook path too")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWhisperer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['LLMWHISPERER_BASE_URL'] = f"http://127.0.0.1:{server.server_port}/api/v2"
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_documents(args.docs, directory)
+        with contextlib.redirect_stdout(io.StringIO()):
+            fixed = run(paths, fixed_delays)
+            adaptive = run(paths, llmwhisperer.whisper_poll_delays)
+            WEBHOOK = args.webhook
+            webhook = run(paths, llmwhisperer.whisper_poll_delays) if args.webhook else None
+    server.shutdown()
+
+    print(f"{args.docs} documents against a local LLMWhisperer stub")
+    summarize("fixed 3s polling", fixed)
+    summarize("adaptive backoff", adaptive)
+    if webhook:
+        summarize("adaptive + webhook", webhook)
+    best = webhook or adaptive
+    saved = statistics.mean(fixed) - statistics.mean(best)
+    print(f"  latency saved per resume: {saved:.2f}s ({saved / statistics.mean(fixed):.0%})")
+
+
+if __name__ == '__main__':
+    main()
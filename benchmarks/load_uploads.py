@@ -0,0 +1,123 @@
+"""
+Load test: concurrent resume uploads against a running server.
+
+Fires --uploads resume uploads with --concurrency clients, waits for each
+candidate to finish through /api/candidates/<id>/status, and keeps probing
+GET /api/stats throughout to show whether the worker still answers cheap
+requests while the pipeline is busy. Run it once against each mode with the
+same worker count:
+
+    gunicorn -w 1 --threads 8 app:app                     # sync Flask
+    uvicorn asgi:app --workers 1                          # async (ASGI)
+
+    python benchmarks/load_uploads.py --url http://localhost:8000 \\
+        --job-id <job_id> --file sample_resume.pdf [--uploads 50] [--concurrency 25]
+"""
+import time
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(name, values):
+    if not values:
+        print(f"  {name:24} no samples")
+        return
+    print(f"  {name:24} mean {statistics.mean(values):7.2f}s  p50 {percentile(values, 0.5):7.2f}s  "
+          f"p95 {percentile(values, 0.95):7.2f}s  max {max(values):7.2f}s")
+
+
+def upload_one(session, args, file_bytes):
+    """Uploads one resume and waits until it's processed. Returns (accept_s, total_s, status)."""
+    started = time.monotonic()
+    response = session.post(
+        f"{args.url}/api/upload-resume",
+        data={"job_id": args.job_id},
+        files={"file": (args.file.rsplit('/', 1)[-1], file_bytes)},
+        timeout=args.timeout
+    )
+    accepted = time.monotonic() - started
+    if response.status_code != 202:
+        return accepted, None, f"HTTP {response.status_code}"
+
+    candidate_id = response.json()['candidate_id']
+    while time.monotonic() - started < args.timeout:
+        time.sleep(args.poll_interval)
+        status = session.get(f"{args.url}/api/candidates/{candidate_id}/status", timeout=args.timeout).json()
+        if status.get('done'):
+            return accepted, time.monotonic() - started, status.get('status')
+    return accepted, None, "timeout"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--job-id', required=True)
+    parser.add_argument('--file', required=True, help="Resume file to upload repeatedly")
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=25)
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+
+    with open(args.file, 'rb') as f:
+        file_bytes = f.read()
+
+    # Cheap request probe running alongside the uploads
+    probe_latencies, stop = [], threading.Event()
+    def probe():
+        with requests.Session() as session:
+            while not stop.is_set():
+                started = time.monotonic()
+                try:
+                    session.get(f"{args.url}/api/stats", timeout=args.timeout)
+                    probe_latencies.append(time.monotonic() - started)
+                except requests.RequestException:
+                    pass
+                stop.wait(0.25)
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+
+    local = threading.local()
+    def run(_):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        try:
+            return upload_one(local.session, args, file_bytes)
+        except requests.RequestException as e:
+            return None, None, type(e).__name__
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(run, range(args.uploads)))
+    elapsed = time.monotonic() - started
+    stop.set()
+    prober.join()
+
+    accepted = [r[0] for r in results if r[0] is not None]
+    completed = [r[1] for r in results if r[1] is not None]
+    outcomes = {}
+    for r in results:
+        outcomes[r[2]] = outcomes.get(r[2], 0) + 1
+
+    print(f"{args.uploads} uploads, {args.concurrency} concurrent clients against {args.url}")
+    print(f"  finished in {elapsed:.1f}s -> {len(completed) / elapsed * 60:.1f} resumes/min")
+    print(f"  outcomes: {outcomes}")
+    summarize("upload accepted (202)", accepted)
+    summarize("upload -> processed", completed)
+    summarize("GET /api/stats meanwhile", probe_latencies)
+
+
+if __name__ == '__main__':
+    main()
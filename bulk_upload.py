@@ -0,0 +1,183 @@
+import os
+import uuid
+import zipfile
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+
+from storage import FileTooLarge, MAX_FILE_BYTES
+
+MAX_ARCHIVE_ENTRIES = 2000
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_upload_files(files, max_entries=MAX_ARCHIVE_ENTRIES):
+    """
+    Yields every resume in a multi-file upload, expanding ZIP archives one
+    entry at a time. Entries are decompressed while they are read, so an
+    archive is never held in memory (Werkzeug already spools large uploads
+    to a temporary file).
+
+    Yields:
+        (filename, stream, error): stream is None when error is set
+    """
+    for file in files:
+        if not file or not file.filename:
+            continue
+        if not file.filename.lower().endswith('.zip'):
+            yield file.filename, file.stream, None
+            continue
+
+        try:
+            archive = zipfile.ZipFile(file.stream)
+        except zipfile.BadZipFile:
+            yield file.filename, None, "Not a valid ZIP archive"
+            continue
+
+        with archive:
+            entries = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith('__MACOSX/')
+                and not os.path.basename(info.filename).startswith('.')
+            ]
+            if len(entries) > max_entries:
+                yield file.filename, None, f"Archive has {len(entries)} files, the limit is {max_entries}"
+                continue
+            for info in entries:
+                name = os.path.basename(info.filename)
+                if info.flag_bits & 0x1:
+                    yield name, None, "Encrypted archive entry"
+                    continue
+                with archive.open(info) as entry:
+                    yield name, entry, None
+
+
+def ingest_resumes(files, job, candidates_collection, store, allowed_extensions, batch_id,
+                   on_batch=None, batch_size=50, max_file_bytes=MAX_FILE_BYTES):
+    """
+    Saves the resumes of a bulk upload and creates their queued candidates.
+
+    Each file is streamed into the resume store while its SHA-256 is
+    computed. Files whose content already appeared earlier in the upload, or
+    is already stored for this job, get no new candidate. New candidates are
+    inserted `batch_size` at a time and handed to `on_batch` right away, so
+    analysis starts while the rest of the archive is still being expanded.
+
+    Args:
+        files: Uploaded files (resumes and/or ZIP archives)
+        job (dict): Job the resumes are for
+        candidates_collection: Mongo candidates collection
+        store (ResumeStore): Where resumes are saved
+        allowed_extensions (set): Accepted resume extensions, without the dot
+        batch_id (str): Stored on every candidate created
+        on_batch (callable, optional): Called with [(candidate, file_path), ...] after each insert
+        batch_size (int): Candidates per insert_many
+        max_file_bytes (int): Size limit per resume
+
+    Returns:
+        dict: received, queued, duplicates, error_count and per-file errors
+    """
+    summary = {"received": 0, "queued": 0, "duplicates": 0, "error_count": 0, "errors": []}
+    seen = set()
+    pending = []  # (candidate, file_path)
+
+    def add_error(filename, message):
+        summary['error_count'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({"file": filename, "error": message})
+
+    def flush():
+        if not pending:
+            return
+        # One lookup per batch for resumes this job already has
+        stored = {
+            c['file_hash'] for c in candidates_collection.find(
+                {"job_id": job['job_id'], "file_hash": {"$in": [c['file_hash'] for c, _ in pending]}},
+                {"file_hash": 1}
+            )
+        }
+        fresh = []
+        for candidate, file_path in pending:
+            if candidate['file_hash'] in stored:
+                summary['duplicates'] += 1
+            else:
+                fresh.append((candidate, file_path))
+        pending.clear()
+
+        if fresh:
+            candidates_collection.insert_many([candidate for candidate, _ in fresh])
+            store.add_refs(candidate['file_hash'] for candidate, _ in fresh)
+            summary['queued'] += len(fresh)
+            if on_batch:
+                on_batch(fresh)
+
+    for name, stream, error in iter_upload_files(files):
+        summary['received'] += 1
+        if error:
+            add_error(name, error)
+            continue
+
+        filename = secure_filename(name)
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if extension not in allowed_extensions:
+            add_error(name, f"Unsupported file type: .{extension or '?'}")
+            continue
+
+        try:
+            file_hash, file_path, _ = store.put(stream, filename, max_bytes=max_file_bytes)
+        except FileTooLarge as e:
+            add_error(name, f"File is {e}")
+            continue
+        except (OSError, zipfile.BadZipFile, EOFError) as e:
+            add_error(name, f"Could not read file: {e}")
+            continue
+
+        if file_hash in seen:
+            summary['duplicates'] += 1
+            continue
+        seen.add(file_hash)
+
+        candidate_id = str(uuid.uuid4())
+        pending.append(({
+            "candidate_id": candidate_id,
+            "id": candidate_id,
+            "job_id": job['job_id'],
+            "job_title": job.get('title', 'Unknown'),
+            "filename": filename,
+            "file_hash": file_hash,
+            "batch_id": batch_id,
+            "match_score": 0,
+            "recommendation": "Pending",
+            "status": "queued",
+            "uploaded_at": datetime.now().isoformat()
+        }, file_path))
+        if len(pending) >= batch_size:
+            flush()
+    flush()
+
+    return summary
+
+
+def batch_progress(candidates_collection, batch_id):
+    """
+    Live status counts for the candidates of one upload batch.
+
+    Returns:
+        dict: queued, processing, processed (scored or deferred), failed, deferred, done
+    """
+    counts = {
+        row['_id']: row['count'] for row in candidates_collection.aggregate([
+            {"$match": {"batch_id": batch_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ])
+    }
+    progress = {
+        "queued": counts.get('queued', 0),
+        "processing": counts.get('processing', 0),
+        "processed": counts.get('success', 0) + counts.get('deferred', 0),
+        "failed": counts.get('error', 0),
+        "deferred": counts.get('deferred', 0)
+    }
+    progress['done'] = progress['queued'] + progress['processing'] == 0
+    return progress
@@ -0,0 +1,333 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+def sha256_file(file_path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extracted resume text, stored in MongoDB.
+
+    Entries are keyed by the SHA-256 of the uploaded file bytes, so the same
+    PDF uploaded to several jobs only goes through LLMWhisperer once.
+    Entries older than max_age_days expire, and once the collection grows
+    past max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, collection, max_entries=5000, max_age_days=30):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.max_age = timedelta(days=max_age_days)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        """
+        Creates the TTL (age) and LRU (last_used_at) indexes; called once at
+        startup. When max_age_days changed since the TTL index was created,
+        its expiry is updated in place (collMod) instead of failing.
+        """
+        ttl = int(self.max_age.total_seconds())
+        try:
+            try:
+                self.collection.create_index("created_at", expireAfterSeconds=ttl)
+            except OperationFailure as e:
+                if e.code != 85:  # IndexOptionsConflict: same keys, other expireAfterSeconds
+                    raise
+                self.collection.database.command(
+                    "collMod", self.collection.name,
+                    index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": ttl}
+                )
+                print(f"Extraction cache TTL changed to {ttl}s")
+            self.collection.create_index([("last_used_at", ASCENDING)])
+        except PyMongoError as e:
+            print(f"Extraction cache indexes failed: {e}")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, file_hash):
+        """Returns cached text for a file hash, or None on a miss."""
+        try:
+            doc = self.collection.find_one_and_update(
+                {"_id": file_hash},
+                {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}}
+            )
+        except Exception as e:
+            print(f"Extraction cache read error: {e}")
+            doc = None
+
+        # TTL monitor only runs every minute, so double check the age here
+        if doc and datetime.utcnow() - doc['created_at'] <= self.max_age:
+            self._count(hit=True)
+            return doc['text']
+
+        self._count(hit=False)
+        return None
+
+    def put(self, file_hash, text):
+        """Stores extracted text for a file hash and evicts if over capacity."""
+        now = datetime.utcnow()
+        try:
+            self.collection.update_one(
+                {"_id": file_hash},
+                {
+                    "$set": {"text": text, "size": len(text), "last_used_at": now},
+                    "$setOnInsert": {"created_at": now, "hits": 0}
+                },
+                upsert=True
+            )
+            self._evict()
+        except Exception as e:
+            print(f"Extraction cache write error: {e}")
+
+    def _evict(self):
+        """Deletes the least recently used entries beyond max_entries."""
+        overflow = self.collection.estimated_document_count() - self.max_entries
+        if overflow <= 0:
+            return
+        stale = self.collection.find({}, {"_id": 1}).sort("last_used_at", ASCENDING).limit(overflow)
+        stale_ids = [doc['_id'] for doc in stale]
+        if stale_ids:
+            self.collection.delete_many({"_id": {"$in": stale_ids}})
+            print(f"Extraction cache evicted {len(stale_ids)} entries")
+
+    def stats(self):
+        """Returns hit/miss counters for this process plus the entry count."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        try:
+            entries = self.collection.estimated_document_count()
+        except Exception:
+            entries = None
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "max_age_days": self.max_age.days
+        }
+
+
+def analysis_cache_key(resume_text, job_data, model, prompt_version):
+    """
+    Builds the analysis cache key from the normalized inputs that actually
+    reach the prompt, plus the model name and prompt version.
+    """
+    skills = str(job_data.get('required_skills', '')).split(',')
+    payload = {
+        "resume": " ".join(resume_text.split()),
+        "title": " ".join(str(job_data.get('title', '')).split()).lower(),
+        "skills": sorted(s.strip().lower() for s in skills if s.strip()),
+        "experience": str(job_data.get('experience_years', '')).strip(),
+        "model": model,
+        "prompt_version": prompt_version
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """
+    In-process LRU cache of AI analysis results with a TTL.
+
+    Entries remember the job they were computed for so a re-uploaded job can
+    drop its results via invalidate_job().
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, job_id, result)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns a copy of the cached analysis, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[2])
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, result, job_id=None):
+        """Stores an analysis result, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), job_id, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_job(self, job_id):
+        """Drops every cached analysis computed for a job. Returns the count."""
+        with self._lock:
+            stale = [k for k, entry in self._entries.items() if entry[1] == job_id]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def stats(self):
+        """Returns hit/miss counters and the current entry count."""
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, len(self._entries)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl
+        }
+
+
+class JobCatalog:
+    """
+    Read-through, in-process copy of the jobs collection.
+
+    The whole catalog (jobs are few and change rarely) is loaded in one query
+    and kept for `ttl_seconds`, together with the encoded /api/jobs body and
+    its ETag. handle_jobs invalidates it after every import batch; with
+    watch() running, a change stream also invalidates it when another app
+    node writes jobs, otherwise the TTL bounds how stale it can get.
+
+    Returned job dicts are shared between callers and must not be modified.
+    """
+
+    def __init__(self, collection, encode, ttl_seconds=300):
+        """
+        Args:
+            collection: Mongo jobs collection
+            encode (callable): encode(data) -> str, used for the /api/jobs body
+            ttl_seconds (float): Reload interval without an invalidation
+        """
+        self.collection = collection
+        self.encode = encode
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.loads = 0
+        self.watching = False
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def cached(self):
+        """The current snapshot if it's still fresh, else None (never queries)."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at <= self.ttl:
+            with self._lock:
+                self.hits += 1
+            return snapshot
+        return None
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: jobs (list), by_id (job_id -> job), body (encoded {"jobs": [...]}) and etag
+        """
+        snapshot = self.cached()
+        if snapshot is not None:
+            return snapshot
+
+        # One reload at a time; requests that waited reuse its result
+        with self._load_lock:
+            snapshot = self.cached()
+            if snapshot is not None:
+                return snapshot
+            generation = self._generation
+            jobs = list(self.collection.find())
+            body = self.encode({"jobs": jobs})
+            snapshot = {
+                "jobs": jobs,
+                "by_id": {job.get('job_id'): job for job in jobs},
+                "body": body,
+                "etag": hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+            }
+            with self._lock:
+                self.loads += 1
+                # Don't publish a load that raced with an invalidation
+                if generation == self._generation:
+                    self._snapshot = snapshot
+                    self._loaded_at = time.monotonic()
+            return snapshot
+
+    def get(self, job_id):
+        """
+        Returns a job by job_id. A job missing from the snapshot is looked up
+        in the database (it may have been added by another node), and a hit
+        there refreshes the catalog on the next read.
+        """
+        job = self.snapshot()['by_id'].get(job_id)
+        if job is None:
+            job = self.collection.find_one({"job_id": job_id})
+            if job is not None:
+                self.invalidate()
+        return job
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def watch(self, retry_seconds=30):
+        """
+        Invalidates the catalog on every change to the jobs collection (blocking,
+        run it on a thread). Stops for good when the deployment doesn't support
+        change streams (standalone mongod), leaving the TTL in charge.
+        """
+        while True:
+            try:
+                with self.collection.watch() as stream:
+                    self.watching = True
+                    self.invalidate()  # Changes may have been missed while disconnected
+                    for _ in stream:
+                        self.invalidate()
+            except OperationFailure as e:
+                self.watching = False
+                print(f"Job catalog change stream unavailable, using the {self.ttl}s TTL only: {e}")
+                return
+            except PyMongoError as e:
+                self.watching = False
+                print(f"Job catalog change stream interrupted, retrying in {retry_seconds}s: {e}")
+                time.sleep(retry_seconds)
+
+    def stats(self):
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                "jobs": len(snapshot['jobs']) if snapshot else None,
+                "hits": self.hits,
+                "loads": self.loads,
+                "ttl_seconds": self.ttl,
+                "change_stream": self.watching
+            }
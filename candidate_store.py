@@ -0,0 +1,226 @@
+import argparse
+
+from pymongo import UpdateOne
+
+from prefilter import tokenize, STOP_WORDS
+
+# Long fields only the candidate detail view needs. They live in the
+# candidate_details collection (_id = candidate_id) so the candidate documents
+# that every list, sort, count and stats query reads stay a few hundred bytes.
+# The full extracted text is kept compressed (resume_text_z, see text_codec.py);
+# resume_text is the plain excerpt stored by earlier versions.
+DETAIL_FIELDS = (
+    "resume_text", "resume_text_z", "search_terms",
+    "analysis", "reasoning", "experience_summary", "education", "raw_response"
+)
+
+# Details returned by the API (the resume text stays server-side, as before)
+DETAIL_VIEW = {"resume_text": 0, "resume_text_z": 0, "search_terms": 0}
+# Details needed to read a candidate's resume text
+TEXT_VIEW = {"resume_text": 1, "resume_text_z": 1}
+
+
+def search_terms(text):
+    """The resume's distinct words (minus stop words) in order of appearance, for the text index."""
+    return ' '.join(dict.fromkeys(t for t in tokenize(text) if t not in STOP_WORDS))
+
+
+def text_fields(text, codec):
+    """Detail fields storing a resume's full extracted text."""
+    return {"resume_text_z": codec.compress(text), "search_terms": search_terms(text)}
+
+
+def split_fields(fields):
+    """Splits candidate fields into (summary fields, detail fields)."""
+    summary = {k: v for k, v in fields.items() if k not in DETAIL_FIELDS}
+    details = {k: v for k, v in fields.items() if k in DETAIL_FIELDS}
+    return summary, details
+
+
+def update_operations(fields, unset=None):
+    """
+    Builds the two updates for a candidate write.
+
+    The summary update also removes the detail fields it moved, in case the
+    candidate was stored before the split with them inline.
+
+    Returns:
+        tuple: (candidates update, candidate_details update or None)
+    """
+    summary, details = split_fields(fields)
+    operation = {"$set": summary}
+    removed = {**{field: "" for field in details}, **(unset or {})}
+    if removed:
+        operation["$unset"] = removed
+    if not details:
+        return operation, None
+    details_update = {"$set": details}
+    if "resume_text_z" in details:
+        details_update["$unset"] = {"resume_text": ""}
+    return operation, details_update
+
+
+def write_candidate(candidates_collection, details_collection, candidate_id, fields, unset=None):
+    """Writes candidate fields to the summary document and its details document."""
+    summary_update, details_update = update_operations(fields, unset)
+    # Details first, so a finished candidate never shows up without its analysis
+    if details_update:
+        details_collection.update_one({"_id": candidate_id}, details_update, upsert=True)
+    candidates_collection.update_one({"candidate_id": candidate_id}, summary_update)
+
+
+def merge_details(candidates, details_docs, codec=None):
+    """
+    Adds details documents (with their _id) to the candidates they belong to.
+    With a codec, compressed resume text is decompressed into resume_text.
+    """
+    by_id = {}
+    for doc in details_docs:
+        if codec is not None and doc.get('resume_text_z') is not None:
+            doc['resume_text'] = codec.decompress(doc.pop('resume_text_z'))
+        by_id[doc.pop('_id')] = doc
+    return [{**candidate, **by_id.get(candidate['candidate_id'], {})} for candidate in candidates]
+
+
+def attach_details(details_collection, candidates, projection=DETAIL_VIEW, codec=None):
+    """Loads the details of a page of candidates in one query and merges them in."""
+    candidates = list(candidates)
+    if not candidates:
+        return candidates
+    docs = details_collection.find(
+        {"_id": {"$in": [candidate['candidate_id'] for candidate in candidates]}}, projection
+    )
+    return merge_details(candidates, docs, codec)
+
+
+def iter_with_details(details_collection, cursor, projection=DETAIL_VIEW, batch_size=500, codec=None):
+    """attach_details() over a whole cursor, one details query per batch_size candidates."""
+    batch = []
+    for candidate in cursor:
+        batch.append(candidate)
+        if len(batch) >= batch_size:
+            yield from attach_details(details_collection, batch, projection, codec)
+            batch = []
+    yield from attach_details(details_collection, batch, projection, codec)
+
+
+def load_resume_text(details_collection, candidate, codec):
+    """A candidate's stored resume text (inline for candidates not yet migrated)."""
+    doc = details_collection.find_one({"_id": candidate['candidate_id']}, TEXT_VIEW)
+    text = merge_details([candidate], [doc], codec)[0].get('resume_text') if doc else None
+    return text or candidate.get('resume_text', '')
+
+
+def migrate(candidates_collection, details_collection, batch_size=500):
+    """
+    Moves detail fields stored inline on candidate documents (before the
+    split) into candidate_details.
+
+    Returns:
+        int: Number of candidates migrated
+    """
+    query = {"$or": [{field: {"$exists": True}} for field in DETAIL_FIELDS]}
+    projection = {"candidate_id": 1, **{field: 1 for field in DETAIL_FIELDS}}
+    migrated = 0
+    batch = []
+
+    def flush():
+        details_collection.bulk_write([
+            UpdateOne({"_id": candidate['candidate_id']}, {"$set": split_fields(candidate)[1]}, upsert=True)
+            for candidate in batch
+        ], ordered=False)
+        candidates_collection.bulk_write([
+            UpdateOne({"candidate_id": candidate['candidate_id']},
+                      {"$unset": {field: "" for field in split_fields(candidate)[1]}})
+            for candidate in batch
+        ], ordered=False)
+
+    # Re-querying after each batch: migrated candidates no longer match
+    while True:
+        batch = list(candidates_collection.find(query, projection).limit(batch_size))
+        if not batch:
+            break
+        flush()
+        migrated += len(batch)
+        print(f"  {migrated} candidates migrated")
+    return migrated
+
+
+def compress_stored_text(candidates_collection, details_collection, codec, lookup_text=None, batch_size=500):
+    """
+    Replaces plain resume_text excerpts in candidate_details with compressed
+    text. Earlier versions kept only the first 1000 characters; when
+    lookup_text(file_hash) still has the full extraction (the extraction
+    cache), that is stored instead.
+
+    Returns:
+        dict: converted (all rewritten) and restored (full text recovered)
+    """
+    summary = {"converted": 0, "restored": 0}
+    while True:
+        docs = list(details_collection.find({"resume_text": {"$exists": True}}, {"resume_text": 1}).limit(batch_size))
+        if not docs:
+            break
+        hashes = {}
+        if lookup_text:
+            hashes = {
+                c['candidate_id']: c.get('file_hash') for c in candidates_collection.find(
+                    {"candidate_id": {"$in": [doc['_id'] for doc in docs]}}, {"candidate_id": 1, "file_hash": 1}
+                )
+            }
+        ops = []
+        for doc in docs:
+            text = doc['resume_text'] or ''
+            full = lookup_text(hashes[doc['_id']]) if hashes.get(doc['_id']) else None
+            if full and len(full) > len(text):
+                text = full
+                summary['restored'] += 1
+            ops.append(UpdateOne({"_id": doc['_id']}, {
+                "$set": text_fields(text, codec), "$unset": {"resume_text": ""}
+            }))
+        details_collection.bulk_write(ops, ordered=False)
+        summary['converted'] += len(ops)
+        print(f"  {summary['converted']} resume texts compressed")
+    return summary
+
+
+def sample_resume_texts(details_collection, codec, limit=2000):
+    """Up to `limit` stored resume texts, e.g. to train a compression dictionary."""
+    cursor = details_collection.aggregate([
+        {"$match": {"$or": [{"resume_text_z": {"$exists": True}}, {"resume_text": {"$exists": True}}]}},
+        {"$sample": {"size": limit}},
+        {"$project": TEXT_VIEW}
+    ])
+    return [text for text in (
+        codec.decompress(doc['resume_text_z']) if doc.get('resume_text_z') is not None else doc.get('resume_text')
+        for doc in cursor
+    ) if text]
+
+
+def layout_stats(db):
+    """Document counts and average sizes of the summary and details collections."""
+    stats = {}
+    for name in ("candidates", "candidate_details"):
+        info = db.command("collStats", name)
+        stats[name] = {
+            "documents": info.get('count', 0),
+            "avg_bytes": info.get('avgObjSize', 0),
+            "bytes": info.get('size', 0)
+        }
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Candidate summary / details layout maintenance")
+    parser.add_argument('command', choices=['migrate', 'stats'],
+                        help="migrate: move inline resume text and analysis into candidate_details "
+                             "and compress stored resume text; stats: document sizes of both collections")
+    args = parser.parse_args()
+
+    from app import db, candidates_collection, candidate_details_collection, text_codec, extraction_cache
+
+    if args.command == 'migrate':
+        print(f"Migrated {migrate(candidates_collection, candidate_details_collection)} candidate(s)")
+        print(compress_stored_text(candidates_collection, candidate_details_collection, text_codec,
+                                   lookup_text=extraction_cache.get))
+    print(layout_stats(db))
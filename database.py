@@ -1,7 +1,9 @@
 import os
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError
 from datetime import datetime
 from dotenv import load_dotenv
+from stats import record_transition
 
 load_dotenv()
 
@@ -12,6 +14,7 @@ DATABASE_NAME = os.getenv('DATABASE_NAME', 'recruitment_db')
 # Global database connection
 db = None
 client = None
+_seeded_counters = set()
 
 def init_db():
     """Initialize MongoDB connection"""
@@ -69,6 +72,48 @@ def test_connection():
         print(f"MongoDB connection test failed: {e}")
         return False
 
+# ==================== ID ALLOCATION ====================
+
+def next_id(name, count=1):
+    """
+    Atomically allocates `count` consecutive integer IDs from the counters
+    collection (one $inc per call, safe across threads and processes).
+
+    The first call in a process seeds the counter from the highest ID already
+    stored, so existing data keeps its numbering; $max makes that seeding
+    idempotent when several processes do it at once.
+    
+    Args:
+        name (str): Counter name, also the ID field ('job_id', 'candidate_id')
+        count (int): Number of IDs to allocate
+        
+    Returns:
+        int: The last allocated ID (the block is last - count + 1 .. last)
+    """
+    if name not in _seeded_counters:
+        collection = db.jobs if name == 'job_id' else db.candidates
+        last = collection.find_one({name: {'$type': 'number'}}, {name: 1}, sort=[(name, -1)])
+        db.counters.update_one({'_id': name}, {'$max': {'seq': last[name] if last else 0}}, upsert=True)
+        _seeded_counters.add(name)
+    
+    counter = db.counters.find_one_and_update(
+        {'_id': name},
+        {'$inc': {'seq': count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter['seq']
+
+def _job_titles(job_ids):
+    """Maps job_id -> title for a set of jobs in one $in query."""
+    job_ids = list({job_id for job_id in job_ids if job_id is not None})
+    if not job_ids:
+        return {}
+    return {
+        job['job_id']: job.get('title', 'Unknown')
+        for job in db.jobs.find({'job_id': {'$in': job_ids}}, {'_id': 0, 'job_id': 1, 'title': 1})
+    }
+
 # ==================== JOB OPERATIONS ====================
 
 def save_job(job_data):
@@ -89,8 +134,7 @@ def save_job(job_data):
         
         # Generate job_id if not exists
         if 'job_id' not in job_data:
-            last_job = db.jobs.find_one(sort=[('job_id', -1)])
-            job_data['job_id'] = (last_job['job_id'] + 1) if last_job else 1
+            job_data['job_id'] = next_id('job_id')
         
         result = db.jobs.insert_one(job_data)
         job_data['_id'] = str(result.inserted_id)
@@ -110,12 +154,40 @@ def save_jobs_bulk(jobs_list):
     Returns:
         list: Saved jobs with IDs
     """
-    saved_jobs = []
-    for job in jobs_list:
-        saved_job = save_job(job)
-        if saved_job:
-            saved_jobs.append(saved_job)
-    return saved_jobs
+    try:
+        now = datetime.utcnow()
+        # One counter round trip for every job that needs an ID
+        missing = [job for job in jobs_list if 'job_id' not in job]
+        if missing:
+            last = next_id('job_id', len(missing))
+            for offset, job in enumerate(missing):
+                job['job_id'] = last - len(missing) + 1 + offset
+        
+        for job in jobs_list:
+            job['created_at'] = now
+            job['updated_at'] = now
+            job['status'] = 'active'
+        if not jobs_list:
+            return []
+        
+        # insert_many sets each document's _id before sending the batch
+        failed = set()
+        try:
+            db.jobs.insert_many(jobs_list, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get('writeErrors', []):
+                print(f"Error saving job: {err.get('errmsg')}")
+                failed.add(err['index'])
+        
+        saved_jobs = []
+        for index, job in enumerate(jobs_list):
+            if index not in failed:
+                job['_id'] = str(job['_id'])
+                saved_jobs.append(job)
+        return saved_jobs
+    except Exception as e:
+        print(f"Error saving jobs: {e}")
+        return []
 
 def get_all_jobs():
     """
@@ -196,8 +268,7 @@ def save_candidate(candidate_data):
     """
     try:
         # Generate candidate_id
-        last_candidate = db.candidates.find_one(sort=[('candidate_id', -1)])
-        candidate_data['candidate_id'] = (last_candidate['candidate_id'] + 1) if last_candidate else 1
+        candidate_data['candidate_id'] = next_id('candidate_id')
         
         # Add metadata
         candidate_data['applied_at'] = datetime.utcnow()
@@ -206,11 +277,8 @@ def save_candidate(candidate_data):
         result = db.candidates.insert_one(candidate_data)
         candidate_data['_id'] = str(result.inserted_id)
         
-        # Update job with candidate count
-        db.jobs.update_one(
-            {'job_id': candidate_data['job_id']},
-            {'$inc': {'candidate_count': 1}}
-        )
+        # Update the materialized job stats
+        record_transition(db.job_stats, candidate_data['job_id'], None, candidate_data)
         
         return candidate_data
     except Exception as e:
@@ -234,11 +302,11 @@ def get_all_candidates(job_id=None):
         
         candidates = list(db.candidates.find(query).sort('applied_at', -1))
         
-        # Convert ObjectId to string and add job title
+        # Convert ObjectId to string and add job titles (one query for all jobs)
+        titles = _job_titles(c.get('job_id') for c in candidates)
         for candidate in candidates:
             candidate['_id'] = str(candidate['_id'])
-            job = get_job_by_id(candidate['job_id'])
-            candidate['job_title'] = job['title'] if job else 'Unknown'
+            candidate['job_title'] = titles.get(candidate.get('job_id'), 'Unknown')
         
         return candidates
     except Exception as e:
@@ -259,8 +327,7 @@ def get_candidate_by_id(candidate_id):
         candidate = db.candidates.find_one({'candidate_id': int(candidate_id)})
         if candidate:
             candidate['_id'] = str(candidate['_id'])
-            job = get_job_by_id(candidate['job_id'])
-            candidate['job_title'] = job['title'] if job else 'Unknown'
+            candidate['job_title'] = _job_titles([candidate.get('job_id')]).get(candidate.get('job_id'), 'Unknown')
         return candidate
     except Exception as e:
         print(f"Error fetching candidate: {e}")
@@ -302,11 +369,17 @@ def update_candidate_status(candidate_id, status):
         bool: Success status
     """
     try:
-        result = db.candidates.update_one(
+        before = db.candidates.find_one_and_update(
             {'candidate_id': int(candidate_id)},
-            {'$set': {'status': status, 'updated_at': datetime.utcnow()}}
+            {'$set': {'status': status, 'updated_at': datetime.utcnow()}},
+            projection={'job_id': 1, 'status': 1, 'match_score': 1, 'recommendation': 1},
+            return_document=ReturnDocument.BEFORE
         )
-        return result.modified_count > 0
+        if not before:
+            return False
+        if before.get('status') != status:
+            record_transition(db.job_stats, before['job_id'], before, {**before, 'status': status})
+        return True
     except Exception as e:
         print(f"Error updating candidate status: {e}")
         return False
@@ -360,33 +433,24 @@ def get_jobs_with_candidate_count():
     """
     Get all jobs with their candidate counts
     
+    Counts come from the materialized job_stats collection instead of a
+    $lookup over every candidate.
+    
     Returns:
         list: Jobs with candidate_count field
     """
     try:
-        pipeline = [
-            {'$match': {'status': 'active'}},
-            {
-                '$lookup': {
-                    'from': 'candidates',
-                    'localField': 'job_id',
-                    'foreignField': 'job_id',
-                    'as': 'candidates'
-                }
-            },
-            {
-                '$addFields': {
-                    'candidate_count': {'$size': '$candidates'}
-                }
-            },
-            {'$project': {'candidates': 0}}
-        ]
-        
-        jobs = list(db.jobs.aggregate(pipeline))
+        stats = {
+            s['job_id']: s.get('candidate_count', 0)
+            for s in db.job_stats.find({}, {'job_id': 1, 'candidate_count': 1})
+        }
+        
+        jobs = list(db.jobs.find({'status': 'active'}))
         for job in jobs:
             job['_id'] = str(job['_id'])
+            job['candidate_count'] = stats.get(job['job_id'], 0)
         
         return jobs
     except Exception as e:
         print(f"Error fetching jobs with counts: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,139 @@
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import PyMongoError
+
+# (collection, keys, options) for every index app.py's queries rely on. Default
+# key-derived names are kept so indexes created by database.init_db are reused.
+INDEXES = [
+    ("jobs", [("job_id", ASCENDING)], {"unique": True}),
+    ("candidates", [("candidate_id", ASCENDING)], {"unique": True}),
+    # Per-job ranking and keyset pagination: find({job_id}).sort(match_score, candidate_id)
+    ("candidates", [("job_id", ASCENDING), ("match_score", DESCENDING), ("candidate_id", DESCENDING)], {}),
+    # Unfiltered ranking across all jobs
+    ("candidates", [("match_score", DESCENDING), ("candidate_id", DESCENDING)], {}),
+    ("candidates", [("uploaded_at", DESCENDING)], {}),
+    ("candidates", [("status", ASCENDING)], {}),
+    # Retry sweep: deferred candidates due for another analysis attempt
+    ("candidates", [("status", ASCENDING), ("next_retry_at", ASCENDING)], {}),
+    # Resume lease sweep: queued / processing candidates whose lease ran out
+    ("candidates", [("status", ASCENDING), ("lease_until", ASCENDING)], {}),
+    # Bulk upload: duplicate lookup by content hash, and per-batch progress
+    # (file_hash first so lookups by hash alone can use it too)
+    ("candidates", [("file_hash", ASCENDING), ("job_id", ASCENDING)], {}),
+    ("candidates", [("batch_id", ASCENDING), ("status", ASCENDING)], {"partialFilterExpression": {"batch_id": {"$exists": True}}}),
+    # Candidate search: skill filters ranked by score, and full-text queries over the resume's words
+    # (search_terms, since the text itself is compressed) and the experience summary (candidate_details)
+    ("candidates", [("skill_keys", ASCENDING), ("match_score", DESCENDING), ("candidate_id", DESCENDING)], {}),
+    ("candidate_details", [("search_terms", TEXT), ("experience_summary", TEXT)],
+     {"name": "candidate_search_terms", "weights": {"search_terms": 1, "experience_summary": 3}}),
+    ("rescore_runs", [("run_id", ASCENDING)], {"unique": True}),
+    ("upload_batches", [("batch_id", ASCENDING)], {"unique": True}),
+    # Upload GC: unreferenced files, and files past retention per tier
+    ("stored_files", [("refs", ASCENDING), ("last_used_at", ASCENDING)], {}),
+    ("stored_files", [("tier", ASCENDING), ("last_used_at", ASCENDING)], {}),
+    ("job_stats", [("job_id", ASCENDING)], {"unique": True}),
+]
+
+# (collection, name) of indexes replaced by one above, dropped before creating them. A
+# collection has at most one text index, so the replacement can't be built next to it
+OBSOLETE_INDEXES = [
+    ("candidate_details", "candidate_text"),  # Over resume_text, which is now stored compressed
+]
+
+
+def ensure_indexes(db):
+    """
+    Creates the indexes app.py needs, after dropping OBSOLETE_INDEXES.
+    Existing indexes are left alone and a failure on one index (e.g. duplicate job_ids blocking the unique index)
+    is reported without stopping the rest.
+
+    Returns:
+        dict: index name -> "ok" or the error message
+    """
+    results = {}
+    for collection, name in OBSOLETE_INDEXES:
+        try:
+            if name in db[collection].index_information():
+                db[collection].drop_index(name)
+                print(f"Dropped obsolete index {collection}.{name}")
+        except PyMongoError as e:
+            print(f"Dropping index {collection}.{name} failed: {e}")
+    for collection, keys, options in INDEXES:
+        name = f"{collection}." + "_".join(f"{field}_{direction}" for field, direction in keys)
+        try:
+            db[collection].create_index(keys, **options)
+            results[name] = "ok"
+        except PyMongoError as e:
+            print(f"Index {name} failed: {e}")
+            results[name] = str(e)
+    print(f"Indexes checked: {sum(1 for r in results.values() if r == 'ok')}/{len(results)} ok")
+    return results
+
+
+def _main_queries(db):
+    """The hot queries app.py runs, as (name, cursor) pairs ready to explain()."""
+    sample_job = db.jobs.find_one({}, {"job_id": 1}) or {"job_id": ""}
+    job_id = sample_job['job_id']
+    ranking = [("match_score", DESCENDING), ("candidate_id", DESCENDING)]
+    return [
+        ("job lookup (upload_resume)", db.jobs.find({"job_id": job_id}).limit(1)),
+        ("candidates for job (get_candidates)", db.candidates.find({"job_id": job_id}).sort(ranking).limit(51)),
+        ("all candidates (get_candidates)", db.candidates.find({}).sort(ranking).limit(51)),
+        ("candidate lookup (status / detail)", db.candidates.find({"candidate_id": ""}).limit(1)),
+        ("candidates by status", db.candidates.find({"status": "queued"})),
+        ("recent candidates", db.candidates.find({}).sort("uploaded_at", DESCENDING).limit(50)),
+    ]
+
+
+def _plan_details(node, stages, index_names):
+    """Walks an explain plan tree collecting stage names and index names."""
+    if isinstance(node, dict):
+        if 'stage' in node:
+            stages.append(node['stage'])
+        if 'indexName' in node:
+            index_names.append(node['indexName'])
+        for value in node.values():
+            _plan_details(value, stages, index_names)
+    elif isinstance(node, list):
+        for value in node:
+            _plan_details(value, stages, index_names)
+
+
+def explain_queries(db):
+    """
+    Runs explain() on app.py's main queries and flags collection scans and
+    in-memory sorts.
+
+    Returns:
+        list: One dict per query with the winning plan's stages and stats
+    """
+    report = []
+    for name, cursor in _main_queries(db):
+        try:
+            plan = cursor.explain()
+        except PyMongoError as e:
+            report.append({"query": name, "error": str(e)})
+            continue
+
+        stages, index_names = [], []
+        _plan_details(plan.get('queryPlanner', {}).get('winningPlan', {}), stages, index_names)
+        stats = plan.get('executionStats', {})
+        report.append({
+            "query": name,
+            "stages": stages,
+            "indexes": sorted(set(index_names)),
+            "collection_scan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+            "docs_examined": stats.get('totalDocsExamined'),
+            "keys_examined": stats.get('totalKeysExamined')
+        })
+    return report
+
+
+if __name__ == '__main__':
+    from app import db, extraction_cache
+
+    ensure_indexes(db)
+    extraction_cache.ensure_indexes()
+    for entry in explain_queries(db):
+        flag = "COLLSCAN" if entry.get('collection_scan') else ("SORT" if entry.get('in_memory_sort') else "ok")
+        print(f"[{flag:8}] {entry['query']}: {entry.get('stages') or entry.get('error')}")
@@ -0,0 +1,153 @@
+import json
+import uuid
+import codecs
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+CHUNK_SIZE = 64 * 1024
+MAX_RECORD_BYTES = 1024 * 1024  # Read-ahead limit while looking for the end of one record
+MAX_REPORTED_ERRORS = 100
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_json_records(stream, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally parses a JSON array, NDJSON, or a single JSON object from a
+    binary stream, holding at most one record's worth of text in memory.
+
+    Yields:
+        (index, record, error): record is None when error is set
+    """
+    decode = codecs.getincrementaldecoder('utf-8-sig')().decode
+    buf, pos, eof = '', 0, False
+    index = 0
+    in_array = None
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+            buf = buf[pos:] + decode(b'', final=True)
+        else:
+            buf = buf[pos:] + decode(chunk)
+        pos = 0
+
+    while True:
+        # Skip whitespace (and array commas) between records
+        while True:
+            while pos < len(buf) and (buf[pos] in _WHITESPACE or (in_array and buf[pos] == ',')):
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+        if pos >= len(buf):
+            if in_array:
+                yield index, None, "Unexpected end of file: JSON array is not closed"
+            return
+
+        if in_array is None:
+            in_array = buf[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        elif in_array and buf[pos] == ']':
+            return
+
+        try:
+            record, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if not eof and len(buf) - pos < MAX_RECORD_BYTES:
+                fill()
+                continue
+            if in_array:
+                # No way to resynchronize inside a malformed array
+                yield index, None, f"Invalid JSON: {e.msg}"
+                return
+            # NDJSON: report the bad line and move on to the next one
+            newline = buf.find('\n', pos)
+            pos = len(buf) if newline == -1 else newline + 1
+            yield index, None, f"Invalid JSON: {e.msg}"
+            index += 1
+            continue
+
+        pos = end
+        yield index, record, None
+        index += 1
+
+
+def normalize_job(job):
+    """Ensures both id and job_id exist and stamps uploaded_at, as handle_jobs always has."""
+    if 'job_id' not in job and 'id' in job:
+        job['job_id'] = job['id']
+    elif 'job_id' not in job:
+        job['job_id'] = str(uuid.uuid4())
+
+    job['id'] = job['job_id']  # Mirror for consistency
+    job['uploaded_at'] = datetime.now().isoformat()
+    return job
+
+
+def import_jobs(stream, collection, batch_size=500, on_batch=None):
+    """
+    Streams job records into the jobs collection with unordered bulk upserts.
+
+    Args:
+        stream: Binary file-like object holding a JSON array, NDJSON or one object
+        collection: Mongo jobs collection
+        batch_size (int): Upserts per bulk_write
+        on_batch (callable, optional): Called with the list of jobs written in each batch
+
+    Returns:
+        dict: processed, inserted, updated, error_count and per-record errors
+    """
+    summary = {"processed": 0, "inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+    ops, batch, indexes = [], [], []
+
+    def add_error(index, message):
+        summary['error_count'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({"record": index, "error": message})
+
+    def flush():
+        if not ops:
+            return
+        try:
+            result = collection.bulk_write(ops, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            for err in result.get('writeErrors', []):
+                add_error(indexes[err['index']], err.get('errmsg', 'Write failed'))
+        summary['inserted'] += result.get('nUpserted', 0)
+        summary['updated'] += result.get('nMatched', 0)
+
+        failed = {err['index'] for err in result.get('writeErrors', [])}
+        written = [job for i, job in enumerate(batch) if i not in failed]
+        if on_batch and written:
+            on_batch(written)
+        ops.clear()
+        batch.clear()
+        indexes.clear()
+
+    for index, record, error in iter_json_records(stream):
+        summary['processed'] += 1
+        if error:
+            add_error(index, error)
+            continue
+        if not isinstance(record, dict):
+            add_error(index, f"Expected a JSON object, got {type(record).__name__}")
+            continue
+
+        job = normalize_job(record)
+        ops.append(UpdateOne({"job_id": job['job_id']}, {"$set": job}, upsert=True))
+        batch.append(job)
+        indexes.append(index)
+        if len(ops) >= batch_size:
+            flush()
+    flush()
+
+    return summary
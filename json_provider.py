@@ -0,0 +1,46 @@
+import json
+
+from bson import json_util
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def bson_default(o):
+    """
+    Encodes BSON types (ObjectId, datetime, Decimal128, Binary, ...) the same
+    way json_util.dumps does, so responses keep their {"$oid": ...} /
+    {"$date": ...} shape.
+    """
+    try:
+        return json_util.default(o)
+    except (TypeError, ValueError):
+        return DefaultJSONProvider.default(o)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes MongoDB documents in a single pass,
+    replacing the json_util.dumps -> json.loads -> jsonify round trip.
+    Uses orjson when it is installed.
+    """
+
+    default = staticmethod(bson_default)
+
+    def dumps(self, obj, **kwargs):
+        # response() only ever passes indent/separators; orjson is compact by default
+        if orjson is not None and set(kwargs) <= {"indent", "separators"}:
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if kwargs.get("indent"):
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=bson_default, option=option).decode('utf-8')
+
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json.dumps(obj, **kwargs)
@@ -0,0 +1,529 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_BASE_URL = "https://llmwhisperer-api.us-central.unstract.com/api/v2"
+
+# (connect, read) timeouts per operation: uploads carry the whole file, status checks are tiny
+UPLOAD_TIMEOUT = (5, 60)
+STATUS_TIMEOUT = (5, 10)
+RETRIEVE_TIMEOUT = (5, 30)
+
+# Statuses worth retrying. Uploads are only retried on responses that mean the
+# request was refused (429/503), never on other 5xx where it may have been accepted.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+UPLOAD_RETRY_STATUSES = (429, 503)
+
+# Uploads are streamed from disk in chunks of this size, never read whole
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class LLMWhispererClient:
+    """
+    Thin LLMWhisperer v2 client over one shared requests.Session.
+
+    Connections are kept alive and pooled (pool_size, blocking when all are
+    busy), so the upload, every status poll and the retrieve reuse the same
+    TCP+TLS connection. Safe to share between request handlers and
+    background worker threads.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, pool_size=10, max_retries=3, backoff=0.5):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        # GETs are idempotent, so urllib3 retries them with backoff (honouring Retry-After)
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'unstract-key': api_key})
+
+    def upload(self, data, params):
+        """
+        POST /whisper with the file as the binary body. Retries only refused requests.
+        An open file is streamed (requests sends it in blocks with its Content-Length).
+        """
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(
+                f"{self.base_url}/whisper",
+                params=params,
+                data=data,  # Binary content, not multipart (PDF)
+                timeout=UPLOAD_TIMEOUT
+            )
+            if response.status_code not in UPLOAD_RETRY_STATUSES or attempt == self.max_retries:
+                return response
+
+            retry_after = response.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.isdigit() else self.backoff * (2 ** attempt)
+            print(f"Upload got {response.status_code}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            if hasattr(data, 'seek'):
+                data.seek(0)
+
+    def status(self, whisper_hash):
+        """GET /whisper-status for a whisper_hash."""
+        return self.session.get(
+            f"{self.base_url}/whisper-status",
+            params={'whisper_hash': whisper_hash},
+            timeout=STATUS_TIMEOUT
+        )
+
+    def retrieve(self, whisper_hash):
+        """GET /whisper-retrieve for a whisper_hash."""
+        return self.session.get(
+            f"{self.base_url}/whisper-retrieve",
+            params={'whisper_hash': whisper_hash},
+            timeout=RETRIEVE_TIMEOUT
+        )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide client, or None when LLMWHISPERER_API_KEY is not set."""
+    global _client
+    if _client is None:
+        api_key = os.getenv('LLMWHISPERER_API_KEY')
+        if not api_key:
+            return None
+        with _client_lock:
+            if _client is None:
+                _client = LLMWhispererClient(
+                    api_key,
+                    base_url=os.getenv('LLMWHISPERER_BASE_URL', DEFAULT_BASE_URL),
+                    pool_size=int(os.getenv('LLMWHISPERER_POOL_SIZE', 10)),
+                    max_retries=int(os.getenv('LLMWHISPERER_MAX_RETRIES', 3))
+                )
+    return _client
+
+class AsyncLLMWhispererClient:
+    """
+    asyncio counterpart of LLMWhispererClient for the ASGI app (asgi.py), over
+    one httpx.AsyncClient with the same pool size, retry rules and timeouts.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, pool_size=10, max_retries=3, backoff=0.5):
+        if httpx is None:
+            raise RuntimeError("httpx is required for the async LLMWhisperer client")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            headers={'unstract-key': api_key},
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def _send(self, method, path, retry_statuses, timeout, body=None, **kwargs):
+        """body, when given, is called for a fresh request content on every attempt."""
+        connect, read = timeout
+        for attempt in range(self.max_retries + 1):
+            if body is not None:
+                kwargs['content'] = body()
+            response = await self.client.request(
+                method, path, timeout=httpx.Timeout(read, connect=connect), **kwargs
+            )
+            if response.status_code not in retry_statuses or attempt == self.max_retries:
+                return response
+
+            retry_after = response.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.isdigit() else self.backoff * (2 ** attempt)
+            print(f"{path} got {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def upload(self, data, params):
+        """Streams an open binary file as the body, one chunk at a time read off the event loop."""
+        return await self._send('POST', '/whisper', UPLOAD_RETRY_STATUSES, UPLOAD_TIMEOUT,
+                                params=params, body=lambda: _file_chunks(data),
+                                headers={'Content-Length': str(os.fstat(data.fileno()).st_size)})
+
+    async def status(self, whisper_hash):
+        return await self._send('GET', '/whisper-status', RETRY_STATUSES, STATUS_TIMEOUT,
+                                params={'whisper_hash': whisper_hash})
+
+    async def retrieve(self, whisper_hash):
+        return await self._send('GET', '/whisper-retrieve', RETRY_STATUSES, RETRIEVE_TIMEOUT,
+                                params={'whisper_hash': whisper_hash})
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+async def _file_chunks(f, chunk_size=UPLOAD_CHUNK_SIZE):
+    await asyncio.to_thread(f.seek, 0)
+    while True:
+        chunk = await asyncio.to_thread(f.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+_async_client = None
+
+def get_async_client():
+    """Returns the event loop's shared async client, or None when LLMWHISPERER_API_KEY is not set."""
+    global _async_client
+    api_key = os.getenv('LLMWHISPERER_API_KEY')
+    if not api_key:
+        return None
+    if _async_client is None:
+        _async_client = AsyncLLMWhispererClient(
+            api_key,
+            base_url=os.getenv('LLMWHISPERER_BASE_URL', DEFAULT_BASE_URL),
+            pool_size=int(os.getenv('LLMWHISPERER_POOL_SIZE', 10)),
+            max_retries=int(os.getenv('LLMWHISPERER_MAX_RETRIES', 3))
+        )
+    return _async_client
+
+# whisper-status polling: first check sized to the document, then exponential backoff with jitter
+WHISPER_MAX_WAIT = 120  # seconds, same 2 minute budget as the old 40 x 3s loop
+WHISPER_MIN_DELAY = 0.5
+WHISPER_MAX_DELAY = 8
+WHISPER_BACKOFF = 1.5
+
+# Optional LLMWhisperer webhook: a registered webhook name wakes the poller as soon as the job is done
+LLMWHISPERER_WEBHOOK_NAME = os.getenv('LLMWHISPERER_WEBHOOK_NAME')
+LLMWHISPERER_WEBHOOK_TOKEN = os.getenv('LLMWHISPERER_WEBHOOK_TOKEN')
+if LLMWHISPERER_WEBHOOK_NAME and not LLMWHISPERER_WEBHOOK_TOKEN:
+    print("LLMWHISPERER_WEBHOOK_TOKEN is not set: webhook disabled, extraction polls whisper-status only")
+whisper_waiters = {}  # whisper_hash -> {"event": Event, "text": str | None}
+whisper_waiters_lock = threading.Lock()
+
+def estimate_page_count(file_path, chunk_size=1024 * 1024):
+    """Rough page count: /Type /Page objects for PDFs, 1 for images and DOCX."""
+    if not file_path.lower().endswith('.pdf'):
+        return 1
+    
+    pattern = re.compile(rb'/Type\s*/Page(?!s)')
+    count, tail = 0, b''
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            # Overlap chunks so a marker split across them is still found, but not counted twice
+            data = tail + chunk
+            count += len(pattern.findall(data)) - len(pattern.findall(tail))
+            tail = data[-32:]
+    return max(1, count)
+
+def whisper_poll_delays(file_size, page_count):
+    """
+    Yields the waits between whisper-status checks. The first check lands at
+    about half the expected processing time (small documents are checked
+    within a second), then waits grow by WHISPER_BACKOFF with +/-20% jitter,
+    capped at WHISPER_MAX_DELAY, until WHISPER_MAX_WAIT is used up.
+    """
+    expected = 0.5 + 0.4 * page_count + file_size / (2 * 1024 * 1024)
+    delay = min(max(WHISPER_MIN_DELAY, expected / 2), WHISPER_MAX_DELAY)
+    elapsed = 0.0
+    while elapsed < WHISPER_MAX_WAIT:
+        wait = min(delay * random.uniform(0.8, 1.2), WHISPER_MAX_WAIT - elapsed)
+        yield wait
+        elapsed += wait
+        delay = min(delay * WHISPER_BACKOFF, WHISPER_MAX_DELAY)
+
+def complete_whisper(whisper_hash, text=None):
+    """Wakes the poller waiting on a whisper_hash (called by the webhook). Returns False if none is waiting."""
+    with whisper_waiters_lock:
+        waiter = whisper_waiters.get(whisper_hash)
+    if not waiter:
+        return False
+    waiter['text'] = text
+    waiter['event'].set()
+    return True
+
+def upload_params(filename):
+    """whisper query parameters for a resume upload."""
+    # Parameters - use v2 according to documentations
+    #REFER https://docs.unstract.com/llmwhisperer/llm_whisperer/apis/llm_whisperer_text_extraction_api/
+    params = {
+        'mode': 'high_quality',  # Best for resumes with OCR support
+        'output_mode': 'layout_preserving',  # Optimized for LLM consumption
+        'page_seperator': '<<<'  # Page separator
+    }
+    if LLMWHISPERER_WEBHOOK_NAME and LLMWHISPERER_WEBHOOK_TOKEN:
+        params['use_webhook'] = LLMWHISPERER_WEBHOOK_NAME
+        params['webhook_metadata'] = filename
+    return params
+
+def _error_message(response):
+    try:
+        error_data = response.json()
+        return error_data.get('message', response.text[:200])
+    except Exception:
+        return response.text[:200]
+
+def upload_result(response):
+    """
+    Checks a whisper upload response (requests or httpx).
+
+    Returns:
+        tuple: (whisper_hash, None) or (None, error message)
+    """
+    # Check for HTML error responses
+    content_type = response.headers.get('Content-Type', '')
+    if 'text/html' in content_type:
+        return None, f"API returned HTML error. Status: {response.status_code}. Check your API key."
+    
+    # Error code handling
+    if response.status_code == 401:
+        return None, "Authentication failed. Check your LLMWHISPERER_API_KEY in .env file."
+    elif response.status_code == 402:
+        return None, "Payment required. Your LLMWhisperer quota may be exhausted."
+    elif response.status_code == 415:
+        return None, "Unsupported media type. The API doesn't accept this file format."
+    elif response.status_code not in [200, 202]: #Documentations says 202 
+        return None, f"Upload failed ({response.status_code}): {_error_message(response)}"
+
+    # Parse JSON response
+    try:
+        res_data = response.json()
+    except json.JSONDecodeError as e:
+        return None, f"Failed to parse API response as JSON: {str(e)}"
+    
+    whisper_hash = res_data.get("whisper_hash")
+    
+    if not whisper_hash:
+        return None, f"No whisper_hash in response. Got: {res_data}"
+    return whisper_hash, None
+
+def retrieve_result(response):
+    """
+    Reads the text out of a whisper-retrieve response (requests or httpx).
+
+    Returns:
+        tuple: (text, None) or (None, error message)
+    """
+    if response.status_code != 200:
+        return None, f"Retrieve failed ({response.status_code}): {_error_message(response)}"
+    
+    try:
+        retrieve_data = response.json()
+        # Extract text from the result_text field
+        extracted_text = retrieve_data.get("result_text", "").strip()
+        
+        if not extracted_text:
+            # Fallback: sometimes it's in extraction dict
+            extraction = retrieve_data.get("extraction", {})
+            extracted_text = extraction.get("result_text", "").strip()
+        
+    except json.JSONDecodeError:
+        # Fallback: sometimes returns plain text
+        extracted_text = response.text.strip()
+    
+    if not extracted_text:
+        return None, "Extraction returned empty text."
+    
+    print(f"Extracted {len(extracted_text)} characters")
+    return extracted_text, None
+
+def extract_text_from_resume(file_path, poll_delays=whisper_poll_delays):
+    """
+    Extract text from resume using LLMWhisperer API v2.
+    Uses binary upload as per official documentation.
+    """
+    client = get_client()
+    if client is None:
+        return None, "LLMWHISPERER_API_KEY is missing in .env"
+    
+    try:
+        # Step 1: Upload process
+        file_size = os.path.getsize(file_path)
+        filename = os.path.basename(file_path)
+        
+        params = upload_params(filename)
+        
+        print(f"Uploading {filename} to LLMWhisperer...")
+        print(f"   File size: {file_size} bytes")
+        
+        # Send as binary data, streamed from disk
+        with open(file_path, 'rb') as f:
+            response = client.upload(f, params)
+        
+        print(f"Response Status: {response.status_code}")
+        print(f"Response Headers: {dict(response.headers)}")
+        
+        whisper_hash, error = upload_result(response)
+        if error:
+            return None, error
+
+        print(f"Got whisper_hash: {whisper_hash}")
+        
+        # Step 2: Processing
+        #REFER https://docs.unstract.com/llmwhisperer/llm_whisperer/apis/llm_whisperer_text_extraction_status_api/
+        print("⏳ Waiting for processing...")
+        waiter = {"event": threading.Event(), "text": None}
+        with whisper_waiters_lock:
+            whisper_waiters[whisper_hash] = waiter
+        
+        try:
+            started = time.monotonic()
+            attempt = 0
+            for delay in poll_delays(file_size, estimate_page_count(file_path)):
+                attempt += 1
+                # Returns early when the webhook reports completion
+                if waiter['event'].wait(delay):
+                    if waiter['text']:
+                        print(f"Webhook delivered {len(waiter['text'])} characters")
+                        return waiter['text'], None
+                    # Completed without the text: check the status now, then keep the normal delays
+                    waiter['event'].clear()
+                
+                try:
+                    status_resp = client.status(whisper_hash)
+                    
+                    if status_resp.status_code != 200:
+                        print(f"Status check returned {status_resp.status_code}")
+                        continue
+                    
+                    # Verify JSON response
+                    if "application/json" not in status_resp.headers.get("Content-Type", ""):
+                        return None, "Status API returned non-JSON response."
+
+                    status_data = status_resp.json()
+                    status = status_data.get("status")
+                    
+                    print(f" Attempt {attempt} ({time.monotonic() - started:.1f}s) - Status: {status}")
+                    
+                    if status == "processed":
+                        print("Document processed successfully!")
+                        
+                        # Step 3: RETRIEVAL (REFER ) 
+                        # -https://docs.unstract.com/llmwhisperer/llm_whisperer/apis/llm_whisperer_text_extraction_retrieve_api/
+                        return retrieve_result(client.retrieve(whisper_hash))
+                    
+                    elif status == "failed" or status == "error":
+                        error_msg = status_data.get('message', 'Unknown error')
+                        return None, f"Processing failed: {error_msg}"
+                    
+                    elif status in ["processing", "accepted", "uploaded"]:
+                        # Still processing
+                        continue
+                    else:
+                        # Unknown status
+                        print(f"⚠️ Unknown status: {status}")
+                        continue
+                        
+                except requests.exceptions.Timeout:
+                    print(f"Status check timeout (attempt {attempt})")
+                    continue
+                except Exception as e:
+                    print(f"Status check error: {str(e)}")
+                    continue
+        finally:
+            with whisper_waiters_lock:
+                whisper_waiters.pop(whisper_hash, None)
+        
+        return None, f"Timeout: Processing exceeded {WHISPER_MAX_WAIT} seconds."
+
+    except requests.exceptions.Timeout:
+        return None, "Network timeout. Please try again."
+    except requests.exceptions.RequestException as e:
+        return None, f"Network error: {str(e)}"
+    except Exception as e:
+        return None, f"Unexpected error: {str(e)}"
+
+
+class _LoopEvent:
+    """threading.Event-style set() that wakes an asyncio.Event, so complete_whisper() works from any thread."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def set(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+async def extract_text_from_resume_async(file_path, poll_delays=whisper_poll_delays):
+    """
+    Async version of extract_text_from_resume() for the ASGI app: same
+    upload, polling schedule, webhook wake-up and error messages, without
+    holding a thread while LLMWhisperer works.
+    """
+    client = get_async_client()
+    if client is None:
+        return None, "LLMWHISPERER_API_KEY is missing in .env"
+    
+    try:
+        file_size = os.path.getsize(file_path)
+        filename = os.path.basename(file_path)
+        print(f"Uploading {filename} to LLMWhisperer ({file_size} bytes)...")
+        
+        with open(file_path, 'rb') as f:
+            whisper_hash, error = upload_result(await client.upload(f, upload_params(filename)))
+        if error:
+            return None, error
+        print(f"Got whisper_hash: {whisper_hash}")
+        
+        waiter = {"event": _LoopEvent(), "text": None}
+        with whisper_waiters_lock:
+            whisper_waiters[whisper_hash] = waiter
+        
+        try:
+            attempt = 0
+            for delay in poll_delays(file_size, estimate_page_count(file_path)):
+                attempt += 1
+                # Returns early when the webhook reports completion
+                try:
+                    await asyncio.wait_for(waiter['event'].event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                if waiter['text']:
+                    print(f"Webhook delivered {len(waiter['text'])} characters")
+                    return waiter['text'], None
+                # Completed without the text: check the status now, then keep the normal delays
+                waiter['event'].event.clear()
+                
+                try:
+                    status_resp = await client.status(whisper_hash)
+                    if status_resp.status_code != 200:
+                        print(f"Status check returned {status_resp.status_code}")
+                        continue
+                    if "application/json" not in status_resp.headers.get("Content-Type", ""):
+                        return None, "Status API returned non-JSON response."
+                    
+                    status_data = status_resp.json()
+                    status = status_data.get("status")
+                    print(f" Attempt {attempt} - Status: {status}")
+                    
+                    if status == "processed":
+                        return retrieve_result(await client.retrieve(whisper_hash))
+                    elif status == "failed" or status == "error":
+                        return None, f"Processing failed: {status_data.get('message', 'Unknown error')}"
+                except httpx.TimeoutException:
+                    print(f"Status check timeout (attempt {attempt})")
+                except Exception as e:
+                    print(f"Status check error: {str(e)}")
+        finally:
+            with whisper_waiters_lock:
+                whisper_waiters.pop(whisper_hash, None)
+        
+        return None, f"Timeout: Processing exceeded {WHISPER_MAX_WAIT} seconds."
+
+    except httpx.TimeoutException:
+        return None, "Network timeout. Please try again."
+    except httpx.HTTPError as e:
+        return None, f"Network error: {str(e)}"
+    except Exception as e:
+        return None, f"Unexpected error: {str(e)}"
@@ -0,0 +1,262 @@
+import os
+import re
+import asyncio
+import zipfile
+import threading
+import unicodedata
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# A text-native resume page carries well over this; scans carry ~0
+MIN_CHARS_PER_PAGE = 200
+# Share of non-space characters that are unreadable (private-use glyphs,
+# replacement chars, control codes, "(cid:NN)" font artefacts)
+MAX_GARBAGE_RATIO = 0.05
+
+LOCAL_EXTENSIONS = {'.pdf', '.docx'}
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+CID_PATTERN = re.compile(r'\(cid:\d+\)')
+
+
+def pdf_text(file_path):
+    """Returns (text, page_count) from a PDF's text layer, one page per block."""
+    reader = PdfReader(file_path)
+    if reader.is_encrypted:
+        reader.decrypt('')
+    pages = [page.extract_text() or '' for page in reader.pages]
+    return '\n\n'.join(p.strip() for p in pages), len(pages)
+
+
+def docx_text(file_path):
+    """Returns (text, 1) from a DOCX's word/document.xml, one line per paragraph."""
+    with zipfile.ZipFile(file_path) as archive:
+        root = ET.fromstring(archive.read('word/document.xml'))
+
+    lines = []
+    for paragraph in root.iter(f'{WORD_NS}p'):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f'{WORD_NS}t' and node.text:
+                parts.append(node.text)
+            elif node.tag == f'{WORD_NS}tab':
+                parts.append('\t')
+            elif node.tag in (f'{WORD_NS}br', f'{WORD_NS}cr'):
+                parts.append('\n')
+        lines.append(''.join(parts))
+    # DOCX has no fixed pagination, judge it as a single page
+    return '\n'.join(lines).strip(), 1
+
+
+def text_quality(text, page_count):
+    """
+    Heuristics telling a real text layer apart from a scan or a broken font map.
+
+    Returns:
+        dict: chars_per_page and garbage_ratio
+    """
+    garbage = 0
+    visible = 0
+    for ch in CID_PATTERN.sub('�', text):
+        if ch.isspace():
+            continue
+        visible += 1
+        if ch == '�' or unicodedata.category(ch) in ('Cc', 'Cf', 'Co', 'Cn', 'Cs'):
+            garbage += 1
+    return {
+        "chars_per_page": visible / max(page_count, 1),
+        "garbage_ratio": garbage / visible if visible else 1.0
+    }
+
+
+def extract_local(file_path, min_chars_per_page=MIN_CHARS_PER_PAGE, max_garbage_ratio=MAX_GARBAGE_RATIO):
+    """
+    Extracts text in-process from a PDF text layer or DOCX XML.
+
+    Returns:
+        tuple: (text, None) when the result is good enough to use,
+               (None, reason) when the file should go to remote OCR
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if extension == '.pdf':
+            if PdfReader is None:
+                return None, "pypdf not installed"
+            text, pages = pdf_text(file_path)
+        elif extension == '.docx':
+            text, pages = docx_text(file_path)
+        else:
+            return None, f"no local extractor for {extension or 'file'}"
+    except Exception as e:
+        return None, f"local extraction failed: {e}"
+
+    quality = text_quality(text, pages)
+    if quality['chars_per_page'] < min_chars_per_page:
+        return None, f"too little text ({quality['chars_per_page']:.0f} chars/page), likely scanned"
+    if quality['garbage_ratio'] > max_garbage_ratio:
+        return None, f"unreadable text layer ({quality['garbage_ratio']:.0%} garbage)"
+    return text, None
+
+
+class LocalExtractor:
+    """
+    Runs extract_local() in a process pool so CPU-bound PDF parsing stays off
+    the web and resume worker threads (and out of their GIL).
+
+    The pool is started lazily with the "spawn" method, so workers don't
+    inherit the parent's Mongo client or thread state. A worker that crashes
+    or times out never fails the upload, the caller just falls back to OCR.
+    """
+
+    def __init__(self, max_workers=2, timeout=20,
+                 min_chars_per_page=MIN_CHARS_PER_PAGE, max_garbage_ratio=MAX_GARBAGE_RATIO):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.min_chars_per_page = min_chars_per_page
+        self.max_garbage_ratio = max_garbage_ratio
+        self.local = 0
+        self.fallbacks = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _reset_pool(self, pool=None, kill=False):
+        """
+        Drops the pool (only if it is still `pool`, when given) so the next
+        extraction starts a fresh one. kill=True terminates its workers first:
+        shutdown() leaves a running task alone, so a parse that hangs would
+        otherwise keep its worker busy forever. Extractions still running in
+        the killed pool fail with BrokenProcessPool and fall back to OCR.
+        """
+        with self._lock:
+            if self._pool is None or (pool is not None and self._pool is not pool):
+                return
+            pool, self._pool = self._pool, None
+        if kill:
+            # ProcessPoolExecutor has no public way to stop a running task. _processes (pid -> Process)
+            # is a CPython implementation detail; if it's gone, only the shutdown below happens
+            for process in list((getattr(pool, '_processes', None) or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, used_local):
+        with self._lock:
+            if used_local:
+                self.local += 1
+            else:
+                self.fallbacks += 1
+
+    def _skip_reason(self, file_path):
+        if self.max_workers <= 0:
+            return "local extraction disabled"
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in LOCAL_EXTENSIONS:
+            self._count(used_local=False)
+            return f"no local extractor for {extension or 'file'}"
+        return None
+
+    def _submit(self, file_path):
+        """
+        Returns (pool, future), so a timeout resets the pool the task actually
+        runs in. Another thread's timeout can shut the pool down between
+        _get_pool() and submit() (RuntimeError, or BrokenProcessPool after a
+        crash); the task is then submitted once more to a fresh pool.
+        """
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return pool, pool.submit(
+                    extract_local, os.path.abspath(file_path), self.min_chars_per_page, self.max_garbage_ratio
+                )
+            except RuntimeError:
+                self._reset_pool(pool)
+                if attempt:
+                    raise
+
+    def extract(self, file_path):
+        """
+        Returns:
+            tuple: (text, None) on success, (None, reason) when remote OCR is needed
+        """
+        skip = self._skip_reason(file_path)
+        if skip:
+            return None, skip
+
+        pool = None
+        try:
+            pool, future = self._submit(file_path)
+            text, reason = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self._reset_pool(pool, kill=True)
+            text, reason = None, f"local extraction timed out after {self.timeout}s"
+        except BrokenProcessPool as e:
+            self._reset_pool(pool)
+            text, reason = None, f"local extraction worker crashed: {e}"
+        except RuntimeError as e:
+            # Pool shut down under us twice in a row: leave this file to OCR
+            text, reason = None, f"local extraction pool was reset: {e}"
+
+        self._count(used_local=text is not None)
+        return text, reason
+
+    async def extract_async(self, file_path):
+        """Same as extract(), awaiting the pool instead of blocking the event loop."""
+        skip = self._skip_reason(file_path)
+        if skip:
+            return None, skip
+
+        pool = None
+        try:
+            pool, future = self._submit(file_path)
+            text, reason = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._reset_pool(pool, kill=True)
+            text, reason = None, f"local extraction timed out after {self.timeout}s"
+        except BrokenProcessPool as e:
+            self._reset_pool(pool)
+            text, reason = None, f"local extraction worker crashed: {e}"
+        except RuntimeError as e:
+            # Pool shut down under us twice in a row: leave this file to OCR
+            text, reason = None, f"local extraction pool was reset: {e}"
+
+        self._count(used_local=text is not None)
+        return text, reason
+
+    def stats(self):
+        total = self.local + self.fallbacks
+        return {
+            "local": self.local,
+            "remote_fallbacks": self.fallbacks,
+            "local_rate": round(self.local / total, 3) if total else 0.0,
+            "workers": self.max_workers,
+            "pdf_support": PdfReader is not None
+        }
+
+    def shutdown(self):
+        self._reset_pool()
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    for path in sys.argv[1:]:
+        started = time.perf_counter()
+        text, reason = extract_local(path)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{path}: {'local' if text else 'remote OCR'} in {elapsed:.1f} ms"
+              + (f" ({len(text)} chars)" if text else f" - {reason}"))
@@ -0,0 +1,226 @@
+import zlib
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from prefilter import tokenize, parse_skills, STOP_WORDS
+
+# Hashed feature space shared by jobs and candidates, so adding either never
+# changes the vocabulary (and never forces a full rebuild)
+N_FEATURES = 2 ** 18
+SKILL_WEIGHT = 3.0
+CANDIDATE_BATCH_SIZE = 2000
+
+
+def _terms(text):
+    """Unigrams and bigrams of text, minus stop words."""
+    tokens = [t for t in tokenize(text or '') if t not in STOP_WORDS]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _vectorize(docs):
+    """
+    Turns (text, skills) pairs into an L2-normalized CSR matrix, one row each.
+
+    Text terms get sublinear tf weights (1 + log tf) and each skill phrase
+    adds SKILL_WEIGHT. Duplicate features are summed by the COO -> CSR
+    conversion, so the only Python-level loop is hashing the terms.
+    """
+    rows, cols, skill_rows, skill_cols = [], [], [], []
+    for i, (text, skills) in enumerate(docs):
+        features = [zlib.crc32(t.encode('utf-8')) % N_FEATURES for t in _terms(text)]
+        cols.extend(features)
+        rows.extend([i] * len(features))
+        skill_features = {zlib.crc32(s.encode('utf-8')) % N_FEATURES for s in skills}
+        skill_cols.extend(skill_features)
+        skill_rows.extend([i] * len(skill_features))
+    n_rows = len(docs)
+
+    tf = sparse.coo_matrix(
+        (np.ones(len(cols), dtype=np.float32), (rows, cols)), shape=(n_rows, N_FEATURES)
+    ).tocsr()
+    tf.data = 1 + np.log(tf.data)
+    matrix = tf + sparse.csr_matrix(
+        (np.full(len(skill_cols), SKILL_WEIGHT, dtype=np.float32), (skill_rows, skill_cols)),
+        shape=(n_rows, N_FEATURES)
+    )
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1 / norms).dot(matrix).astype(np.float32).tocsr()
+
+
+def job_document(job):
+    """(text, skills) for a job: title/description terms plus required skills."""
+    return f"{job.get('title', '')} {job.get('description', '')}", parse_skills(job.get('required_skills'))
+
+
+def candidate_document(candidate):
+    """(text, skills) for a candidate: resume text terms plus extracted skills."""
+    skills = [str(s).strip().lower() for s in candidate.get('skills_found') or []]
+    return candidate.get('resume_text', ''), skills
+
+
+class MatchingEngine:
+    """
+    Candidate x job cosine similarity matrix over hashed skill/term vectors.
+
+    build() scores everything in batched sparse matrix products. Afterwards
+    add_job() / add_candidate() only compute the new column or row, so a
+    single upload never triggers a full recompute.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.built = False
+        self.job_ids = []
+        self.candidate_ids = []
+        self._job_index = {}
+        self._candidate_index = {}
+        self._jobs_matrix = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._candidate_blocks = []  # CSR blocks in candidate_ids order
+        self._scores = np.zeros((0, 0), dtype=np.float32)  # capacity-padded
+
+    def _candidates(self):
+        """Returns all candidate vectors as one CSR matrix, compacting the blocks."""
+        if len(self._candidate_blocks) != 1:
+            self._candidate_blocks = [
+                sparse.vstack(self._candidate_blocks, format='csr') if self._candidate_blocks
+                else sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+            ]
+        return self._candidate_blocks[0]
+
+    @staticmethod
+    def _replace_row(matrix, idx, row):
+        return sparse.vstack([matrix[:idx], row, matrix[idx + 1:]], format='csr')
+
+    def _ensure_capacity(self, rows, cols):
+        """Grows the score buffer geometrically so appends stay amortized O(1)."""
+        cap_rows, cap_cols = self._scores.shape
+        if rows <= cap_rows and cols <= cap_cols:
+            return
+        new_rows = max(rows, cap_rows * 2 if rows > cap_rows else cap_rows, 16)
+        new_cols = max(cols, cap_cols * 2 if cols > cap_cols else cap_cols, 16)
+        grown = np.zeros((new_rows, new_cols), dtype=np.float32)
+        grown[:cap_rows, :cap_cols] = self._scores
+        self._scores = grown
+
+    def build(self, jobs, candidates):
+        """
+        Builds the full matrix from iterables of job and candidate documents.
+
+        Candidates are vectorized and multiplied against all jobs in batches
+        of CANDIDATE_BATCH_SIZE rows.
+        """
+        with self._lock:
+            self._reset()
+            job_docs = []
+            for job in jobs:
+                self._job_index[job['job_id']] = len(self.job_ids)
+                self.job_ids.append(job['job_id'])
+                job_docs.append(job_document(job))
+            self._jobs_matrix = _vectorize(job_docs)
+            jobs_t = self._jobs_matrix.T.tocsc()
+
+            batch = []
+            for candidate in candidates:
+                batch.append(candidate)
+                if len(batch) >= CANDIDATE_BATCH_SIZE:
+                    self._add_candidate_batch(batch, jobs_t)
+                    batch = []
+            if batch:
+                self._add_candidate_batch(batch, jobs_t)
+
+            self.built = True
+            print(f"Matching engine built: {len(self.candidate_ids)} candidates x {len(self.job_ids)} jobs")
+
+    def _add_candidate_batch(self, batch, jobs_t):
+        start = len(self.candidate_ids)
+        for candidate in batch:
+            self._candidate_index[candidate['candidate_id']] = len(self.candidate_ids)
+            self.candidate_ids.append(candidate['candidate_id'])
+        block = _vectorize([candidate_document(c) for c in batch])
+        self._candidate_blocks.append(block)
+
+        self._ensure_capacity(len(self.candidate_ids), len(self.job_ids))
+        self._scores[start:start + len(batch), :len(self.job_ids)] = (block @ jobs_t).toarray()
+
+    def add_job(self, job):
+        """Adds or replaces a job, computing only its column of scores."""
+        with self._lock:
+            if not self.built:
+                return
+            row = _vectorize([job_document(job)])
+            idx = self._job_index.get(job['job_id'])
+            if idx is None:
+                idx = len(self.job_ids)
+                self._job_index[job['job_id']] = idx
+                self.job_ids.append(job['job_id'])
+                self._jobs_matrix = sparse.vstack([self._jobs_matrix, row], format='csr')
+            else:
+                self._jobs_matrix = self._replace_row(self._jobs_matrix, idx, row)
+
+            self._ensure_capacity(len(self.candidate_ids), len(self.job_ids))
+            if self.candidate_ids:
+                column = (self._candidates() @ row.T).toarray().ravel()
+                self._scores[:len(self.candidate_ids), idx] = column
+
+    def add_candidate(self, candidate):
+        """Adds or replaces a candidate, computing only its row of scores."""
+        with self._lock:
+            if not self.built:
+                return
+            row = _vectorize([candidate_document(candidate)])
+            idx = self._candidate_index.get(candidate['candidate_id'])
+            if idx is None:
+                idx = len(self.candidate_ids)
+                self._candidate_index[candidate['candidate_id']] = idx
+                self.candidate_ids.append(candidate['candidate_id'])
+                self._candidate_blocks.append(row)
+            else:
+                self._candidate_blocks = [self._replace_row(self._candidates(), idx, row)]
+
+            self._ensure_capacity(len(self.candidate_ids), len(self.job_ids))
+            if self.job_ids:
+                self._scores[idx, :len(self.job_ids)] = (row @ self._jobs_matrix.T).toarray().ravel()
+
+    @staticmethod
+    def _top(values, ids, limit):
+        limit = min(limit, len(values))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-values, limit - 1)[:limit]
+        top = top[np.argsort(-values[top])]
+        return [(ids[i], round(float(values[i]) * 100, 1)) for i in top if values[i] > 0]
+
+    def top_jobs_for_candidate(self, candidate_id, limit=5):
+        """Returns [(job_id, similarity 0-100)] best jobs for a candidate, or None if unknown."""
+        with self._lock:
+            idx = self._candidate_index.get(candidate_id)
+            if idx is None:
+                return None
+            values = self._scores[idx, :len(self.job_ids)]
+            return self._top(values, self.job_ids, limit)
+
+    def top_candidates_for_job(self, job_id, limit=10):
+        """Returns [(candidate_id, similarity 0-100)] best candidates from every job's pool."""
+        with self._lock:
+            idx = self._job_index.get(job_id)
+            if idx is None:
+                return None
+            values = self._scores[:len(self.candidate_ids), idx]
+            return self._top(values, self.candidate_ids, limit)
+
+    def stats(self):
+        """Returns the matrix dimensions and memory footprint."""
+        with self._lock:
+            return {
+                "built": self.built,
+                "jobs": len(self.job_ids),
+                "candidates": len(self.candidate_ids),
+                "matrix_bytes": int(self._scores.nbytes)
+            }
@@ -0,0 +1,178 @@
+import re
+import math
+from collections import Counter
+from datetime import datetime
+
+# Short forms that commonly stand in for a required skill on resumes
+SKILL_ALIASES = {
+    'kubernetes': ['k8s'],
+    'javascript': ['js', 'ecmascript'],
+    'typescript': ['ts'],
+    'machine learning': ['ml'],
+    'continuous integration': ['ci/cd'],
+    'ci/cd': ['continuous integration', 'continuous delivery'],
+    'postgresql': ['postgres'],
+    'amazon web services': ['aws'],
+    'aws': ['amazon web services'],
+    'gcp': ['google cloud'],
+    'react': ['react.js', 'reactjs'],
+    'node.js': ['node', 'nodejs'],
+}
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'our', 'that', 'the', 'to', 'we',
+    'will', 'with', 'you', 'your', "we're", "you'll", 'must', 'join', 'team',
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#./'-]*[a-z0-9+#]|[a-z0-9]")
+YEARS_RE = re.compile(r"(\d{1,2}(?:\.\d)?)\s*\+?\s*(?:years?|yrs?)\b", re.IGNORECASE)
+RANGE_RE = re.compile(
+    r"\b((?:19|20)\d{2})\s*(?:-|–|—|to)\s*((?:19|20)\d{2}|present|current|now)\b",
+    re.IGNORECASE
+)
+
+# BM25 parameters; resumes are scored as a single document against an average length
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_AVG_DOC_LEN = 400
+
+SKILL_WEIGHT = 0.6
+DESCRIPTION_WEIGHT = 0.2
+EXPERIENCE_WEIGHT = 0.2
+
+
+def tokenize(text):
+    """Lowercases text and splits it into word tokens, keeping C++/C#/Node.js style terms."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def parse_skills(required_skills):
+    """Splits a comma-separated required_skills string (or list) into normalized skills."""
+    if isinstance(required_skills, list):
+        skills = required_skills
+    else:
+        skills = str(required_skills or '').split(',')
+    return [s.strip().lower() for s in skills if s and s.strip()]
+
+
+def _phrase_in_text(phrase, text):
+    pattern = r'(?<![a-z0-9])' + re.escape(phrase) + r'(?![a-z0-9+#])'
+    return re.search(pattern, text) is not None
+
+
+def match_skills(resume_text, required_skills):
+    """Returns (found, missing) lists of required skills present in the resume."""
+    text = resume_text.lower()
+    found, missing = [], []
+    for skill in parse_skills(required_skills):
+        variants = [skill] + SKILL_ALIASES.get(skill, [])
+        if any(_phrase_in_text(v, text) for v in variants):
+            found.append(skill)
+        else:
+            missing.append(skill)
+    return found, missing
+
+
+def bm25_similarity(resume_tokens, description):
+    """
+    BM25 score of the job description's terms against the resume, normalized
+    to 0-1 by the best possible score for that many query terms.
+    """
+    query = {t for t in tokenize(description or '') if t not in STOP_WORDS}
+    if not query or not resume_tokens:
+        return 0.0
+
+    tf = Counter(resume_tokens)
+    length_norm = 1 - BM25_B + BM25_B * len(resume_tokens) / BM25_AVG_DOC_LEN
+    score = sum(
+        tf[t] * (BM25_K1 + 1) / (tf[t] + BM25_K1 * length_norm)
+        for t in query if tf[t]
+    )
+    return min(1.0, score / ((BM25_K1 + 1) * len(query)))
+
+
+def extract_experience_years(resume_text):
+    """
+    Estimates years of experience from explicit "N years" mentions and
+    from year ranges such as "2016 - Present". Returns the larger estimate.
+    """
+    mentioned = [float(m) for m in YEARS_RE.findall(resume_text) if float(m) <= 50]
+
+    current_year = datetime.now().year
+    spans = []
+    for start, end in RANGE_RE.findall(resume_text):
+        end_year = current_year if not end[0].isdigit() else int(end)
+        if int(start) <= end_year <= current_year:
+            spans.append((int(start), end_year))
+    span_years = (max(e for _, e in spans) - min(s for s, _ in spans)) if spans else 0
+
+    return max(mentioned + [span_years, 0])
+
+
+def _required_years(job_data):
+    try:
+        return float(job_data.get('experience_years') or 0)
+    except (TypeError, ValueError):
+        match = re.search(r'\d+', str(job_data.get('experience_years')))
+        return float(match.group()) if match else 0.0
+
+
+def prefilter_resume(resume_text, job_data):
+    """
+    Scores a resume against a job locally, without calling the LLM.
+
+    Returns:
+        dict: score (0-100) plus the skill, description and experience components
+    """
+    found, missing = match_skills(resume_text, job_data.get('required_skills'))
+    skill_ratio = len(found) / (len(found) + len(missing)) if (found or missing) else None
+
+    description_similarity = bm25_similarity(tokenize(resume_text), job_data.get('description'))
+
+    years = extract_experience_years(resume_text)
+    required = _required_years(job_data)
+    experience_ratio = min(1.0, years / required) if required else 1.0
+
+    # Redistribute the skill weight when the job lists no skills
+    if skill_ratio is None:
+        weights = {'description': 0.5, 'experience': 0.5}
+        skill_component = 0.0
+    else:
+        weights = {'description': DESCRIPTION_WEIGHT, 'experience': EXPERIENCE_WEIGHT}
+        skill_component = SKILL_WEIGHT * skill_ratio
+
+    score = 100 * (
+        skill_component
+        + weights['description'] * description_similarity
+        + weights['experience'] * experience_ratio
+    )
+
+    return {
+        "score": round(score, 1),
+        "skills_found": found,
+        "missing_skills": missing,
+        "skill_match_ratio": round(skill_ratio, 3) if skill_ratio is not None else None,
+        "description_similarity": round(description_similarity, 3),
+        "estimated_experience_years": years,
+        "required_experience_years": required
+    }
+
+
+def prefilter_analysis(prefilter, threshold):
+    """Builds an analysis dict in the LLM schema for resumes rejected by the pre-filter."""
+    return {
+        "match_score": math.floor(prefilter['score']),
+        "recommendation": "Weak Match",
+        "key_strengths": [f"Matches {s}" for s in prefilter['skills_found']],
+        "missing_skills": prefilter['missing_skills'],
+        "skills_found": prefilter['skills_found'],
+        "experience_summary": f"Approximately {prefilter['estimated_experience_years']:g} years detected",
+        "education": "Not assessed",
+        "estimated_experience_years": prefilter['estimated_experience_years'],
+        "reasoning": (
+            f"Skipped AI analysis: local pre-filter score {prefilter['score']} is below "
+            f"the threshold of {threshold}. Matched {len(prefilter['skills_found'])} of "
+            f"{len(prefilter['skills_found']) + len(prefilter['missing_skills'])} required skills."
+        )
+    }
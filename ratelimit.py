@@ -0,0 +1,248 @@
+import time
+import asyncio
+import threading
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+
+class LLMUnavailable(Exception):
+    """The call was not attempted: circuit open, or no rate/concurrency slot in time."""
+
+
+class TokenBucket:
+    """
+    In-process token bucket: `rate` tokens per second, bursts up to `capacity`.
+    Stand-in for MongoTokenBucket when there's a single worker process.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token if one is available. Returns 0, or the seconds until one will be."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+
+class MongoTokenBucket:
+    """
+    Token bucket stored in one MongoDB document, so every worker process
+    shares the provider's rate limit. Refill and take happen in a single
+    atomic pipeline update using the server clock ($$NOW), so app servers
+    with skewed clocks still agree. Needs MongoDB 4.2+; on database errors it
+    falls back to a local TokenBucket instead of blocking analysis.
+    """
+
+    def __init__(self, collection, name, rate, capacity):
+        self.collection = collection
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.fallback = TokenBucket(rate, capacity)
+        self._warned = False
+
+    def reserve(self):
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        try:
+            doc = self.collection.find_one_and_update(
+                {"_id": self.name},
+                [
+                    {"$set": {
+                        "tokens": {"$min": [self.capacity, {"$add": [
+                            {"$ifNull": ["$tokens", self.capacity]},
+                            {"$multiply": [elapsed, self.rate]}
+                        ]}]},
+                        "updated_at": "$$NOW"
+                    }},
+                    {"$set": {"granted": {"$gte": ["$tokens", 1]}}},
+                    {"$set": {"tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", 1]}, "$tokens"]}}}
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except (PyMongoError, NotImplementedError) as e:
+            if not self._warned:
+                print(f"Shared rate limiter unavailable, using a local one: {e}")
+                self._warned = True
+            return self.fallback.reserve()
+
+        if doc['granted']:
+            return 0
+        return (1 - doc['tokens']) / self.rate
+
+
+class CircuitBreaker:
+    """
+    Stops calling a degraded provider. After `failure_threshold` consecutive
+    failures the circuit opens and calls fail fast for `cooldown` seconds,
+    then a single probe call is let through (half-open): success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def is_open(self):
+        """True while calls should fail fast (open, or half-open with the probe already out)."""
+        state = self.state
+        return state == "open" or (state == "half_open" and self._probing)
+
+    def allow(self):
+        """Claims permission for one call."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    print(f"Circuit opened after {self.failures} consecutive failure(s), cooling down {self.cooldown}s")
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class LLMGuard:
+    """
+    Wraps provider calls with a rate limit (token bucket), a concurrency cap
+    and a circuit breaker. A call that can't get a token and a slot within
+    `acquire_timeout` seconds, or that hits an open circuit, raises
+    LLMUnavailable without being sent, so callers can defer the work
+    instead of failing slowly.
+
+    The concurrency cap is per process, shared by the resume workers,
+    re-score threads and (in async mode) the event loop's tasks; the rate
+    limit is shared by all processes when the bucket is a MongoTokenBucket.
+    """
+
+    def __init__(self, bucket, breaker, max_concurrency=4, acquire_timeout=30):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "failures": 0, "rejected_open": 0, "rejected_busy": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _check_open(self):
+        if self.breaker.is_open():
+            self._count("rejected_open")
+            raise LLMUnavailable("provider circuit is open")
+
+    def _busy(self):
+        self._count("rejected_busy")
+        return LLMUnavailable(f"no rate limit/concurrency slot within {self.acquire_timeout}s")
+
+    def _claim(self):
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise LLMUnavailable("provider circuit is open")
+        self._count("calls")
+
+    def call(self, fn):
+        """Runs fn() under the limits. Exceptions from fn() count as provider failures and are re-raised."""
+        self._check_open()
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            wait = self.bucket.reserve()
+            if wait == 0:
+                break
+            if time.monotonic() + wait > deadline:
+                raise self._busy()
+            time.sleep(wait)
+
+        if not self._slots.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise self._busy()
+        try:
+            self._claim()
+            try:
+                result = fn()
+            except Exception:
+                self._count("failures")
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return result
+        finally:
+            self._slots.release()
+
+    async def call_async(self, fn):
+        """call() for coroutines: fn() returns an awaitable, waits don't block the event loop."""
+        self._check_open()
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            # MongoTokenBucket.reserve() is a blocking pymongo round trip
+            wait = await asyncio.to_thread(self.bucket.reserve)
+            if wait == 0:
+                break
+            if time.monotonic() + wait > deadline:
+                raise self._busy()
+            await asyncio.sleep(wait)
+
+        # Same slots as the worker threads; polled so the event loop never blocks on them
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise self._busy()
+            await asyncio.sleep(0.05)
+        try:
+            self._claim()
+            try:
+                result = await fn()
+            except Exception:
+                self._count("failures")
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return result
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            **self.counters,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "max_concurrency": self.max_concurrency,
+            "rate_per_minute": round(self.bucket.rate * 60, 2),
+            "burst": self.bucket.capacity
+        }
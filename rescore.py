@@ -0,0 +1,144 @@
+import sys
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from pymongo import UpdateOne
+
+from candidate_store import update_operations, load_resume_text
+
+# Analyses that didn't produce a score (provider throttled/down, or unparseable output)
+RETRYABLE_RECOMMENDATIONS = ("Analysis Failed", "Analysis Deferred")
+
+
+def rescore_job(candidates_collection, details_collection, text_codec, job, analyze, format_analysis,
+                concurrency=4, batch_size=50, on_progress=None, extra_fields=None):
+    """
+    Re-scores every stored candidate of a job against its current requirements.
+
+    Candidates are streamed from a cursor, analyzed with at most `concurrency`
+    LLM calls in flight, and written back in unordered bulk_write batches.
+    Candidates without stored resume text count as failed.
+
+    Args:
+        candidates_collection: Mongo candidates collection
+        details_collection: Mongo candidate_details collection (resume text, analysis write-ups)
+        text_codec (TextCodec): Decompresses the stored resume text
+        job (dict): Job document to score against
+        analyze (callable): analyze(resume_text, job) -> analysis dict
+        format_analysis (callable): Formats an analysis dict for display
+        concurrency (int): Max concurrent analyses
+        batch_size (int): Updates per bulk_write flush
+        on_progress (callable, optional): Called with the progress dict after each flush
+        extra_fields (callable, optional): extra_fields(doc, analysis) -> more fields to $set
+
+    Returns:
+        dict: Final progress (total, processed, updated, failed, elapsed, per_second)
+    """
+    query = {"job_id": job['job_id'], "status": "success"}
+    started = time.monotonic()
+    progress = {
+        "job_id": job['job_id'],
+        "total": candidates_collection.count_documents(query),
+        "processed": 0,
+        "updated": 0,
+        "failed": 0,
+        "elapsed": 0.0,
+        "per_second": 0.0
+    }
+    ops, detail_ops = [], []
+
+    def score(doc):
+        doc['resume_text'] = load_resume_text(details_collection, doc, text_codec)
+        if not doc['resume_text']:
+            raise ValueError(f"No stored resume text for {doc['candidate_id']}")
+        return doc, analyze(doc['resume_text'], job)
+
+    def collect(futures):
+        for future in futures:
+            progress['processed'] += 1
+            try:
+                doc, analysis = future.result()
+            except Exception as e:
+                print(f"Rescore error: {e}")
+                progress['failed'] += 1
+                continue
+
+            # Keep the previous score rather than overwrite it with a failure
+            if analysis.get('recommendation') in RETRYABLE_RECOMMENDATIONS:
+                progress['failed'] += 1
+                continue
+
+            summary_update, details_update = update_operations({
+                **analysis,
+                **(extra_fields(doc, analysis) if extra_fields else {}),
+                "analysis": format_analysis(analysis),
+                "rescored_at": datetime.now().isoformat()
+            })
+            ops.append(UpdateOne({"candidate_id": doc['candidate_id']}, summary_update))
+            if details_update:
+                detail_ops.append(UpdateOne({"_id": doc['candidate_id']}, details_update, upsert=True))
+
+    def flush():
+        if detail_ops:
+            details_collection.bulk_write(detail_ops, ordered=False)
+            detail_ops.clear()
+        if ops:
+            result = candidates_collection.bulk_write(ops, ordered=False)
+            progress['updated'] += result.modified_count
+            ops.clear()
+        progress['elapsed'] = round(time.monotonic() - started, 2)
+        progress['per_second'] = round(progress['processed'] / progress['elapsed'], 2) if progress['elapsed'] else 0.0
+        if on_progress:
+            on_progress(dict(progress))
+
+    cursor = candidates_collection.find(
+        query, {"candidate_id": 1, "resume_text": 1}
+    ).batch_size(batch_size)
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='rescore') as pool:
+        for doc in cursor:
+            # Bound the work in flight so the cursor is only read as fast as we score
+            if len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+                if len(ops) >= batch_size:
+                    flush()
+            pending.add(pool.submit(score, doc))
+
+        done, _ = wait(pending)
+        collect(done)
+    flush()
+
+    print(f"Rescored job {job['job_id']}: {progress['processed']}/{progress['total']} "
+          f"in {progress['elapsed']}s ({progress['per_second']}/s), {progress['failed']} failed")
+    return progress
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-score stored candidates against a job")
+    parser.add_argument('job_id', help="Job to re-score")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    from app import (
+        jobs_collection, candidates_collection, candidate_details_collection, text_codec,
+        screen_resume, format_analysis_text, candidate_search_fields
+    )
+
+    job = jobs_collection.find_one({"job_id": args.job_id})
+    if not job:
+        print(f"Job not found: {args.job_id}")
+        sys.exit(1)
+
+    rescore_job(
+        candidates_collection, candidate_details_collection, text_codec, job, screen_resume, format_analysis_text,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        extra_fields=lambda doc, analysis: candidate_search_fields(analysis, doc['resume_text']),
+        on_progress=lambda p: print(f"  {p['processed']}/{p['total']} processed, "
+                                    f"{p['failed']} failed, {p['per_second']}/s")
+    )
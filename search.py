@@ -0,0 +1,238 @@
+import argparse
+import itertools
+
+from pymongo import UpdateOne
+
+from candidate_store import iter_with_details, TEXT_VIEW
+from prefilter import SKILL_ALIASES, tokenize, parse_skills, extract_experience_years
+
+SEARCH_LIMIT = 50
+SEARCH_MAX_LIMIT = 500
+TEXT_MATCH_BATCH = 1000  # Full-text matches filtered per candidates query
+MAX_SKILL_WORDS = 3  # Longest skill phrase detected in resume text ("amazon web services")
+
+
+def _alias_groups():
+    """Maps every skill spelling in SKILL_ALIASES to one canonical name (the first key of its group)."""
+    canonical = {}
+    for skill, aliases in SKILL_ALIASES.items():
+        name = canonical.get(skill, skill)
+        for variant in [skill] + aliases:
+            previous = canonical.get(variant)
+            # Merge groups linked through a shared alias (ci/cd <-> continuous integration)
+            if previous and previous != name:
+                for key, value in canonical.items():
+                    if value == previous:
+                        canonical[key] = name
+            canonical[variant] = name
+    return canonical
+
+
+CANONICAL_SKILLS = _alias_groups()
+
+
+def canonical_skill(skill):
+    """Normalized search key for a skill: lowercased, aliases folded (k8s -> kubernetes)."""
+    skill = ' '.join(tokenize(str(skill or '')))
+    return CANONICAL_SKILLS.get(skill, skill)
+
+
+def skill_keys(skills):
+    """Canonical keys for a list or comma-separated string of skills, without duplicates."""
+    keys = []
+    for skill in parse_skills(skills):
+        key = canonical_skill(skill)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def skill_vocabulary(jobs):
+    """Every skill worth detecting in resume text: the jobs' required skills plus known aliases."""
+    vocabulary = set(CANONICAL_SKILLS)
+    for job in jobs:
+        vocabulary.update(' '.join(tokenize(s)) for s in parse_skills(job.get('required_skills')))
+    vocabulary.discard('')
+    return frozenset(vocabulary)
+
+
+def detect_skills(text, vocabulary):
+    """Canonical keys of the vocabulary skills mentioned in text (1-3 word phrases)."""
+    tokens = tokenize(text or '')
+    found = set()
+    for size in range(1, MAX_SKILL_WORDS + 1):
+        for i in range(len(tokens) - size + 1):
+            phrase = ' '.join(tokens[i:i + size])
+            if phrase in vocabulary:
+                found.add(canonical_skill(phrase))
+    return found
+
+
+def search_fields(analysis, text, vocabulary):
+    """
+    Candidate fields the search endpoint queries: skill_keys (skills the
+    analysis found plus vocabulary skills mentioned anywhere in the resume,
+    so a candidate can be found for skills another job asked for) and a
+    numeric experience_years.
+    """
+    keys = skill_keys(analysis.get('skills_found') or [])
+    keys += sorted(detect_skills(text, vocabulary) - set(keys))
+    # Deferred / failed analyses carry no estimate, so fall back to the local one
+    try:
+        years = float(analysis.get('estimated_experience_years') or 0)
+    except (TypeError, ValueError):
+        years = 0.0
+    return {"skill_keys": keys, "experience_years": years or float(extract_experience_years(text or ''))}
+
+
+def search_query(args, base_query):
+    """
+    Adds the search filters to a candidates query.
+
+    skills (all required), any_skills (at least one), exclude_skills (none)
+    are comma-separated and alias-folded; min_years / max_years bound
+    experience_years. (q is matched against candidate_details, see
+    search_candidates.)
+
+    Raises:
+        ValueError: a bound is not a number
+    """
+    query = dict(base_query)
+    skills = {}
+    if args.get('skills'):
+        skills['$all'] = skill_keys(args['skills'])
+    if args.get('any_skills'):
+        skills['$in'] = skill_keys(args['any_skills'])
+    if args.get('exclude_skills'):
+        skills['$nin'] = skill_keys(args['exclude_skills'])
+    if skills:
+        query['skill_keys'] = skills
+
+    years = {}
+    if args.get('min_years'):
+        years['$gte'] = float(args['min_years'])
+    if args.get('max_years'):
+        years['$lte'] = float(args['max_years'])
+    if years:
+        query['experience_years'] = years
+    return query
+
+
+def _text_search(candidates_collection, details_collection, text, query, projection, any_keys, limit):
+    """
+    The best `limit` candidates matching both a full-text query and the
+    summary filters, with "relevance" (text score plus any_skills hits).
+
+    The text index is on candidate_details and the filters are on candidates,
+    so text matches are read in score order, TEXT_MATCH_BATCH at a time, and
+    each batch is filtered with one candidates query. Reading stops once
+    `limit` hits are found that no later match can outrank: text scores only
+    fall, and the any_skills part adds at most len(any_keys).
+    """
+    inclusive = 1 in projection.values()
+    fields = {**projection, "candidate_id": 1, "match_score": 1, "skill_keys": 1} if inclusive else projection
+    matches = details_collection.find(
+        {"$text": {"$search": text}},
+        {"score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).batch_size(TEXT_MATCH_BATCH)
+
+    def rank(candidate):
+        return candidate['relevance'], candidate.get('match_score', 0), candidate['candidate_id']
+
+    hits = []
+    batch = []
+    for match in itertools.chain(matches, [None]):
+        if match is not None:
+            batch.append(match)
+            if len(batch) < TEXT_MATCH_BATCH:
+                continue
+        if not batch:
+            break
+        scores = {match['_id']: match['score'] for match in batch}
+        for candidate in candidates_collection.find({**query, "candidate_id": {"$in": list(scores)}}, fields):
+            hits_for_skills = len(any_keys.intersection(candidate.get('skill_keys') or []))
+            candidate['relevance'] = scores[candidate['candidate_id']] + hits_for_skills
+            hits.append(candidate)
+        hits = sorted(hits, key=rank, reverse=True)[:limit]
+        if len(hits) >= limit and batch[-1]['score'] + len(any_keys) < hits[-1]['relevance']:
+            break
+        batch = []
+
+    if inclusive and not projection.get('skill_keys'):
+        for candidate in hits:
+            candidate.pop('skill_keys', None)
+    return hits
+
+
+def search_candidates(candidates_collection, details_collection, args, base_query, projection, limit=SEARCH_LIMIT):
+    """
+    Runs a candidate search and returns the best `limit` matches.
+
+    Results are ranked by relevance, then match_score. Relevance is the text
+    score for q plus the number of any_skills the candidate has; without
+    either, the sort is plain match_score order and is served by the
+    skill_keys/match_score index. The resume text lives in candidate_details,
+    so q is matched there first (see _text_search).
+
+    Returns:
+        list: Candidate documents (with "relevance" when it was computed)
+    """
+    query = search_query(args, base_query)
+    any_keys = set(query['skill_keys']['$in']) if args.get('any_skills') else set()
+    if args.get('q'):
+        return _text_search(candidates_collection, details_collection, args['q'], query, projection, any_keys, limit)
+
+    pipeline = [{"$match": query}]
+    sort = {"match_score": -1, "candidate_id": -1}
+    if any_keys:
+        pipeline.append({"$addFields": {"relevance": {"$size": {"$filter": {
+            "input": {"$ifNull": ["$skill_keys", []]},
+            "cond": {"$in": ["$$this", list(any_keys)]}
+        }}}}})
+        sort = {"relevance": -1, **sort}
+        if 1 in projection.values():
+            projection = {**projection, "relevance": 1}
+    pipeline += [{"$sort": sort}, {"$limit": limit}, {"$project": projection}]
+    return list(candidates_collection.aggregate(pipeline))
+
+
+def backfill(candidates_collection, details_collection, text_codec, jobs, batch_size=500):
+    """
+    Computes skill_keys and experience_years for analyzed candidates stored
+    before search existed (from the resume text kept on the candidate).
+
+    Returns:
+        int: Number of candidates updated
+    """
+    vocabulary = skill_vocabulary(jobs)
+    updated = 0
+    ops = []
+    cursor = iter_with_details(details_collection, candidates_collection.find(
+        {"status": "success", "skill_keys": {"$exists": False}},
+        {"candidate_id": 1, "resume_text": 1, "skills_found": 1, "estimated_experience_years": 1}
+    ).batch_size(batch_size), projection=TEXT_VIEW, batch_size=batch_size, codec=text_codec)
+    for candidate in cursor:
+        ops.append(UpdateOne(
+            {"candidate_id": candidate['candidate_id']},
+            {"$set": search_fields(candidate, candidate.get('resume_text', ''), vocabulary)}
+        ))
+        if len(ops) >= batch_size:
+            updated += candidates_collection.bulk_write(ops, ordered=False).modified_count
+            ops.clear()
+    if ops:
+        updated += candidates_collection.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Candidate search index maintenance")
+    parser.add_argument('command', choices=['backfill'],
+                        help="backfill: add skill_keys / experience_years to candidates analyzed before search")
+    args = parser.parse_args()
+
+    from app import jobs_collection, candidates_collection, candidate_details_collection, text_codec, ensure_indexes, db
+
+    ensure_indexes(db)
+    updated = backfill(candidates_collection, candidate_details_collection, text_codec,
+                       jobs_collection.find({}, {'required_skills': 1}))
+    print(f"Candidates updated: {updated}")
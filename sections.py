@@ -0,0 +1,127 @@
+import re
+
+from prefilter import tokenize, parse_skills, match_skills, STOP_WORDS
+
+CHARS_PER_TOKEN = 4  # Rough English average, good enough to size a prompt
+MIN_PART_CHARS = 200  # Smaller leftovers of a cut section aren't worth including
+
+# Heading text (lowercased, "&" read as "and") -> section
+SECTION_HEADINGS = {
+    'summary': ['summary', 'professional summary', 'career summary', 'profile', 'professional profile',
+                'objective', 'career objective', 'about me', 'overview'],
+    'experience': ['experience', 'work experience', 'professional experience', 'relevant experience',
+                   'employment', 'employment history', 'work history', 'career history'],
+    'skills': ['skills', 'technical skills', 'key skills', 'core skills', 'core competencies', 'competencies',
+               'technologies', 'tech stack', 'tools and technologies', 'skills and tools', 'areas of expertise'],
+    'projects': ['projects', 'key projects', 'personal projects', 'academic projects', 'selected projects'],
+    'certifications': ['certifications', 'certificates', 'licenses and certifications', 'training', 'courses'],
+    'education': ['education', 'academic background', 'academics', 'qualifications', 'education and training'],
+    'publications': ['publications', 'research'],
+    'awards': ['awards', 'achievements', 'honors', 'honors and awards', 'accomplishments'],
+    'languages': ['languages'],
+    'volunteering': ['volunteering', 'volunteer experience', 'volunteer work'],
+    'interests': ['interests', 'hobbies', 'hobbies and interests'],
+    'references': ['references'],
+}
+HEADING_LOOKUP = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+
+# How much each section usually tells about fit for a job, before relevance
+SECTION_PRIORITY = {
+    'skills': 3.0, 'experience': 3.0, 'summary': 2.0, 'projects': 2.0,
+    'certifications': 1.5, 'education': 1.5, 'header': 1.0, 'other': 1.0,
+    'awards': 1.0, 'publications': 1.0, 'languages': 0.5, 'volunteering': 0.5,
+    'interests': 0.2, 'references': 0.0,
+}
+
+HEADING_STRIP_RE = re.compile(r"^[\s#*=_•·:|-]+|[\s#*=_•·:|-]+$")
+
+
+def _heading(line):
+    """The section a line is the heading of, or None."""
+    if len(line) > 40:
+        return None
+    name = HEADING_STRIP_RE.sub('', line).lower().replace('&', 'and')
+    return HEADING_LOOKUP.get(' '.join(name.split()))
+
+
+def split_sections(text):
+    """
+    Splits resume text at recognized headings ("Experience", "TECHNICAL
+    SKILLS:", "## Education", ...). Text before the first heading is the
+    "header" (name, title, contact). Resumes without at least two headings
+    are split into paragraphs instead, all of kind "other".
+
+    Returns:
+        list: (kind, text) pairs in document order
+    """
+    sections = []
+    kind, lines = 'header', []
+    for line in text.splitlines():
+        heading = _heading(line.strip()) if line.strip() else None
+        if heading:
+            if any(l.strip() for l in lines):
+                sections.append((kind, '\n'.join(lines).strip()))
+            kind, lines = heading, [line.strip()]
+        else:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((kind, '\n'.join(lines).strip()))
+
+    if sum(1 for kind, _ in sections if kind != 'header') < 2:
+        return [('other', part.strip()) for part in re.split(r'\n\s*\n', text) if part.strip()]
+    return sections
+
+
+def _relevance(section_text, skills, terms):
+    """Required skills found in the section, plus a smaller weight for job description terms."""
+    found, _ = match_skills(section_text, skills) if skills else ([], [])
+    words = set(tokenize(section_text))
+    return len(found) + 0.1 * len(terms & words)
+
+
+def _cut(text, max_chars):
+    """The start of text within max_chars, cut at a line end (or a word, for very long lines)."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind('\n', 0, max_chars)
+    if cut < max_chars // 2:
+        cut = text.rfind(' ', 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip()
+
+
+def trim_resume(text, job, max_tokens):
+    """
+    Fits resume text into a prompt budget of about `max_tokens` tokens.
+
+    Text that already fits is returned unchanged. Otherwise sections are
+    ranked by kind (skills and experience first, references last) times
+    their relevance to the job's required skills and description, taken
+    greedily while they fit (the section that no longer fits is cut at a
+    line boundary), and joined back in document order.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= budget:
+        return text
+
+    sections = split_sections(text)
+    skills = parse_skills(job.get('required_skills'))
+    terms = {t for t in tokenize(f"{job.get('title', '')} {job.get('description', '')}") if t not in STOP_WORDS}
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda i: SECTION_PRIORITY.get(sections[i][0], 1.0) * (1 + _relevance(sections[i][1], skills, terms)),
+        reverse=True
+    )
+
+    chosen = {}
+    remaining = budget
+    for i in ranked:
+        kind, body = sections[i]
+        if SECTION_PRIORITY.get(kind, 1.0) == 0 or remaining < MIN_PART_CHARS:
+            continue
+        part = _cut(body, remaining)
+        if len(part) < min(len(body), MIN_PART_CHARS):
+            continue
+        chosen[i] = part
+        remaining -= len(part) + 2
+
+    return '\n\n'.join(chosen[i] for i in sorted(chosen)) or text[:budget]
@@ -0,0 +1,179 @@
+import argparse
+from datetime import datetime
+
+from pymongo import ReplaceOne
+
+# Candidates in these states have no real match_score yet (or failed), so they
+# are counted but left out of score averages and the recommendation histogram
+UNSCORED_STATUSES = {"queued", "processing", "error", "deferred"}
+
+
+def _key(value):
+    """Makes a status/recommendation usable as a Mongo field name."""
+    return str(value or "Unknown").replace('.', '_').lstrip('$')
+
+
+def _scored(candidate):
+    return bool(candidate) and candidate.get('status') not in UNSCORED_STATUSES \
+        and candidate.get('match_score') is not None
+
+
+def transition_update(old=None, new=None, count=1):
+    """
+    Builds the job_stats update for one candidate change.
+
+    Args:
+        old (dict, optional): status/match_score/recommendation before the change (None for an insert)
+        new (dict, optional): status/match_score/recommendation after the change (None for a delete)
+        count (int): Number of candidates making this same change
+
+    Returns:
+        dict: Mongo update document, or None when nothing changes
+    """
+    inc = {}
+
+    def add(field, amount):
+        if amount:
+            inc[field] = inc.get(field, 0) + amount * count
+
+    if old is None:
+        add("candidate_count", 1)
+    if new is None:
+        add("candidate_count", -1)
+    if old:
+        add(f"status_counts.{_key(old.get('status'))}", -1)
+    if new:
+        add(f"status_counts.{_key(new.get('status'))}", 1)
+    if _scored(old):
+        add("scored_count", -1)
+        add("score_sum", -(old.get('match_score') or 0))
+        add(f"recommendations.{_key(old.get('recommendation'))}", -1)
+    if _scored(new):
+        add("scored_count", 1)
+        add("score_sum", new.get('match_score') or 0)
+        add(f"recommendations.{_key(new.get('recommendation'))}", 1)
+
+    update = {"$set": {"updated_at": datetime.now().isoformat()}}
+    if inc:
+        update["$inc"] = inc
+    if _scored(new):
+        update["$max"] = {"max_match_score": new.get('match_score') or 0}
+    if not inc and "$max" not in update:
+        return None
+    return update
+
+
+def record_transition(stats_collection, job_id, old=None, new=None, count=1):
+    """
+    Applies one candidate change to the job's materialized stats document.
+
+    Args:
+        stats_collection: Mongo job_stats collection
+        job_id: Job the candidate belongs to
+        old (dict, optional): status/match_score/recommendation before the change (None for an insert)
+        new (dict, optional): status/match_score/recommendation after the change (None for a delete)
+        count (int): Number of candidates making this same change (e.g. a bulk upload)
+
+    max_match_score can only grow incrementally; rebuild_job_stats() corrects
+    it after scores go down (e.g. a re-score run).
+    """
+    update = transition_update(old, new, count)
+    if update is None:
+        return
+
+    try:
+        stats_collection.update_one({"job_id": job_id}, update, upsert=True)
+    except Exception as e:
+        print(f"Error updating job stats for {job_id}: {e}")
+
+
+def _with_average(stats):
+    stats.pop('_id', None)
+    scored = stats.get('scored_count', 0)
+    stats['average_match_score'] = round(stats.get('score_sum', 0) / scored, 1) if scored else 0
+    return stats
+
+
+def get_job_stats(stats_collection):
+    """Returns every job's stats document with average_match_score filled in."""
+    return [_with_average(s) for s in stats_collection.find({})]
+
+
+def get_summary(stats_collection, jobs_collection):
+    """
+    Dashboard totals read from the materialized stats, in O(jobs) instead of
+    scanning the candidates collection.
+    """
+    total_candidates, jobs_with_candidates = 0, 0
+    for s in stats_collection.find({}, {"candidate_count": 1}):
+        count = s.get('candidate_count', 0)
+        total_candidates += count
+        if count > 0:
+            jobs_with_candidates += 1
+    return {
+        "total_jobs": jobs_collection.estimated_document_count(),
+        "total_candidates": total_candidates,
+        "jobs_with_candidates": jobs_with_candidates
+    }
+
+
+def rebuild_job_stats(stats_collection, candidates_collection, job_id=None):
+    """
+    Recomputes job stats from the candidates collection (all jobs, or one).
+
+    Returns:
+        int: Number of job stats documents written
+    """
+    match = {"job_id": job_id} if job_id is not None else {"job_id": {"$exists": True}}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"job_id": "$job_id", "status": "$status", "recommendation": "$recommendation"},
+            "count": {"$sum": 1},
+            "score_sum": {"$sum": {"$ifNull": ["$match_score", 0]}},
+            "max_score": {"$max": "$match_score"},
+            "with_score": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$match_score", None]}, None]}, 0, 1]}}
+        }}
+    ]
+
+    now = datetime.now().isoformat()
+    jobs = {}
+    for row in candidates_collection.aggregate(pipeline, allowDiskUse=True):
+        key = row['_id']
+        stats = jobs.setdefault(key['job_id'], {
+            "job_id": key['job_id'], "candidate_count": 0, "scored_count": 0, "score_sum": 0,
+            "max_match_score": 0, "status_counts": {}, "recommendations": {}, "updated_at": now
+        })
+        status = _key(key.get('status'))
+        stats['candidate_count'] += row['count']
+        stats['status_counts'][status] = stats['status_counts'].get(status, 0) + row['count']
+        if key.get('status') not in UNSCORED_STATUSES and row['with_score']:
+            recommendation = _key(key.get('recommendation'))
+            stats['scored_count'] += row['with_score']
+            stats['score_sum'] += row['score_sum']
+            stats['max_match_score'] = max(stats['max_match_score'], row['max_score'] or 0)
+            stats['recommendations'][recommendation] = stats['recommendations'].get(recommendation, 0) + row['with_score']
+
+    ops = [ReplaceOne({"job_id": j}, stats, upsert=True) for j, stats in jobs.items()]
+    if ops:
+        stats_collection.bulk_write(ops, ordered=False)
+
+    # Jobs whose candidates are all gone
+    stale = {"job_id": {"$nin": list(jobs)}}
+    if job_id is not None:
+        stale = {"job_id": job_id} if job_id not in jobs else None
+    if stale:
+        stats_collection.delete_many(stale)
+
+    print(f"Rebuilt stats for {len(ops)} job(s)")
+    return len(ops)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild the materialized per-job candidate stats")
+    parser.add_argument('--job-id', help="Only rebuild this job")
+    args = parser.parse_args()
+
+    from app import job_stats_collection, candidates_collection
+
+    rebuild_job_stats(job_stats_collection, candidates_collection, job_id=args.job_id)
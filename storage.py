@@ -0,0 +1,327 @@
+import os
+import gzip
+import time
+import uuid
+import shutil
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+CHUNK_SIZE = 1024 * 1024
+MAX_FILE_BYTES = 20 * 1024 * 1024
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+def save_stream(source, file_path, max_bytes=MAX_FILE_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Copies a binary stream to disk in chunks, hashing it on the way.
+
+    Returns:
+        tuple: (sha256 hex digest, size in bytes)
+
+    Raises:
+        FileTooLarge: more than max_bytes were read (the partial file is removed)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, 'wb') as f:
+        try:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise FileTooLarge(f"larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                f.write(chunk)
+        except Exception:
+            f.close()
+            os.remove(file_path)
+            raise
+    return digest.hexdigest(), size
+
+
+def _shard(root, file_hash, name):
+    # Two levels of 256 directories keep every directory small: objects/ab/cd/abcd...pdf
+    return os.path.join(root, file_hash[:2], file_hash[2:4], name)
+
+
+class ResumeStore:
+    """
+    Content-addressed storage for uploaded resumes.
+
+    Each distinct file is stored once under uploads/objects/<ab>/<cd>/<sha256>.<ext>,
+    however many candidates or jobs it was uploaded for, and is described by a
+    document in the stored_files collection (_id = hash) holding its tier,
+    size, reference count and last upload time.
+
+    `refs` counts the candidate documents pointing at the file (file_hash).
+    Files with no references are removed after a grace period; referenced
+    files untouched for `retention_days` are gzipped into the archive tier
+    (or deleted when archiving is off), and archived files are deleted after
+    `archive_retention_days` more (0 keeps them forever).
+    """
+
+    def __init__(self, collection, root='uploads', archive_root=None, retention_days=90,
+                 archive=True, archive_retention_days=365, orphan_grace_hours=24):
+        self.collection = collection
+        self.root = root
+        self.objects_root = os.path.join(root, 'objects')
+        self.archive_root = archive_root or os.path.join(root, 'archive')
+        self.tmp_root = os.path.join(root, 'tmp')
+        self.retention = timedelta(days=retention_days)
+        self.archive = archive
+        self.archive_retention = timedelta(days=archive_retention_days) if archive_retention_days else None
+        self.orphan_grace = timedelta(hours=orphan_grace_hours)
+        self._gc_lock = threading.Lock()
+        for path in (self.objects_root, self.archive_root, self.tmp_root):
+            os.makedirs(path, exist_ok=True)
+
+    def path(self, file_hash, ext):
+        return _shard(self.objects_root, file_hash, f"{file_hash}{ext}")
+
+    def archive_path(self, file_hash, ext):
+        return _shard(self.archive_root, file_hash, f"{file_hash}{ext}.gz")
+
+    def locate(self, file_hash):
+        """Path of a stored file's hot copy, or None when it isn't on disk (unknown or archived)."""
+        doc = self.collection.find_one({"_id": file_hash}, {"ext": 1})
+        path = self.path(file_hash, doc['ext']) if doc else None
+        return path if path and os.path.exists(path) else None
+
+    def put(self, source, filename, max_bytes=MAX_FILE_BYTES):
+        """
+        Streams an upload into the store. Content that is already stored is
+        not written twice (and is brought back from the archive tier).
+
+        Returns:
+            tuple: (file_hash, file_path, size)
+
+        Raises:
+            FileTooLarge: the upload is over max_bytes
+        """
+        tmp_path = os.path.join(self.tmp_root, uuid.uuid4().hex)
+        file_hash, size = save_stream(source, tmp_path, max_bytes=max_bytes)
+        ext = os.path.splitext(filename)[1].lower()
+        now = datetime.now().isoformat()
+
+        doc = self.collection.find_one_and_update(
+            {"_id": file_hash},
+            {
+                "$set": {"last_used_at": now, "tier": "hot"},
+                "$unset": {"archived_at": "", "archived_size": ""},
+                "$setOnInsert": {"ext": ext, "size": size, "refs": 0, "created_at": now}
+            },
+            upsert=True
+        )
+        if doc:
+            ext = doc['ext']
+        file_path = self.path(file_hash, ext)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Same content, so replacing an existing copy is harmless (and repairs a missing one)
+        os.replace(tmp_path, file_path)
+
+        if doc and doc.get('tier') == 'archive':
+            archived = self.archive_path(file_hash, ext)
+            if os.path.exists(archived):
+                os.remove(archived)
+        return file_hash, file_path, size
+
+    def add_refs(self, file_hashes):
+        """Counts one more candidate document for each hash (repeat a hash for several)."""
+        counts = {}
+        for file_hash in file_hashes:
+            counts[file_hash] = counts.get(file_hash, 0) + 1
+        if counts:
+            self.collection.bulk_write([
+                UpdateOne({"_id": h}, {"$inc": {"refs": n}}) for h, n in counts.items()
+            ], ordered=False)
+
+    def release(self, file_hash):
+        """A candidate document pointing at the file was removed."""
+        self.collection.update_one({"_id": file_hash}, {"$inc": {"refs": -1}})
+
+    def reconcile_refs(self, candidates_collection):
+        """
+        Recounts every file's references from the candidates collection
+        (after manual candidate deletes, or migrating existing uploads).
+
+        Returns:
+            int: Number of stored files whose count changed
+        """
+        counts = {
+            row['_id']: row['count'] for row in candidates_collection.aggregate([
+                {"$match": {"file_hash": {"$exists": True}}},
+                {"$group": {"_id": "$file_hash", "count": {"$sum": 1}}}
+            ], allowDiskUse=True)
+        }
+        ops = [
+            UpdateOne({"_id": doc['_id']}, {"$set": {"refs": counts.get(doc['_id'], 0)}})
+            for doc in self.collection.find({}, {"refs": 1})
+            if doc.get('refs') != counts.get(doc['_id'], 0)
+        ]
+        for start in range(0, len(ops), 1000):
+            self.collection.bulk_write(ops[start:start + 1000], ordered=False)
+        return len(ops)
+
+    def _remove(self, doc, tiers=('hot', 'archive')):
+        """Deletes a file's copies and returns the bytes freed."""
+        freed = 0
+        paths = {"hot": self.path(doc['_id'], doc['ext']), "archive": self.archive_path(doc['_id'], doc['ext'])}
+        for tier in tiers:
+            if os.path.exists(paths[tier]):
+                freed += os.path.getsize(paths[tier])
+                os.remove(paths[tier])
+        return freed
+
+    def _archive(self, doc):
+        source = self.path(doc['_id'], doc['ext'])
+        target = self.archive_path(doc['_id'], doc['ext'])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(source):
+            tmp_path = os.path.join(self.tmp_root, uuid.uuid4().hex)
+            with open(source, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(tmp_path, target)
+        return os.path.getsize(target) if os.path.exists(target) else 0
+
+    def collect_garbage(self, limit=1000):
+        """
+        One GC pass: removes unreferenced files, archives (or deletes) files
+        past the retention period, expires old archives and clears
+        abandoned temporary files. Each file is claimed with a conditional
+        update on last_used_at, so a concurrent re-upload keeps it.
+
+        Returns:
+            dict: Counts of files removed, archived and expired, plus bytes freed
+        """
+        with self._gc_lock:
+            now = datetime.now()
+            summary = {"orphans_removed": 0, "archived": 0, "expired": 0, "bytes_freed": 0}
+
+            orphan_cutoff = (now - self.orphan_grace).isoformat()
+            for doc in self.collection.find(
+                {"refs": {"$lte": 0}, "last_used_at": {"$lt": orphan_cutoff}}
+            ).limit(limit):
+                if self.collection.delete_one({"_id": doc['_id'], "refs": {"$lte": 0},
+                                               "last_used_at": doc['last_used_at']}).deleted_count:
+                    summary['bytes_freed'] += self._remove(doc)
+                    summary['orphans_removed'] += 1
+
+            retention_cutoff = (now - self.retention).isoformat()
+            for doc in self.collection.find(
+                {"tier": "hot", "last_used_at": {"$lt": retention_cutoff}}
+            ).limit(limit):
+                if self.archive:
+                    archived_size = self._archive(doc)
+                    claimed = self.collection.update_one(
+                        {"_id": doc['_id'], "tier": "hot", "last_used_at": doc['last_used_at']},
+                        {"$set": {"tier": "archive", "archived_at": now.isoformat(), "archived_size": archived_size}}
+                    ).modified_count
+                    if claimed:
+                        summary['bytes_freed'] += self._remove(doc, tiers=('hot',)) - archived_size
+                        summary['archived'] += 1
+                    else:
+                        # A re-upload won the race and kept the file hot, so nothing tracks the copy
+                        # just written (unless another GC process archived the file meanwhile)
+                        current = self.collection.find_one({"_id": doc['_id']}, {"tier": 1})
+                        if not current or current.get('tier') != "archive":
+                            self._remove(doc, tiers=('archive',))
+                    continue
+                if self.collection.delete_one({"_id": doc['_id'], "tier": "hot",
+                                               "last_used_at": doc['last_used_at']}).deleted_count:
+                    summary['bytes_freed'] += self._remove(doc)
+                    summary['expired'] += 1
+
+            if self.archive_retention:
+                archive_cutoff = (now - self.retention - self.archive_retention).isoformat()
+                for doc in self.collection.find(
+                    {"tier": "archive", "last_used_at": {"$lt": archive_cutoff}}
+                ).limit(limit):
+                    if self.collection.delete_one({"_id": doc['_id'], "tier": "archive",
+                                                   "last_used_at": doc['last_used_at']}).deleted_count:
+                        summary['bytes_freed'] += self._remove(doc)
+                        summary['expired'] += 1
+
+            # Partial writes left by a crash or an aborted upload
+            stale = time.time() - self.orphan_grace.total_seconds()
+            for entry in os.scandir(self.tmp_root):
+                if entry.is_file() and entry.stat().st_mtime < stale:
+                    os.remove(entry.path)
+
+        print(f"Upload GC: {summary}")
+        return summary
+
+    def migrate_legacy(self, limit=None):
+        """
+        Moves uploads saved before the store (uploads/<uuid>_<filename>) into
+        it. Run reconcile_refs() afterwards so they get their candidates counted.
+
+        Returns:
+            int: Number of files moved
+        """
+        moved = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            with open(entry.path, 'rb') as f:
+                self.put(f, entry.name, max_bytes=None)
+            os.remove(entry.path)
+            moved += 1
+            if limit and moved >= limit:
+                break
+        return moved
+
+    def stats(self):
+        """Files, original bytes, bytes on disk and unreferenced files per tier."""
+        stats = {
+            "retention_days": self.retention.days,
+            "archive_enabled": self.archive,
+            "archive_retention_days": self.archive_retention.days if self.archive_retention else 0
+        }
+        for tier in ("hot", "archive"):
+            stats[tier] = {"files": 0, "bytes": 0, "stored_bytes": 0, "unreferenced": 0}
+        for row in self.collection.aggregate([
+            {"$group": {
+                "_id": "$tier",
+                "files": {"$sum": 1},
+                "bytes": {"$sum": "$size"},
+                "stored_bytes": {"$sum": {"$ifNull": ["$archived_size", "$size"]}},
+                "unreferenced": {"$sum": {"$cond": [{"$lte": ["$refs", 0]}, 1, 0]}}
+            }}
+        ]):
+            stats[row.pop('_id')] = row
+        return stats
+
+
+def gc_loop(store, interval_seconds):
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            store.collect_garbage()
+        except Exception as e:
+            print(f"Upload GC failed: {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Uploaded resume storage maintenance")
+    parser.add_argument('command', choices=['gc', 'stats', 'reconcile', 'migrate'],
+                        help="gc: one garbage collection pass; reconcile: recount references from candidates; "
+                             "migrate: move legacy uploads/<uuid>_<name> files into the store")
+    args = parser.parse_args()
+
+    from app import resume_store, candidates_collection
+
+    if args.command == 'gc':
+        resume_store.collect_garbage()
+    elif args.command == 'stats':
+        print(resume_store.stats())
+    elif args.command == 'reconcile':
+        print(f"Reference counts fixed: {resume_store.reconcile_refs(candidates_collection)}")
+    else:
+        print(f"Moved {resume_store.migrate_legacy()} file(s)")
+        print(f"Reference counts fixed: {resume_store.reconcile_refs(candidates_collection)}")
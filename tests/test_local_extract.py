@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import local_extract
+from local_extract import LocalExtractor
+
+
+def fake_extract(file_path, *args):
+    """Stands in for extract_local() in the pool workers: files named hang* never finish."""
+    if os.path.basename(file_path).startswith('hang'):
+        time.sleep(60)
+    return f"text of {os.path.basename(file_path)}", None
+
+
+class LocalExtractorTimeoutTest(unittest.TestCase):
+    """The timeout / pool kill path: a hung parse must not hold a worker or fail later uploads."""
+
+    def setUp(self):
+        self.original = local_extract.extract_local
+        local_extract.extract_local = fake_extract
+        self.tmp = tempfile.mkdtemp()
+        self.extractor = LocalExtractor(max_workers=1, timeout=2)
+
+    def tearDown(self):
+        self.extractor.shutdown()
+        local_extract.extract_local = self.original
+
+    def _file(self, name):
+        path = os.path.join(self.tmp, name)
+        open(path, 'wb').close()
+        return path
+
+    def test_timeout_kills_the_hung_worker(self):
+        text, reason = self.extractor.extract(self._file('hang.pdf'))
+        self.assertIsNone(text)
+        self.assertIn("timed out", reason)
+
+        # The single worker was busy with the hung parse: without the kill this would time out too
+        started = time.monotonic()
+        text, reason = self.extractor.extract(self._file('resume.pdf'))
+        self.assertEqual(text, "text of resume.pdf")
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_timeout_terminates_worker_processes(self):
+        pool = self.extractor._get_pool()
+        pool.submit(fake_extract, self._file('warm.pdf')).result(timeout=30)  # Starts the worker
+        workers = list(pool._processes.values())
+        self.extractor.extract(self._file('hang.pdf'))
+        for process in workers:
+            process.join(timeout=5)
+            self.assertFalse(process.is_alive())
+
+    def test_pool_reset_between_get_and_submit(self):
+        # Another thread's timeout shuts the pool down after this thread fetched it
+        pool = self.extractor._get_pool()
+        get_pool = self.extractor._get_pool
+        returned = []
+
+        def stale_then_fresh():
+            if not returned:
+                returned.append(pool)
+                return pool
+            return get_pool()
+
+        self.extractor._reset_pool(pool, kill=True)
+        self.extractor._get_pool = stale_then_fresh
+        text, reason = self.extractor.extract(self._file('resume.pdf'))
+        self.assertEqual((text, reason), ("text of resume.pdf", None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import zlib
+import argparse
+import threading
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# zlib preset dictionary: headings, phrases and terms most resumes share. zlib
+# finds matches anywhere in it but encodes the ones near the end cheapest, so
+# the most common strings come last.
+RESUME_ZDICT = (
+    "Publications Volunteer Languages Interests Hobbies References available upon request "
+    "Awards Honors Achievements Accomplishments Certifications Certified Certificate License "
+    "Kubernetes Docker Terraform Ansible Jenkins GitHub Actions CI/CD Linux Bash Git Jira Agile Scrum "
+    "AWS Azure GCP Google Cloud Amazon Web Services Microservices REST APIs GraphQL "
+    "PostgreSQL MySQL MongoDB Redis Elasticsearch Kafka Spark Hadoop Airflow Snowflake "
+    "Machine Learning Deep Learning TensorFlow PyTorch scikit-learn Pandas NumPy Data Analysis "
+    "Java JavaScript TypeScript React Node.js Angular Vue HTML CSS C++ C# .NET Go Rust Ruby PHP "
+    "Python Django Flask FastAPI SQL Excel Tableau Power BI "
+    "Bachelor of Science Bachelor of Engineering Master of Science Master of Business Administration "
+    "B.Tech M.Tech B.E. MBA Ph.D. Computer Science Information Technology Engineering "
+    "University Institute College GPA CGPA Graduated Coursework Thesis "
+    "January February March April May June July August September October November December "
+    "Jan Feb Mar Apr Jun Jul Aug Sep Oct Nov Dec 2015 2016 2017 2018 2019 2020 2021 2022 2023 2024 2025 "
+    "Remote Full-time Part-time Internship Intern Contract Freelance Consultant "
+    "Junior Senior Lead Principal Staff Manager Director Head of Analyst Architect Developer "
+    "Software Engineer Data Scientist Data Engineer DevOps Engineer Full Stack Developer "
+    "Responsibilities: Key achievements: "
+    "Collaborated with cross-functional teams to Designed and implemented Developed and maintained "
+    "Led a team of Managed Built Improved Reduced Increased Optimized Automated Migrated Mentored "
+    "stakeholders performance scalability reliability production customers clients business "
+    "requirements architecture deployment testing monitoring pipelines infrastructure solutions "
+    "resulting in improving reducing increasing by % using and the of to in for with on "
+    "Email: Phone: LinkedIn: linkedin.com/in/ GitHub: github.com/ Portfolio: Location: "
+    "Tools & Technologies Technical Skills Core Competencies Key Skills Skills "
+    "Projects Education Professional Experience Work Experience Experience "
+    "Professional Summary Summary Profile Objective Present "
+)
+RESUME_ZDICT = RESUME_ZDICT.encode('utf-8')
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+ZLIB_DICTIONARIES = {zlib.adler32(RESUME_ZDICT): RESUME_ZDICT}
+
+
+class TextCodec:
+    """
+    Compresses stored resume text.
+
+    By default text is deflated with zlib and the built-in RESUME_ZDICT
+    preset dictionary, which matters for documents this small. With the
+    optional `zstandard` package and a dictionary trained on stored resumes
+    (train(), kept in the text_dictionaries collection), new text is
+    compressed with zstd and that dictionary instead.
+
+    Every blob names its dictionary (the zlib FDICT id, the zstd frame
+    dict_id), so blobs written with either codec or any trained dictionary
+    decompress side by side. A dictionary trained by another process is
+    fetched the first time one of its blobs is read.
+    """
+
+    def __init__(self, collection=None, level=6):
+        """
+        Args:
+            collection: Mongo collection of trained zstd dictionaries (None: zlib only)
+            level (int): Compression level
+        """
+        self.collection = collection
+        self.level = level
+        self._zstd_dicts = {}  # dict_id -> zstandard.ZstdCompressionDict
+        self._zstd_dict = None  # Dictionary new text is compressed with
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load_latest(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if zstandard is None or self.collection is None:
+                return
+            try:
+                doc = self.collection.find_one({}, sort=[("created_at", -1)])
+            except PyMongoError as e:
+                print(f"Text dictionaries unavailable, compressing with zlib: {e}")
+                return
+            if doc:
+                self._zstd_dict = self._register(doc)
+
+    def _register(self, doc):
+        dictionary = zstandard.ZstdCompressionDict(bytes(doc['data']))
+        self._zstd_dicts[doc['_id']] = dictionary
+        return dictionary
+
+    def _zstd_dictionary(self, dict_id):
+        dictionary = self._zstd_dicts.get(dict_id)
+        if dictionary is None and self.collection is not None:
+            doc = self.collection.find_one({"_id": dict_id})
+            if doc:
+                with self._lock:
+                    dictionary = self._register(doc)
+        if dictionary is None:
+            raise ValueError(f"Unknown zstd dictionary: {dict_id}")
+        return dictionary
+
+    @property
+    def codec(self):
+        self._load_latest()
+        return "zstd" if self._zstd_dict is not None else "zlib"
+
+    def compress(self, text):
+        """Returns the compressed UTF-8 bytes of text."""
+        data = text.encode('utf-8')
+        self._load_latest()
+        if self._zstd_dict is not None:
+            return zstandard.ZstdCompressor(level=self.level, dict_data=self._zstd_dict).compress(data)
+        compressor = zlib.compressobj(self.level, zdict=RESUME_ZDICT)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, blob):
+        """Returns the text of a blob written by compress()."""
+        blob = bytes(blob)
+        if blob[:4] == ZSTD_MAGIC:
+            if zstandard is None:
+                raise RuntimeError("zstd-compressed text needs the zstandard package")
+            dict_id = zstandard.get_frame_parameters(blob).dict_id
+            dictionary = self._zstd_dictionary(dict_id) if dict_id else None
+            return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(blob).decode('utf-8')
+
+        # zlib header: CMF, FLG, then the preset dictionary's Adler-32 when FLG has FDICT set
+        zdict = None
+        if len(blob) >= 6 and blob[1] & 0x20:
+            zdict = ZLIB_DICTIONARIES.get(int.from_bytes(blob[2:6], 'big'))
+            if zdict is None:
+                raise ValueError("Unknown zlib preset dictionary")
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        return (decompressor.decompress(blob) + decompressor.flush()).decode('utf-8')
+
+    def train(self, texts, size=32 * 1024):
+        """
+        Trains a zstd dictionary on sample texts, stores it and uses it for
+        text compressed from now on (other processes pick it up on restart).
+
+        Returns:
+            int: The new dictionary's id
+        """
+        if zstandard is None:
+            raise RuntimeError("Training a dictionary needs the zstandard package")
+        samples = [text.encode('utf-8') for text in texts if text]
+        dictionary = zstandard.train_dictionary(size, samples, level=self.level)
+        self.collection.insert_one({
+            "_id": dictionary.dict_id(),
+            "data": dictionary.as_bytes(),
+            "samples": len(samples),
+            "created_at": datetime.now().isoformat()
+        })
+        with self._lock:
+            self._zstd_dicts[dictionary.dict_id()] = dictionary
+            self._zstd_dict = dictionary
+            self._loaded = True
+        return dictionary.dict_id()
+
+    def stats(self):
+        return {
+            "codec": self.codec,
+            "level": self.level,
+            "zstd_available": zstandard is not None,
+            "zstd_dictionary": self._zstd_dict.dict_id() if self._zstd_dict is not None else None
+        }
+
+
+def compression_report(codec, texts):
+    """Original vs compressed bytes of sample texts: built-in zlib dictionary, and the codec's current one."""
+    report = {"samples": 0, "original_bytes": 0, "zlib_plain_bytes": 0, "zlib_dict_bytes": 0, "codec_bytes": 0}
+    for text in texts:
+        data = text.encode('utf-8')
+        report['samples'] += 1
+        report['original_bytes'] += len(data)
+        report['zlib_plain_bytes'] += len(zlib.compress(data, codec.level))
+        compressor = zlib.compressobj(codec.level, zdict=RESUME_ZDICT)
+        report['zlib_dict_bytes'] += len(compressor.compress(data) + compressor.flush())
+        report['codec_bytes'] += len(codec.compress(text))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stored resume text compression")
+    parser.add_argument('command', choices=['train', 'report'],
+                        help="train: build a zstd dictionary from stored resumes (needs zstandard); "
+                             "report: compressed sizes of stored resumes with each codec")
+    parser.add_argument('--samples', type=int, default=2000, help="Resumes to sample")
+    parser.add_argument('--size', type=int, default=32 * 1024, help="Dictionary size in bytes")
+    args = parser.parse_args()
+
+    from app import candidate_details_collection, text_codec
+    from candidate_store import sample_resume_texts
+
+    texts = sample_resume_texts(candidate_details_collection, text_codec, args.samples)
+    if args.command == 'train':
+        print(f"Trained dictionary {text_codec.train(texts, args.size)} on {len(texts)} resumes")
+    print(compression_report(text_codec, texts))